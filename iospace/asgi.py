@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iospace.settings')
+# Only serving processes run the AYON event follower and the job runner
+os.environ.setdefault('IOSPACE_WEB_PROCESS', '1')
 
 application = get_asgi_application()
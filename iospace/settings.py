@@ -43,11 +43,17 @@ INSTALLED_APPS = [
 ]
 
 AUTHENTICATION_BACKENDS = [
-    'django_auth_ldap.backend.LDAPBackend',
+    # LDAPBackend that forgets cached lookups after a failed login, see projects/auth.py
+    'projects.auth.CachedLDAPBackend',
     'django.contrib.auth.backends.ModelBackend', 
 ]
 
+# django_auth_ldap caches user DNs and group names in the default cache for this long
+AUTH_LDAP_CACHE_TIMEOUT = int(os.environ.get('IOSPACE_LDAP_CACHE_TTL', 300))
+
 MIDDLEWARE = [
+    'projects.middleware.MetricsMiddleware',
+    'projects.middleware.BackgroundServicesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,9 +91,35 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Wait for the write lock instead of failing with "database is locked"
+        'OPTIONS': {'timeout': int(os.environ.get('IOSPACE_SQLITE_TIMEOUT', 20))},
     }
 }
 
+CACHES = {
+    # Per process unless pointed at redis or memcached, then a forgotten LDAP lookup is seen by every worker
+    'default': {
+        'BACKEND': os.environ.get('IOSPACE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('IOSPACE_CACHE_LOCATION', ''),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Shared by the worker processes so a logout is seen by all of them,
+    # point it at redis or memcached when running on more than one host
+    'sessions': {
+        'BACKEND': os.environ.get('IOSPACE_SESSION_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        # Entries are pickles, keep them in a directory only this app can write to (not /tmp)
+        'LOCATION': os.environ.get('IOSPACE_SESSION_CACHE_LOCATION', os.path.join(BASE_DIR, 'var', 'sessions')),
+        # Sessions are stored with their own expiry, this bounds anything else
+        'TIMEOUT': 14 * 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# cached_db reads sessions from the cache and only touches SQLite on writes and misses,
+# "django.contrib.sessions.backends.cache" skips the database entirely
+SESSION_ENGINE = os.environ.get('IOSPACE_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+
 
 
 
@@ -1,6 +1,39 @@
+import os
+import sys
 from django.apps import AppConfig
 
 
+def is_web_process():
+    """True in processes serving the app, False for shells, scripts, tests and management commands.
+
+    iospace/asgi.py and iospace/wsgi.py set IOSPACE_WEB_PROCESS=1 before
+    loading the app, other servers can set it themselves.
+    """
+    if os.environ.get("IOSPACE_WEB_PROCESS") == "1":
+        return True
+    program = os.path.basename(sys.argv[0]) if sys.argv else ""
+    if program not in ("manage.py", "django-admin", "__main__.py"):
+        return False
+    if len(sys.argv) < 2 or sys.argv[1] != "runserver":
+        return False
+    # The autoreloader parent only watches files, its child serves
+    return "--noreload" in sys.argv or os.environ.get("RUN_MAIN") == "true"
+
+
+def start_background_services():
+    from .events import start_event_follower
+    from .jobs import start_job_runner
+    from .rollups import start_rollup_refresher
+    start_event_follower()
+    start_rollup_refresher()
+    # Only with IOSPACE_JOB_RUNNER=1, `manage.py run_jobs` runs them by default
+    start_job_runner()
+
+
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
+
+    def ready(self):
+        if is_web_process():
+            start_background_services()
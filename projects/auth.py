@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+import logging
+from django.core.cache import cache
+from django_auth_ldap.backend import LDAPBackend, valid_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def _dn_key(username):
+    # The keys django_auth_ldap caches under with AUTH_LDAP_CACHE_TIMEOUT
+    return valid_cache_key(f"django_auth_ldap.user_dn.{username}")
+
+
+def _group_names_key(dn):
+    return valid_cache_key(f"auth_ldap._LDAPUserGroups._group_names.{dn}")
+
+
+def forget_ldap_user(username):
+    """Drop the cached DN and group names of one user."""
+    dn = cache.get(_dn_key(username))
+    keys = [_dn_key(username)]
+    if dn:
+        keys.append(_group_names_key(dn))
+    cache.delete_many(keys)
+
+
+class CachedLDAPBackend(LDAPBackend):
+    """LDAPBackend whose cached lookups are dropped when a login fails.
+
+    AUTH_LDAP_CACHE_TIMEOUT has django_auth_ldap cache the user DN and
+    group names, so a repeat login costs the password bind and one search
+    for the user's attributes. Every login still binds as the user, a
+    wrong or changed password is rejected immediately. A failed login
+    forgets the cached DN, the user may have been moved or renamed.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        username = kwargs.get(self.get_user_model().USERNAME_FIELD, username)
+        if user is None and username and password:
+            forget_ldap_user(username.strip())
+        return user
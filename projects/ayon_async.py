@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import os
+import asyncio
+import logging
+import weakref
+from asgiref.sync import sync_to_async
+from dotenv import load_dotenv
+from .ayon_pool import AYON_SERVER_URL, get_pool
+from .metrics import track
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("AYON_ASYNC_MAX_CONNECTIONS", 100))
+ASYNC_TIMEOUT = float(os.environ.get("AYON_ASYNC_TIMEOUT", 30))
+
+
+class AsyncGraphQlResponse():
+    """Same ``errors`` / ``data`` shape as ayon_api's GraphQlResponse."""
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = data.get("errors")
+
+
+# httpx clients are bound to the event loop they were created on
+_clients = weakref.WeakKeyDictionary()
+
+
+def _get_client():
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("The async AYON client needs httpx (pip install httpx)")
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            base_url=AYON_SERVER_URL.rstrip("/"),
+            timeout=ASYNC_TIMEOUT,
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS),
+        )
+    return client
+
+
+class AsyncAyonConnection():
+    """Non-blocking GraphQL client sharing the session pool's access token.
+
+    Login and renewal still go through the pool, so both paths use one token.
+    """
+
+    def __init__(self, pool=None):
+        self._pool = pool
+        self._token = None
+
+    async def _get_token(self, stale=None):
+        pool = self._pool or get_pool()
+        if stale is None and pool.token:
+            return pool.token
+        # Logging in blocks, run it off the event loop
+        return await sync_to_async(pool.access_token, thread_sensitive=False)(stale)
+
+    async def query_graphql(self, query, variables=None):
+        if self._token is None:
+            self._token = await self._get_token()
+        payload = {"query": query, "variables": variables or {}}
+        for attempt in range(2):
+            with track("ayon", "graphql") as call:
+                response = await _get_client().post(
+                    "/graphql", json=payload, headers={"Authorization": f"Bearer {self._token}"})
+                call.size = len(response.content)
+            if response.status_code == 401 and not attempt:
+                self._token = await self._get_token(stale=self._token)
+                continue
+            response.raise_for_status()
+            return AsyncGraphQlResponse(response.json())
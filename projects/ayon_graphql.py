@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+# Task field sets per view, dotted names select nested fields (attrib.fps)
+FIELD_PRESETS = {
+    "default": frozenset({
+        "id", "name", "label", "taskType", "status", "assignees", "folderId", "active",
+        "attrib.startDate", "attrib.endDate", "attrib.frameStart", "attrib.frameEnd", "attrib.fps",
+    }),
+    "tasks": frozenset({"id", "name", "taskType", "status"}),
+    "task_detail": frozenset({"id", "name", "status", "active", "attrib.startDate", "attrib.endDate"}),
+    "my_tasks": frozenset({
+        "id", "name", "status", "assignees",
+        "attrib.startDate", "attrib.endDate", "attrib.frameStart", "attrib.frameEnd",
+    }),
+}
+
+# The sequence is resolved like get_folder_by_name (first folder with that
+# name) and shots are matched by path in the same request, so the children
+# of that sequence come back without a second round trip.
+SEQUENCE_SHOTS_QUERY = """
+query SequenceShots($projectName: String!, $sequence: String!, $shotPathEx: String!, $first: Int, $after: String) {
+  project(name: $projectName) {
+    sequence: folders(names: [$sequence], first: 1) { edges { node { id } } }
+    shots: folders(folderTypes: ["Shot"], pathEx: $shotPathEx, first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      edges { node { id name parentId } }
+    }
+  }
+}
+"""
+
+SHOT_TASKS_QUERY = """
+query ShotTasks($projectName: String!, $sequence: String!, $shot: String!, $shotPathEx: String!, $first: Int) {
+  project(name: $projectName) {
+    sequence: folders(names: [$sequence], first: 1) { edges { node { id } } }
+    shots: folders(folderTypes: ["Shot"], names: [$shot], pathEx: $shotPathEx) {
+      edges { node { id name parentId tasks(first: $first) { edges { node { %s } } } } }
+    }
+  }
+}
+"""
+
+PROJECT_TASKS_QUERY = """
+query ProjectTasks($projectName: String!, $first: Int, $after: String) {
+  project(name: $projectName) {
+    tasks(first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      edges { cursor node { %s } }
+    }
+  }
+}
+"""
+
+PROJECTS_QUERY = """
+query Projects($first: Int, $after: String) {
+  projects(first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { name active } }
+  }
+}
+"""
+
+USERS_QUERY = """
+query Users($first: Int, $after: String) {
+  users(first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { name } }
+  }
+}
+"""
+
+SEQUENCES_QUERY = """
+query Sequences($projectName: String!, $first: Int, $after: String) {
+  project(name: $projectName) {
+    folders(folderTypes: ["Sequence"], first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      edges { node { id name active } }
+    }
+  }
+}
+"""
+
+USER_TASKS_QUERY = """
+query UserTasks($projectName: String!, $user: String!, $first: Int, $after: String) {
+  project(name: $projectName) {
+    tasks(assignees: [$user], first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      edges { node { %s } }
+    }
+  }
+}
+"""
+
+TASK_QUERY = """
+query Task($projectName: String!, $taskId: String!) {
+  project(name: $projectName) {
+    tasks(ids: [$taskId]) {
+      edges { node { %s folder { id name path folderType } } }
+    }
+  }
+}
+"""
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def resolve_fields(fields=None):
+    """Field set for a preset name or an iterable of field names."""
+    if fields is None:
+        fields = FIELD_PRESETS["default"]
+    elif isinstance(fields, str):
+        fields = FIELD_PRESETS[fields]
+    return frozenset(fields) | {"id"}
+
+
+def selection(fields):
+    """GraphQL selection set for dotted field names, e.g. ``id attrib { fps }``."""
+    tree = {}
+    for field in sorted(fields):
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+
+    def render(node):
+        return " ".join(f"{key} {{ {render(child)} }}" if child else key for key, child in node.items())
+    return render(tree)
+
+
+def _nodes(connection):
+    return [edge["node"] for edge in (connection or {}).get("edges", [])]
+
+
+def _active_tasks(tasks, active=True):
+    # Same default as ayon_api.get_tasks(active=True), None keeps every task
+    if active is None:
+        return tasks
+    return [task for task in tasks if task.get("active", True) == active]
+
+
+def _child_path_regex(parent, child=None):
+    # Direct children of any folder named ``parent``
+    child = re.escape(child) if child else "[^/]+"
+    return f"(^|/){re.escape(parent)}/{child}$"
+
+
+def run_query(con, query, variables):
+    response = con.query_graphql(query, variables)
+    if response.errors:
+        raise GraphQLError(response.errors[0].get("message"))
+    return response.data["data"]
+
+
+def _sequence_shots_variables(project, sequence):
+    return {
+        "projectName": project,
+        "sequence": sequence,
+        "shotPathEx": _child_path_regex(sequence),
+        "first": PAGE_SIZE,
+        "after": None,
+    }
+
+
+def _sequence_shots_page(data):
+    # (sequence_id, shots on this page, next cursor)
+    data = data["project"]
+    found = _nodes(data["sequence"])
+    if not found:
+        return None, [], None
+    sequence_id = found[0]["id"]
+    shots = [shot for shot in _nodes(data["shots"]) if shot["parentId"] == sequence_id]
+    page_info = data["shots"]["pageInfo"]
+    return sequence_id, shots, page_info["endCursor"] if page_info["hasNextPage"] else None
+
+
+def get_sequence_shots(con, project, sequence):
+    """Return ``(sequence_id, shots)`` for a sequence in one request.
+
+    Sequences with more than PAGE_SIZE shots page through the rest.
+    """
+    variables = _sequence_shots_variables(project, sequence)
+    shots = []
+    while True:
+        sequence_id, page, variables["after"] = _sequence_shots_page(run_query(con, SEQUENCE_SHOTS_QUERY, variables))
+        if sequence_id is None:
+            return None, []
+        shots.extend(page)
+        if variables["after"] is None:
+            return sequence_id, shots
+
+
+def _shot_tasks_request(project, sequence, shot, fields):
+    return SHOT_TASKS_QUERY % selection(resolve_fields(fields) | {"active"}), {
+        "projectName": project,
+        "sequence": sequence,
+        "shot": shot,
+        "shotPathEx": _child_path_regex(sequence, shot),
+        "first": PAGE_SIZE,
+    }
+
+
+def _shot_tasks_result(data):
+    data = data["project"]
+    found = _nodes(data["sequence"])
+    if not found:
+        return None, []
+    for node in _nodes(data["shots"]):
+        if node["parentId"] == found[0]["id"]:
+            return node["id"], _active_tasks(_nodes(node["tasks"]))
+    return None, []
+
+
+def get_shot_tasks(con, project, sequence, shot, fields=None):
+    """Return ``(shot_id, tasks)`` for a shot in one request, shot_id is None if it does not resolve."""
+    return _shot_tasks_result(run_query(con, *_shot_tasks_request(project, sequence, shot, fields)))
+
+
+def _project_tasks_request(project, fields, first, after):
+    return PROJECT_TASKS_QUERY % selection(resolve_fields(fields) | {"active"}), {
+        "projectName": project,
+        "first": first,
+        "after": after,
+    }
+
+
+def _project_tasks_result(data, active, first, tasks):
+    # Adds this response's matching tasks to ``tasks``, returns (done, next cursor)
+    project_data = data.get("project")
+    if not project_data:
+        return True, None
+    connection = project_data["tasks"]
+    page_info = connection["pageInfo"]
+    next_cursor = page_info["endCursor"] if page_info["hasNextPage"] else None
+    last_cursor = None
+    for edge in connection.get("edges", []):
+        if not _active_tasks([edge["node"]], active):
+            continue
+        if len(tasks) == first:
+            # More on this page, the next one starts after the last task kept
+            return True, last_cursor
+        tasks.append(edge["node"])
+        last_cursor = edge["cursor"]
+    return len(tasks) == first or next_cursor is None, next_cursor
+
+
+def get_project_tasks_page(con, project, fields=None, first=PAGE_SIZE, after=None, active=True):
+    """One cursor page of a project's tasks, returns ``(tasks, next_cursor)``.
+
+    AYON cannot filter tasks on ``active``, so inactive ones are dropped
+    here and further pages are fetched until ``first`` tasks are collected;
+    only the last page is short.
+    """
+    tasks = []
+    while True:
+        done, after = _project_tasks_result(
+            run_query(con, *_project_tasks_request(project, fields, first, after)), active, first, tasks)
+        if done:
+            return tasks, after
+
+
+def iter_project_tasks(con, project, fields=None, page_size=PAGE_SIZE, active=True):
+    """Lazily yield every task of a project, holding one page in memory."""
+    after = None
+    while True:
+        tasks, after = get_project_tasks_page(con, project, fields, page_size, after, active)
+        yield from tasks
+        if after is None:
+            return
+
+
+def _task_request(project, task_id, fields):
+    return TASK_QUERY % selection(resolve_fields(fields)), {"projectName": project, "taskId": task_id}
+
+
+def _task_result(data):
+    project_data = data.get("project")
+    if not project_data:
+        return None
+    tasks = _nodes(project_data["tasks"])
+    return tasks[0] if tasks else None
+
+
+def get_task(con, project, task_id, fields=None):
+    """Return the task with its parent folder in one request, or None."""
+    return _task_result(run_query(con, *_task_request(project, task_id, fields)))
+
+
+# Async variants for the ASGI views, ``acon`` is an ayon_async.AsyncAyonConnection
+
+
+async def arun_query(acon, query, variables):
+    response = await acon.query_graphql(query, variables)
+    if response.errors:
+        raise GraphQLError(response.errors[0].get("message"))
+    return response.data["data"]
+
+
+async def _apaged_nodes(acon, query, variables, path):
+    # Follow first/after pages of the connection at ``path`` in the result
+    variables = dict(variables, first=PAGE_SIZE, after=None)
+    nodes = []
+    while True:
+        data = await arun_query(acon, query, variables)
+        for key in path:
+            data = (data or {}).get(key)
+        if not data:
+            return nodes
+        nodes.extend(_nodes(data))
+        if not data["pageInfo"]["hasNextPage"]:
+            return nodes
+        variables["after"] = data["pageInfo"]["endCursor"]
+
+
+async def aget_projects(acon):
+    # Active projects, the ayon_api.get_projects default
+    nodes = await _apaged_nodes(acon, PROJECTS_QUERY, {}, ["projects"])
+    return [node for node in nodes if node.get("active", True)]
+
+
+async def aget_users(acon):
+    return await _apaged_nodes(acon, USERS_QUERY, {}, ["users"])
+
+
+async def aget_sequences(acon, project):
+    nodes = await _apaged_nodes(acon, SEQUENCES_QUERY, {"projectName": project}, ["project", "folders"])
+    return [node for node in nodes if node.get("active", True)]
+
+
+async def aget_user_tasks(acon, project, user, fields=None):
+    query = USER_TASKS_QUERY % selection(resolve_fields(fields) | {"active"})
+    nodes = await _apaged_nodes(acon, query, {"projectName": project, "user": user}, ["project", "tasks"])
+    return _active_tasks(nodes)
+
+
+async def aget_sequence_shots(acon, project, sequence):
+    variables = _sequence_shots_variables(project, sequence)
+    shots = []
+    while True:
+        data = await arun_query(acon, SEQUENCE_SHOTS_QUERY, variables)
+        sequence_id, page, variables["after"] = _sequence_shots_page(data)
+        if sequence_id is None:
+            return None, []
+        shots.extend(page)
+        if variables["after"] is None:
+            return sequence_id, shots
+
+
+async def aget_shot_tasks(acon, project, sequence, shot, fields=None):
+    return _shot_tasks_result(await arun_query(acon, *_shot_tasks_request(project, sequence, shot, fields)))
+
+
+async def aget_project_tasks_page(acon, project, fields=None, first=PAGE_SIZE, after=None, active=True):
+    tasks = []
+    while True:
+        done, after = _project_tasks_result(
+            await arun_query(acon, *_project_tasks_request(project, fields, first, after)), active, first, tasks)
+        if done:
+            return tasks, after
+
+
+async def aget_task(acon, project, task_id, fields=None):
+    return _task_result(await arun_query(acon, *_task_request(project, task_id, fields)))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+import os
+import time
+import queue
+import inspect
+import logging
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from .metrics import track
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AYON_SERVER_URL = os.environ.get("AYON_SERVER_URL")
+AYON_USERNAME = os.environ.get("AYON_USERNAME", "balajid")
+AYON_PASSWORD = os.environ.get("AYON_PASSWORD", "Gotham9!")
+POOL_SIZE = int(os.environ.get("AYON_POOL_SIZE", 8))
+POOL_TIMEOUT = float(os.environ.get("AYON_POOL_TIMEOUT", 30))
+# How long a session may sit in the pool before its token is re-validated
+TOKEN_CHECK_INTERVAL = float(os.environ.get("AYON_TOKEN_CHECK_INTERVAL", 300))
+# Socket timeout of every AYON request and how often one is retried after a
+# timeout, together they bound how long a call holds its session and thread
+REQUEST_TIMEOUT = float(os.environ.get("AYON_REQUEST_TIMEOUT", 10))
+MAX_RETRIES = int(os.environ.get("AYON_MAX_RETRIES", 1))
+
+
+class AyonPoolTimeout(Exception):
+    pass
+
+
+def _transport_errors():
+    # The socket may be half closed after these, the session is not reused
+    import requests
+    from ayon_api.exceptions import ServerNotReached
+    return (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ServerNotReached, ConnectionError)
+
+
+class AyonPool():
+    """Bounded, thread-safe pool of logged in AYON sessions.
+
+    All sessions share one access token, so only the first connection (and a
+    renewal after the token expires) pays for a login round trip.
+    """
+
+    def __init__(self, url=AYON_SERVER_URL, username=AYON_USERNAME, password=AYON_PASSWORD,
+                 size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self._token = os.environ.get("AYON_API_KEY") or None
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # LIFO so the most recently used keep-alive sockets get reused first
+        self._idle = queue.LifoQueue()
+        self._checked_at = {}
+        self._created = 0
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Sockets inherited from a parent process must never be shared
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _login(self, con):
+        from ayon_api.exceptions import UnauthorizedError
+        with self._login_lock:
+            if self._token and self._token != con.access_token:
+                # Another thread already renewed the shared token
+                try:
+                    con.set_token(self._token)
+                except UnauthorizedError:
+                    pass
+                else:
+                    con.create_session()
+                    return
+            logger.info("Logging in to AYON as %s", self.username)
+            with track("ayon", "login"):
+                con.login(self.username, self.password)
+            self._token = con.access_token
+
+    def _connect(self):
+        # ayon_api pulls in requests and the whole client, imported on first use
+        import ayon_api
+        con = ayon_api.ServerAPI(self.url, token=self._token, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES)
+        if not con.has_valid_token:
+            self._login(con)
+        self._checked_at[id(con)] = time.monotonic()
+        return con
+
+    def acquire(self):
+        self._check_fork()
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                con = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise AyonPoolTimeout(f"No AYON session free after {self.timeout}s")
+
+        checked_at = self._checked_at.get(id(con), 0)
+        if time.monotonic() - checked_at > TOKEN_CHECK_INTERVAL:
+            if not con.validate_token():
+                self._login(con)
+            self._checked_at[id(con)] = time.monotonic()
+        return con
+
+    def release(self, con):
+        if self._pid != os.getpid():
+            return
+        self._idle.put(con)
+
+    def discard(self, con):
+        """Close a broken session and free its slot instead of releasing it."""
+        if self._pid != os.getpid():
+            return
+        self._checked_at.pop(id(con), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            con.close_session()
+        except Exception:
+            logger.debug("Closing a discarded AYON session failed", exc_info=True)
+
+    @contextmanager
+    def connection(self):
+        from ayon_api.exceptions import UnauthorizedError
+        con = self.acquire()
+        broken = False
+        try:
+            yield con
+        except UnauthorizedError:
+            # Token expired mid-request, make the next borrower renew it
+            self._checked_at[id(con)] = 0
+            raise
+        except _transport_errors():
+            broken = True
+            raise
+        finally:
+            if broken:
+                self.discard(con)
+            else:
+                self.release(con)
+
+    @property
+    def token(self):
+        return self._token
+
+    def access_token(self, stale=None):
+        """The shared token for clients outside the pool, renewed if it is ``stale``."""
+        with self.connection() as con:
+            if stale is not None and con.access_token == stale:
+                self._login(con)
+            return con.access_token
+
+    def call(self, name, *args, **kwargs):
+        """Run ``ServerAPI.<name>`` on a pooled session, retrying once on an expired token."""
+        from ayon_api.exceptions import UnauthorizedError
+        for attempt in range(2):
+            try:
+                with self.connection() as con, track("ayon", name) as call:
+                    result = getattr(con, name)(*args, **kwargs)
+                    # Drain lazy results while the session is still ours
+                    if inspect.isgenerator(result):
+                        result = list(result)
+                    call.size = len(result) if isinstance(result, (list, dict)) else None
+                    return result
+            except UnauthorizedError:
+                if attempt:
+                    raise
+
+
+class PooledConnection():
+    """Drop-in for ``ayon_api.ServerAPI`` that borrows a pooled session per call."""
+
+    def __init__(self, pool=None):
+        self._pool = pool
+
+    def __getattr__(self, name):
+        pool = self._pool or get_pool()
+
+        def call(*args, **kwargs):
+            return pool.call(name, *args, **kwargs)
+        return call
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AyonPool()
+    return _pool
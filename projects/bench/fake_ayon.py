@@ -0,0 +1,425 @@
+"""In-process stand-in for the AYON server used by the benchmark.
+
+Serves the REST endpoints ayon_api needs to log in plus a small GraphQL
+interpreter covering the queries ayon_api and ayon_graphql send: projects,
+users, events and project { folders, tasks } connections with their filters
+and first/after paging.
+"""
+import re
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVER_VERSION = "1.5.0"
+TOKEN = "benchmark-token"
+STATUSES = ("Not ready", "Ready to start", "In progress", "Pending review", "Approved")
+TASK_TYPES = ("Animation", "Lighting", "Compositing", "FX", "Layout", "Modeling", "Rigging", "Texture")
+
+
+class GraphQLSyntaxError(Exception):
+    pass
+
+
+# Parsing
+
+_TOKEN_RE = re.compile(r'\s*(?:(#[^\n]*)|("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?)|(\$?[_A-Za-z][_0-9A-Za-z]*)|([{}()\[\]:!,=@]))')
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise GraphQLSyntaxError(f"Unexpected input at {pos}: {text[pos:pos + 20]!r}")
+        pos = match.end()
+        comment, string, number, name, punct = match.groups()
+        if comment:
+            continue
+        if string is not None:
+            tokens.append(("str", json.loads(string)))
+        elif number is not None:
+            tokens.append(("num", float(number) if "." in number else int(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append(("punct", punct))
+    return tokens
+
+
+class _Parser():
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise GraphQLSyntaxError(f"Expected {value!r}, got {token[1]!r}")
+        self.pos += 1
+        return token[1]
+
+    def document(self):
+        if self.peek()[1] in ("query", "mutation"):
+            self.take()
+            if self.peek()[0] == "name":
+                self.take()
+            if self.peek()[1] == "(":
+                # Variable definitions, types are not checked
+                depth = 0
+                while True:
+                    value = self.take()
+                    depth += value == "("
+                    depth -= value == ")"
+                    if depth == 0:
+                        break
+        return self.selection_set()
+
+    def selection_set(self):
+        self.take("{")
+        fields = []
+        while self.peek()[1] != "}":
+            fields.append(self.field())
+            if self.peek()[1] == ",":
+                self.take()
+        self.take("}")
+        return fields
+
+    def field(self):
+        name = self.take()
+        alias = name
+        if self.peek()[1] == ":":
+            self.take()
+            name = self.take()
+        args = {}
+        if self.peek()[1] == "(":
+            self.take()
+            while self.peek()[1] != ")":
+                arg = self.take()
+                self.take(":")
+                args[arg] = self.value()
+                if self.peek()[1] == ",":
+                    self.take()
+            self.take(")")
+        selection = self.selection_set() if self.peek()[1] == "{" else None
+        return alias, name, args, selection
+
+    def value(self):
+        kind, value = self.peek()
+        if value == "[":
+            self.take()
+            items = []
+            while self.peek()[1] != "]":
+                items.append(self.value())
+                if self.peek()[1] == ",":
+                    self.take()
+            self.take("]")
+            return items
+        self.take()
+        if kind == "name":
+            if value.startswith("$"):
+                return _Variable(value[1:])
+            return {"true": True, "false": False, "null": None}.get(value, value)
+        return value
+
+
+class _Variable():
+    def __init__(self, name):
+        self.name = name
+
+
+def _bind(value, variables):
+    if isinstance(value, _Variable):
+        return variables.get(value.name)
+    if isinstance(value, list):
+        return [_bind(v, variables) for v in value]
+    return value
+
+
+# Data
+
+class FakeAyonData():
+    """Synthetic shows: projects > sequences > shots > tasks, plus users."""
+
+    def __init__(self):
+        self.projects = {}  # name -> {"name", "active", "folders": {id: folder}, "tasks": {id: task}}
+        self.users = []
+        self.tasks_by_folder = {}
+        self.owner = {}  # folder/task id -> project
+
+    @classmethod
+    def generate(cls, projects=10, sequences=10, shots=200, tasks=10, users=50, extra_users=(), seed=0):
+        """``shots`` is per project, spread over ``sequences`` sequences."""
+        rng = random.Random(seed)
+        data = cls()
+        names = list(extra_users) + [f"artist{i:03d}" for i in range(users)]
+        data.users = [{"name": name, "accessGroups": "{}"} for name in names]
+        counter = 0
+        for p in range(projects):
+            project = {"name": f"PRJ{p:03d}", "active": True, "folders": {}, "tasks": {}}
+            data.projects[project["name"]] = project
+            sequence_ids = []
+            for s in range(sequences):
+                counter += 1
+                folder = {
+                    "id": f"f{counter:012x}", "name": f"sq{(s + 1) * 10:03d}", "folderType": "Sequence",
+                    "parentId": None, "active": True,
+                }
+                folder["path"] = "/" + folder["name"]
+                project["folders"][folder["id"]] = folder
+                data.owner[folder["id"]] = project
+                sequence_ids.append(folder)
+            for i in range(shots):
+                sequence = sequence_ids[i % len(sequence_ids)]
+                counter += 1
+                shot = {
+                    "id": f"f{counter:012x}", "name": f"sh{(i // len(sequence_ids) + 1) * 10:04d}",
+                    "folderType": "Shot", "parentId": sequence["id"], "active": True,
+                }
+                shot["path"] = f"{sequence['path']}/{shot['name']}"
+                project["folders"][shot["id"]] = shot
+                data.owner[shot["id"]] = project
+                for t in range(tasks):
+                    counter += 1
+                    task_type = TASK_TYPES[t % len(TASK_TYPES)]
+                    task = {
+                        "id": f"t{counter:012x}", "name": f"{task_type.lower()}{t // len(TASK_TYPES) or ''}",
+                        "label": None, "taskType": task_type, "status": rng.choice(STATUSES),
+                        "assignees": rng.sample(names, min(2, len(names))), "folderId": shot["id"],
+                        "active": True,
+                        "attrib": {
+                            "startDate": "2025-01-06T00:00:00", "endDate": "2025-02-28T00:00:00",
+                            "frameStart": 1001, "frameEnd": 1001 + rng.randint(24, 240), "fps": 24.0,
+                        },
+                    }
+                    project["tasks"][task["id"]] = task
+                    data.owner[task["id"]] = project
+                    data.tasks_by_folder.setdefault(shot["id"], []).append(task)
+        return data
+
+    def iter_tasks(self):
+        for project in self.projects.values():
+            for task in project["tasks"].values():
+                yield project["name"], task
+
+
+# Resolution
+
+def _connection(items, args, selection, resolve_node):
+    first = args.get("first")
+    start = int(args.get("after") or 0)
+    stop = len(items) if first is None else start + first
+    page = items[start:stop]
+    result = {}
+    for alias, name, _, sub in selection:
+        if name == "edges":
+            edges = []
+            for item in page:
+                edge = {}
+                for edge_alias, edge_name, _, node_selection in sub:
+                    if edge_name == "node":
+                        edge[edge_alias] = resolve_node(item, node_selection)
+                edges.append(edge)
+            result[alias] = edges
+        elif name == "pageInfo":
+            info = {"hasNextPage": stop < len(items), "endCursor": str(stop) if page else None,
+                    "hasPreviousPage": start > 0, "startCursor": str(start)}
+            result[alias] = {a: info.get(n) for a, n, _, _ in sub}
+        elif name == "totalCount":
+            result[alias] = len(items)
+    return result
+
+
+class _Resolver():
+    def __init__(self, data, variables):
+        self.data = data
+        self.variables = variables or {}
+
+    def args(self, args):
+        return {key: _bind(value, self.variables) for key, value in args.items()}
+
+    def plain(self, obj, selection):
+        if selection is None:
+            return obj
+        if obj is None:
+            return None
+        return {alias: self.plain(obj.get(name), sub) for alias, name, _, sub in selection}
+
+    def root(self, selection):
+        result = {}
+        for alias, name, args, sub in selection:
+            args = self.args(args)
+            if name == "project":
+                project = self.data.projects.get(args.get("name"))
+                result[alias] = self.project(project, sub) if project else None
+            elif name == "projects":
+                items = [{"name": p["name"], "active": p["active"]} for p in self.data.projects.values()]
+                result[alias] = _connection(items, args, sub, self.plain)
+            elif name == "users":
+                items = self.data.users
+                if args.get("names"):
+                    items = [user for user in items if user["name"] in args["names"]]
+                result[alias] = _connection(items, args, sub, self.plain)
+            elif name == "events":
+                result[alias] = _connection([], args, sub, self.plain)
+            else:
+                result[alias] = None
+        return result
+
+    def project(self, project, selection):
+        result = {}
+        for alias, name, args, sub in selection:
+            args = self.args(args)
+            if name == "folders":
+                result[alias] = _connection(self.folders(project, args), args, sub, self.folder)
+            elif name == "tasks":
+                result[alias] = _connection(self.tasks(project, args), args, sub, self.task)
+            else:
+                result[alias] = self.plain(project.get(name), sub)
+        return result
+
+    def folders(self, project, args):
+        folders = project["folders"]
+        if args.get("ids") is not None:
+            items = [folders[i] for i in args["ids"] if i in folders]
+        else:
+            items = list(folders.values())
+        if args.get("names") is not None:
+            items = [f for f in items if f["name"] in args["names"]]
+        if args.get("folderTypes") is not None:
+            items = [f for f in items if f["folderType"] in args["folderTypes"]]
+        if args.get("parentIds") is not None:
+            parents = {None if p == "root" else p for p in args["parentIds"]}
+            items = [f for f in items if f["parentId"] in parents]
+        if args.get("pathEx"):
+            pattern = re.compile(args["pathEx"])
+            items = [f for f in items if pattern.search(f["path"].lstrip("/"))]
+        return items
+
+    def tasks(self, project, args, folder=None):
+        tasks = project["tasks"]
+        if folder is not None:
+            items = self.data.tasks_by_folder.get(folder["id"], [])
+        elif args.get("ids") is not None:
+            items = [tasks[i] for i in args["ids"] if i in tasks]
+        elif args.get("folderIds") is not None:
+            items = [t for f in args["folderIds"] for t in self.data.tasks_by_folder.get(f, [])]
+        else:
+            items = list(tasks.values())
+        if args.get("assigneesAny"):
+            wanted = set(args["assigneesAny"])
+            items = [t for t in items if wanted.intersection(t["assignees"])]
+        if args.get("assignees"):
+            wanted = set(args["assignees"])
+            items = [t for t in items if wanted.issubset(t["assignees"])]
+        if args.get("names") is not None:
+            items = [t for t in items if t["name"] in args["names"]]
+        return items
+
+    def folder(self, folder, selection):
+        result = {}
+        for alias, name, args, sub in selection:
+            if name == "tasks":
+                project = self._project_of(folder)
+                args = self.args(args)
+                result[alias] = _connection(self.tasks(project, args, folder), args, sub, self.task)
+            else:
+                result[alias] = self.plain(folder.get(name), sub)
+        return result
+
+    def task(self, task, selection):
+        result = {}
+        for alias, name, _, sub in selection:
+            if name == "folder":
+                project = self._project_of(task)
+                result[alias] = self.plain(project["folders"].get(task["folderId"]), sub)
+            elif name == "allAttrib":
+                result[alias] = json.dumps(task["attrib"])
+            else:
+                result[alias] = self.plain(task.get(name), sub)
+        return result
+
+    def _project_of(self, entity):
+        return self.data.owner[entity["id"]]
+
+
+def execute(data, query, variables=None):
+    try:
+        selection = _Parser(query).document()
+        return {"data": _Resolver(data, variables).root(selection)}
+    except GraphQLSyntaxError as e:
+        return {"data": None, "errors": [{"message": str(e)}]}
+
+
+# HTTP
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    data = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "":
+            # ayon_api probes the base url before logging in
+            self._send(200, {"ayon": SERVER_VERSION})
+        elif path == "/api/info":
+            self._send(200, {"version": SERVER_VERSION, "uptime": 1, "user": {"name": "benchmark"}})
+        elif path == "/api/users/me":
+            self._send(200, {"name": "benchmark", "active": True, "data": {"isAdmin": True}})
+        else:
+            self._send(404, {"detail": f"Not found: {path}"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self._body()
+        if path == "/graphql":
+            self._send(200, execute(self.data, body.get("query", ""), body.get("variables")))
+        elif path == "/api/auth/login":
+            self._send(200, {"token": TOKEN, "user": {"name": body.get("name")}})
+        elif path == "/api/auth/logout":
+            self._send(200, {})
+        else:
+            self._send(404, {"detail": f"Not found: {path}"})
+
+
+class FakeAyonServer():
+    """Threaded HTTP server on localhost serving ``data``."""
+
+    def __init__(self, data, host="127.0.0.1", port=0):
+        handler = type("Handler", (_Handler,), {"data": data})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ayon", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
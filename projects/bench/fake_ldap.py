@@ -0,0 +1,384 @@
+"""In-process stand-in for the LDAP directory used by tests and login benchmarks.
+
+Speaks enough LDAPv3 (BER over TCP) for django_auth_ldap and python-ldap:
+simple binds, searches with and/or/not, equality, substring, presence and
+ordering filters over base, one-level and subtree scopes, abandon and unbind.
+Counts binds and searches so callers can check what a login cost.
+"""
+import threading
+import socketserver
+
+BASE_DN = "dc=example,dc=com"
+PEOPLE_DN = f"ou=people,{BASE_DN}"
+GROUPS_DN = f"ou=groups,{BASE_DN}"
+PASSWORD = "benchmark"
+BIND_DN = f"cn=admin,{BASE_DN}"
+
+SUCCESS = 0
+OPERATIONS_ERROR = 1
+PROTOCOL_ERROR = 2
+NO_SUCH_OBJECT = 32
+INVALID_CREDENTIALS = 49
+UNWILLING_TO_PERFORM = 53
+
+SCOPE_BASE, SCOPE_ONELEVEL, SCOPE_SUBTREE = 0, 1, 2
+
+
+class BERError(Exception):
+    pass
+
+
+# BER encoding
+
+
+def _length(n):
+    if n < 0x80:
+        return bytes([n])
+    raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def _tlv(tag, content):
+    return bytes([tag]) + _length(len(content)) + content
+
+
+def _int(value, tag=0x02):
+    raw = value.to_bytes(max(1, (value.bit_length() + 8) // 8), "big", signed=True)
+    return _tlv(tag, raw)
+
+
+def _str(value, tag=0x04):
+    return _tlv(tag, value.encode() if isinstance(value, str) else value)
+
+
+def _seq(*items, tag=0x30):
+    return _tlv(tag, b"".join(items))
+
+
+def _result(tag, code, message=""):
+    return _seq(_int(code, 0x0A), _str(""), _str(message), tag=tag)
+
+
+# BER decoding
+
+
+def _read_tlv(data, pos):
+    if pos + 2 > len(data):
+        raise BERError("truncated element")
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[pos:pos + size], "big")
+        pos += size
+    end = pos + length
+    if end > len(data):
+        raise BERError("truncated element")
+    return tag, data[pos:end], end
+
+
+def _children(content):
+    items = []
+    pos = 0
+    while pos < len(content):
+        tag, value, pos = _read_tlv(content, pos)
+        items.append((tag, value))
+    return items
+
+
+def _to_int(raw):
+    return int.from_bytes(raw, "big", signed=True) if raw else 0
+
+
+def _message_length(buffer):
+    # Bytes needed for the next complete LDAPMessage, None if the header is incomplete
+    if len(buffer) < 2:
+        return None
+    length = buffer[1]
+    if not length & 0x80:
+        return 2 + length
+    size = length & 0x7F
+    if len(buffer) < 2 + size:
+        return None
+    return 2 + size + int.from_bytes(buffer[2:2 + size], "big")
+
+
+# Directory
+
+
+def _norm_dn(dn):
+    return ",".join(part.strip().lower() for part in dn.split(",") if part.strip())
+
+
+class Entry():
+    def __init__(self, dn, attrs):
+        self.dn = dn
+        self.norm = _norm_dn(dn)
+        # Attribute names are case-insensitive, values are kept as given
+        self.attrs = {name.lower(): (name, [str(v) for v in values]) for name, values in attrs.items()}
+
+    def values(self, name):
+        return self.attrs.get(name.lower(), (name, []))[1]
+
+
+class FakeLDAPDirectory():
+    """Entries keyed on their normalized DN, plus the bind password of each."""
+
+    def __init__(self, base_dn=BASE_DN):
+        self.base_dn = base_dn
+        self.entries = {}
+        self.passwords = {}
+        self._lock = threading.Lock()
+
+    def add(self, dn, password=None, **attrs):
+        entry = Entry(dn, attrs)
+        with self._lock:
+            self.entries[entry.norm] = entry
+            if password is not None:
+                self.passwords[entry.norm] = password
+        return entry
+
+    def remove(self, dn):
+        with self._lock:
+            self.entries.pop(_norm_dn(dn), None)
+            self.passwords.pop(_norm_dn(dn), None)
+
+    def set_password(self, dn, password):
+        with self._lock:
+            self.passwords[_norm_dn(dn)] = password
+
+    def check_password(self, dn, password):
+        with self._lock:
+            expected = self.passwords.get(_norm_dn(dn))
+        return expected is not None and expected == password
+
+    def search(self, base, scope, match):
+        base = _norm_dn(base)
+        with self._lock:
+            entries = list(self.entries.values())
+        found = []
+        for entry in entries:
+            if scope == SCOPE_BASE:
+                inside = entry.norm == base
+            elif scope == SCOPE_ONELEVEL:
+                inside = entry.norm.endswith("," + base) and entry.norm.count(",") == base.count(",") + 1
+            else:
+                inside = not base or entry.norm == base or entry.norm.endswith("," + base)
+            if inside and match(entry):
+                found.append(entry)
+        return found
+
+    @classmethod
+    def generate(cls, users=50, groups=("artists", "leads", "admins"), password=PASSWORD, usernames=()):
+        """``users`` people in ou=people, each in the first group and every
+        fifth one in the others, plus a bind account ``BIND_DN``."""
+        directory = cls()
+        directory.add(BASE_DN, objectClass=["top", "domain"], dc=["example"])
+        directory.add(PEOPLE_DN, objectClass=["organizationalUnit"], ou=["people"])
+        directory.add(GROUPS_DN, objectClass=["organizationalUnit"], ou=["groups"])
+        directory.add(BIND_DN, password=password, objectClass=["person"], cn=["admin"], sn=["admin"])
+        names = list(usernames) + [f"user{i:04d}" for i in range(max(0, users - len(usernames)))]
+        members = {group: [] for group in groups}
+        for i, name in enumerate(names):
+            dn = f"uid={name},{PEOPLE_DN}"
+            directory.add(
+                dn, password=password,
+                objectClass=["inetOrgPerson"], uid=[name], cn=[name], sn=[name],
+                givenName=[name.title()], mail=[f"{name}@example.com"],
+            )
+            for j, group in enumerate(groups):
+                if j == 0 or i % 5 == 0:
+                    members[group].append(dn)
+        for group, dns in members.items():
+            directory.add(f"cn={group},{GROUPS_DN}", objectClass=["groupOfNames"], cn=[group], member=dns)
+        return directory
+
+
+# Filters
+
+
+def _compile_filter(tag, content):
+    if tag == 0xA0:
+        parts = [_compile_filter(t, v) for t, v in _children(content)]
+        return lambda entry: all(part(entry) for part in parts)
+    if tag == 0xA1:
+        parts = [_compile_filter(t, v) for t, v in _children(content)]
+        return lambda entry: any(part(entry) for part in parts)
+    if tag == 0xA2:
+        (inner_tag, inner), = _children(content)
+        inner_match = _compile_filter(inner_tag, inner)
+        return lambda entry: not inner_match(entry)
+    if tag == 0x87:
+        name = content.decode()
+        if name.lower() == "objectclass":
+            return lambda entry: True
+        return lambda entry: bool(entry.values(name))
+    if tag in (0xA3, 0xA5, 0xA6, 0xA8):
+        (_, name), (_, value) = _children(content)
+        name, value = name.decode(), value.decode().lower()
+        if tag == 0xA5:
+            return lambda entry: any(v.lower() >= value for v in entry.values(name))
+        if tag == 0xA6:
+            return lambda entry: any(v.lower() <= value for v in entry.values(name))
+        # DN valued attributes (member) compare on the normalized DN
+        value_norm = _norm_dn(value)
+        return lambda entry: any(v.lower() == value or _norm_dn(v) == value_norm for v in entry.values(name))
+    if tag == 0xA4:
+        (_, name), (_, subs) = _children(content)
+        name = name.decode()
+        parts = [(t, v.decode().lower()) for t, v in _children(subs)]
+
+        def substrings(entry):
+            for value in entry.values(name):
+                value = value.lower()
+                pos = 0
+                ok = True
+                for t, part in parts:
+                    if t == 0x80:
+                        ok = value.startswith(part)
+                        pos = len(part)
+                    elif t == 0x81:
+                        found = value.find(part, pos)
+                        ok = found >= 0
+                        pos = found + len(part)
+                    else:
+                        ok = value.endswith(part) and len(value) - len(part) >= pos
+                    if not ok:
+                        break
+                if ok:
+                    return True
+            return False
+        return substrings
+    raise BERError(f"unsupported filter 0x{tag:02x}")
+
+
+# Server
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    directory = None
+    stats = None
+
+    def handle(self):
+        buffer = b""
+        while True:
+            size = _message_length(buffer)
+            while size is None or len(buffer) < size:
+                chunk = self.request.recv(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+                size = _message_length(buffer)
+            message, buffer = buffer[:size], buffer[size:]
+            try:
+                _, content, _ = _read_tlv(message, 0)
+                items = _children(content)
+                message_id = _to_int(items[0][1])
+                tag, op = items[1]
+            except (BERError, IndexError):
+                return
+            if tag == 0x42:
+                return
+            for reply in self.dispatch(tag, op):
+                self.request.sendall(_seq(_int(message_id), reply))
+
+    def dispatch(self, tag, op):
+        if tag == 0x60:
+            return [self.bind(op)]
+        if tag == 0x63:
+            return self.search(op)
+        if tag == 0x50:
+            return []
+        if tag == 0x77:
+            return [_result(0x78, PROTOCOL_ERROR, "extended operations are not supported")]
+        return [_result(0x65, UNWILLING_TO_PERFORM, f"operation 0x{tag:02x} is not supported")]
+
+    def count(self, name):
+        with self.stats["lock"]:
+            self.stats[name] += 1
+
+    def bind(self, op):
+        self.count("binds")
+        items = _children(op)
+        name = items[1][1].decode()
+        auth_tag, password = items[2]
+        if auth_tag != 0x80:
+            return _result(0x61, UNWILLING_TO_PERFORM, "only simple binds are supported")
+        if not name and not password:
+            return _result(0x61, SUCCESS)
+        if self.directory.check_password(name, password.decode()):
+            return _result(0x61, SUCCESS)
+        return _result(0x61, INVALID_CREDENTIALS, "invalid credentials")
+
+    def search(self, op):
+        self.count("searches")
+        items = _children(op)
+        base = items[0][1].decode()
+        scope = _to_int(items[1][1])
+        size_limit = _to_int(items[3][1])
+        types_only = bool(items[5][1] and items[5][1][0])
+        try:
+            match = _compile_filter(*items[6])
+        except BERError as e:
+            return [_result(0x65, PROTOCOL_ERROR, str(e))]
+        wanted = {v.decode().lower() for _, v in _children(items[7][1])} if len(items) > 7 else set()
+        if _norm_dn(base) not in self.directory.entries and _norm_dn(base) != "":
+            return [_result(0x65, NO_SUCH_OBJECT, f"{base} does not exist")]
+
+        replies = []
+        for entry in self.directory.search(base, scope, match):
+            attrs = []
+            for key, (name, values) in entry.attrs.items():
+                if wanted and "*" not in wanted and key not in wanted:
+                    continue
+                vals = b"" if types_only else b"".join(_str(v) for v in values)
+                attrs.append(_seq(_str(name), _tlv(0x31, vals)))
+            replies.append(_seq(_str(entry.dn), _seq(*attrs), tag=0x64))
+            if size_limit and len(replies) >= size_limit:
+                break
+        replies.append(_result(0x65, SUCCESS))
+        return replies
+
+
+class FakeLDAPServer():
+    """Threaded LDAP server on localhost serving ``directory``."""
+
+    def __init__(self, directory, host="127.0.0.1", port=0):
+        self.directory = directory
+        self.stats = {"binds": 0, "searches": 0, "lock": threading.Lock()}
+        handler = type("Handler", (_Handler,), {"directory": directory, "stats": self.stats})
+        self.server = socketserver.ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-ldap", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"ldap://{host}:{port}"
+
+    def counts(self):
+        return {"binds": self.stats["binds"], "searches": self.stats["searches"]}
+
+    def django_settings(self, password=PASSWORD):
+        """AUTH_LDAP_* settings pointing django_auth_ldap at this server."""
+        import ldap
+        from django_auth_ldap.config import GroupOfNamesType, LDAPSearch
+        return {
+            "AUTH_LDAP_SERVER_URI": self.url,
+            "AUTH_LDAP_BIND_DN": BIND_DN,
+            "AUTH_LDAP_BIND_PASSWORD": password,
+            "AUTH_LDAP_USER_SEARCH": LDAPSearch(PEOPLE_DN, ldap.SCOPE_SUBTREE, "(uid=%(user)s)"),
+            "AUTH_LDAP_GROUP_SEARCH": LDAPSearch(GROUPS_DN, ldap.SCOPE_SUBTREE, "(objectClass=groupOfNames)"),
+            "AUTH_LDAP_GROUP_TYPE": GroupOfNamesType(),
+            "AUTH_LDAP_USER_ATTR_MAP": {"first_name": "givenName", "last_name": "sn", "email": "mail"},
+            "AUTH_LDAP_MIRROR_GROUPS": True,
+        }
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
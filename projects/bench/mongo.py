@@ -0,0 +1,116 @@
+"""Mongo stand-ins for the benchmark and synthetic timecard data."""
+import os
+import sys
+import time
+import random
+import shutil
+import socket
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+import pymongo
+
+DEPARTMENTS = ("anim", "comp", "fx", "layout", "lighting", "model", "rig")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MongoStandIn():
+    """Throwaway mongod on a temp dbpath, or mongomock when no binary is given.
+
+    mongomock has no $out/$merge and no async client, so the rollup
+    summaries and the async views need a real mongod.
+
+    Must be started before ``projects.iotc`` creates its client, which reads
+    the connection settings on first use.
+    """
+
+    def __init__(self, mongod=None):
+        self.mongod = mongod
+        self.process = None
+        self.dbpath = None
+        self.kind = "mongod" if mongod else "mongomock"
+
+    def start(self, timeout=30):
+        iotc = sys.modules.get("projects.iotc")
+        if iotc is not None and iotc._client is not None:
+            raise RuntimeError("projects.iotc already has a client, start the stand-in first")
+        if not self.mongod:
+            import mongomock
+            pymongo.MongoClient = mongomock.MongoClient
+            os.environ["mongo_url"] = "localhost"
+            os.environ["port"] = "27017"
+            return self
+
+        port = _free_port()
+        self.dbpath = tempfile.mkdtemp(prefix="iospace-bench-")
+        self.process = subprocess.Popen(
+            [self.mongod, "--dbpath", self.dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL,
+        )
+        client = pymongo.MongoClient("127.0.0.1", port, serverSelectionTimeoutMS=500)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                client.admin.command("ping")
+                break
+            except pymongo.errors.PyMongoError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError(f"mongod did not come up on port {port}")
+                time.sleep(0.2)
+        client.close()
+        os.environ["mongo_url"] = "127.0.0.1"
+        os.environ["port"] = str(port)
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+            self.process = None
+        if self.dbpath:
+            shutil.rmtree(self.dbpath, ignore_errors=True)
+            self.dbpath = None
+
+
+def seed_time_data(collection, data, rows, batch_size=10000, seed=0, start=datetime(2024, 1, 1)):
+    """Insert ``rows`` v2 time_data entries booked on the fake AYON tasks."""
+    rng = random.Random(seed)
+    tasks = list(data.iter_tasks())
+    collection.delete_many({})
+    inserted = 0
+    while inserted < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - inserted)):
+            project, task = rng.choice(tasks)
+            day = start + timedelta(days=rng.randrange(365))
+            begin = rng.randrange(8 * 3600, 18 * 3600)
+            seconds = rng.randrange(15 * 60, 4 * 3600)
+            batch.append({
+                "login": rng.choice(task["assignees"]),
+                "date": day,
+                "day": day.strftime("%A"),
+                "task": {"task": f"Task: {task['name']}, ID: {task['id']}, Project: {project}"},
+                "task_id": task["id"],
+                "start_time": _clock(begin),
+                "stop_time": _clock(begin + seconds),
+                "work_time": _clock(seconds),
+                "work_seconds": seconds,
+                "system_id": f"ws{rng.randrange(400):04d}",
+                "department": rng.choice(DEPARTMENTS),
+                "project": [project],
+                "schema_version": 2,
+            })
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def _clock(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
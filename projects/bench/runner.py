@@ -0,0 +1,190 @@
+"""Drive the app's URLs over HTTP at fixed concurrency and summarise latency."""
+import re
+import math
+import time
+import socket
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+
+# Routes that are not app pages, or only take authenticated writes
+SKIP_ROUTES = {"login", "logout", "time_data_ingest", "jobs", "job_detail"}
+# Served from the daily rollup, which mongomock cannot build ($out/$merge)
+ROLLUP_ROUTES = {"time_data_summary", "time_data_summary_json"}
+# Extra variants of routes whose cost depends on the query string
+EXTRA_QUERIES = {
+    "time_data": ["?paging=cursor", "?login=artist001&page=3"],
+    "time_data_export": ["?login=artist001&format=ndjson"],
+    "time_data_summary": ["?group=department&period=month"],
+}
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class AppServer():
+    """The Django WSGI application on a local threaded server."""
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        self.httpd = make_server(host, port, app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="bench-app", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class AsgiAppServer():
+    """The Django ASGI application under uvicorn, its event loop in a thread.
+
+    Async views only show their behaviour here, the WSGI server runs each
+    of them in a fresh event loop per request.
+    """
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        import uvicorn
+        if not port:
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.host = host
+        self.port = port
+        config = uvicorn.Config(app, host=host, port=port, lifespan="off", log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, name="bench-asgi-app", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout=30):
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"uvicorn did not start on {self.url}")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+def discover_urls(urlpatterns, sample, skip=()):
+    """Every route in ``urlpatterns`` with its converters filled from ``sample``.
+
+    Routes are labelled by URL name, or by path where several share one.
+    """
+    names = [getattr(pattern, "name", None) for pattern in urlpatterns]
+    urls = []
+    for pattern in urlpatterns:
+        route = str(pattern.pattern)
+        name = getattr(pattern, "name", None)
+        if not hasattr(pattern, "callback") or name in SKIP_ROUTES or name in skip or route.startswith(("admin", "^")):
+            continue
+        try:
+            path = "/" + re.sub(r"<(?:\w+:)?(\w+)>", lambda m: sample[m.group(1)], route)
+        except KeyError as e:
+            raise KeyError(f"No sample value for {e} in route {route!r}")
+        label = name if name and names.count(name) == 1 else path
+        urls.append((label, path))
+        for query in EXTRA_QUERIES.get(name, []):
+            urls.append((f"{label}{query}", path + query))
+    return urls
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest rank
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def bench_peak_rss_mb():
+    """Peak RSS of this whole process, not of the app alone.
+
+    The app server, the fake AYON and LDAP servers and the load threads all
+    run here, so this only shows growth between runs of the same benchmark.
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_level(base_url, path, concurrency, requests_total, timeout=60):
+    """``requests_total`` GETs of ``path`` spread over ``concurrency`` threads."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = [requests_total]
+
+    def worker():
+        nonlocal errors
+        session = requests.Session()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            failed = False
+            try:
+                response = session.get(base_url + path, timeout=timeout)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "rps": round(len(latencies) / wall, 1) if wall else None,
+        "bench_peak_rss_mb": round(bench_peak_rss_mb(), 1),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def format_table(results):
+    headers = ("url", "conc", "reqs", "errs", "p50 ms", "p95 ms", "p99 ms", "req/s", "bench rss MB")
+    rows = [(r["url"], r["concurrency"], r["requests"], r["errors"], r["p50_ms"], r["p95_ms"],
+             r["p99_ms"], r["rps"], r["bench_peak_rss_mb"]) for r in results]
+    widths = [max(len(str(v)) for v in column) for column in zip(headers, *rows)]
+    lines = ["  ".join(str(v).ljust(w) for v, w in zip(headers, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    for row in rows:
+        lines.append("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+    return "\n".join(lines)
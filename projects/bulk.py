@@ -0,0 +1,174 @@
+import os
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Operations per AYON operations request
+CHUNK_SIZE = int(os.environ.get("AYON_BULK_CHUNK_SIZE", 500))
+
+# Manifest column -> folder attribute, camelCase names are accepted too
+ATTRIB_COLUMNS = {
+    "frame_start": "frameStart",
+    "frame_end": "frameEnd",
+    "handle_start": "handleStart",
+    "handle_end": "handleEnd",
+    "clip_in": "clipIn",
+    "clip_out": "clipOut",
+    "fps": "fps",
+}
+
+
+class ManifestError(Exception):
+    pass
+
+
+def _attribs(row):
+    attribs = {}
+    for column, attrib in ATTRIB_COLUMNS.items():
+        value = row.get(column, row.get(attrib))
+        if value in (None, ""):
+            continue
+        try:
+            attribs[attrib] = float(value) if attrib == "fps" else int(value)
+        except (TypeError, ValueError):
+            raise ManifestError(f"{column} must be a number, got {value!r}")
+    return attribs
+
+
+def _flatten(data):
+    # {"sequences": [{"name": ..., "shots": [...]}]} -> one row per shot
+    rows = []
+    for sequence in data.get("sequences", []):
+        shots = sequence.get("shots") or []
+        if not shots:
+            rows.append({"sequence": sequence["name"]})
+        for shot in shots:
+            rows.append(dict(shot, sequence=sequence["name"], shot=shot["name"]))
+    return rows
+
+
+def read_manifest(path, fmt=None):
+    """Rows of ``{"sequence", "shot", <attributes>}`` from a CSV or JSON manifest.
+
+    JSON is either a list of rows or ``{"sequences": [{"name", "shots": [...]}]}``.
+    Rows without a shot only create the sequence.
+    """
+    fmt = fmt or ("json" if path.lower().endswith(".json") else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "json":
+            data = json.load(f)
+            raw = _flatten(data) if isinstance(data, dict) else data
+        else:
+            raw = list(csv.DictReader(f))
+
+    rows = []
+    for line, row in enumerate(raw, 1):
+        sequence = (row.get("sequence") or "").strip()
+        if not sequence:
+            raise ManifestError(f"row {line}: sequence is required")
+        try:
+            attribs = _attribs(row)
+        except ManifestError as e:
+            raise ManifestError(f"row {line}: {e}")
+        rows.append({"sequence": sequence, "shot": (row.get("shot") or "").strip() or None, "attrib": attribs})
+    return rows
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _create_op(entity):
+    from ayon_api.utils import create_entity_id
+    return {"id": create_entity_id(), "type": "create", "entityType": "folder", "entityId": entity["id"], "data": entity}
+
+
+def _send(con, project, ops, report_by_op):
+    # can_fail lets the server apply every valid operation and report the rest
+    try:
+        results = con.send_batch_operations(project, ops, can_fail=True, raise_on_fail=False)
+    except Exception as e:
+        for op in ops:
+            report_by_op[op["id"]].update(status="failed", error=str(e))
+        return
+    results_by_id = {result.get("id"): result for result in results or []}
+    for op in ops:
+        result = results_by_id.get(op["id"])
+        item = report_by_op[op["id"]]
+        if result is not None and result.get("success"):
+            item["status"] = "created"
+        else:
+            item.update(status="failed", error=(result or {}).get("detail") or "no result from server")
+
+
+def bulk_create(con, project, rows, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Create the sequences and shots of a manifest with batched operations.
+
+    Existing folders are resolved with one query and skipped, so a manifest
+    can be re-run after a partial failure. Sequences are sent before the
+    shots that need them. Returns one report item per sequence and shot with
+    ``status`` "created", "exists", "failed" (with ``error``) or "planned"
+    for a dry run.
+    """
+    from ayon_api.operations import new_folder_entity
+    existing = list(con.get_folders(project, folder_types=["Sequence", "Shot"], fields={"id", "name", "folderType", "parentId"}))
+    sequence_ids = {}
+    for folder in existing:
+        # First folder with the name wins, like get_folder_by_name
+        if folder.get("folderType") == "Sequence":
+            sequence_ids.setdefault(folder["name"], folder["id"])
+    existing_shots = {(f.get("parentId"), f["name"]): f["id"] for f in existing if f.get("folderType") == "Shot"}
+
+    report = []
+    sequence_items = {}
+    sequence_ops = []
+    shot_ops = []
+    report_by_op = {}
+    for row in rows:
+        name = row["sequence"]
+        if name not in sequence_items:
+            item = {"sequence": name, "shot": None, "id": sequence_ids.get(name), "status": "exists"}
+            if item["id"] is None:
+                entity = new_folder_entity(name, "Sequence")
+                item.update(id=entity["id"], status="planned")
+                sequence_ids[name] = entity["id"]
+                op = _create_op(entity)
+                sequence_ops.append(op)
+                report_by_op[op["id"]] = item
+            sequence_items[name] = item
+            report.append(item)
+
+        shot = row["shot"]
+        if shot is None:
+            continue
+        parent_id = sequence_ids[name]
+        item = {"sequence": name, "shot": shot, "id": existing_shots.get((parent_id, shot)), "status": "exists"}
+        report.append(item)
+        if item["id"] is not None:
+            continue
+        entity = new_folder_entity(shot, "Shot", parent_id=parent_id, attribs=row["attrib"])
+        existing_shots[(parent_id, shot)] = entity["id"]
+        item.update(id=entity["id"], status="planned")
+        op = _create_op(entity)
+        shot_ops.append((name, op))
+        report_by_op[op["id"]] = item
+
+    if dry_run:
+        return report
+
+    for chunk in _chunks(sequence_ops, chunk_size):
+        _send(con, project, chunk, report_by_op)
+    # Shots whose sequence could not be created are not sent
+    ready = []
+    for name, op in shot_ops:
+        parent = sequence_items[name]
+        if parent["status"] == "failed":
+            report_by_op[op["id"]].update(status="failed", error=f"sequence {name} was not created")
+        else:
+            ready.append(op)
+    for chunk in _chunks(ready, chunk_size):
+        _send(con, project, chunk, report_by_op)
+    return report
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+import os
+import time
+import pickle
+import asyncio
+import inspect
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds each dd_io read stays cached, overridable per method from the env
+TTLS = {
+    "projects": float(os.environ.get("AYON_CACHE_TTL_PROJECTS", 300)),
+    "users": float(os.environ.get("AYON_CACHE_TTL_USERS", 300)),
+    "sequences": float(os.environ.get("AYON_CACHE_TTL_SEQUENCES", 120)),
+    "shots": float(os.environ.get("AYON_CACHE_TTL_SHOTS", 60)),
+    "tasks": float(os.environ.get("AYON_CACHE_TTL_TASKS", 60)),
+    "shot_tasks": float(os.environ.get("AYON_CACHE_TTL_TASKS", 60)),
+    "task": float(os.environ.get("AYON_CACHE_TTL_TASK", 60)),
+    "user_tasks": float(os.environ.get("AYON_CACHE_TTL_USER_TASKS", 60)),
+}
+PAGE_TTL = float(os.environ.get("IOSPACE_PAGE_CACHE_TTL", 300))
+MAX_ENTRIES = int(os.environ.get("AYON_CACHE_MAX_ENTRIES", 4096))
+MAX_BYTES = int(os.environ.get("AYON_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def _sizeof(value):
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+class Tagged():
+    """Loader result carrying the tags (e.g. entity ids) an entry depends on."""
+
+    def __init__(self, value, tags=()):
+        self.value = value
+        self.tags = set(tags)
+
+
+def tagged(value, *tags):
+    return Tagged(value, tags)
+
+
+class _Flight():
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache():
+    """Thread-safe LRU cache with per-entry TTLs and a byte budget.
+
+    Concurrent misses on the same key are coalesced: the first caller runs
+    the loader and everyone else waits for its result. Loaders may return a
+    ``Tagged`` value so entries can later be dropped with ``invalidate_tag``.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._inflight = {}
+        self._ainflight = {}  # (event loop, key) -> task running the coroutine loader
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        expires_at, size, value, tags = self._data.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                return default
+            self._data.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, ttl, tags=()):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._store(key, value, ttl, size, tags)
+
+    def _store(self, key, value, ttl, size, tags=()):
+        if key in self._data:
+            self._drop(key)
+        tags = frozenset(tags)
+        self._data[key] = (time.monotonic() + ttl, size, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self.bytes += size
+        while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl, tags=()):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._drop(key)
+                self.expirations += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+            if isinstance(value, Tagged):
+                tags = value.tags | set(tags)
+                value = value.value
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+        size = _sizeof(flight.value)
+        with self._lock:
+            # Skip the store if an invalidation raced with the load
+            if generation == self._generation and size <= self.max_bytes:
+                self._store(key, flight.value, ttl, size, tags)
+        return flight.value
+
+    async def aget_or_load(self, key, loader, ttl, tags=()):
+        """``get_or_load`` for coroutine loaders.
+
+        Concurrent misses on one event loop await the same load, which runs
+        as its own task so a cancelled caller does not cancel it for the rest.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._drop(key)
+                self.expirations += 1
+            flight = self._ainflight.get((loop, key))
+            if flight is None:
+                flight = loop.create_task(self._aload(loop, key, loader, ttl, tags, self._generation))
+                self._ainflight[(loop, key)] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    async def _aload(self, loop, key, loader, ttl, tags, generation):
+        try:
+            value = await loader()
+        finally:
+            with self._lock:
+                self._ainflight.pop((loop, key), None)
+        if isinstance(value, Tagged):
+            tags = value.tags | set(tags)
+            value = value.value
+        size = _sizeof(value)
+        with self._lock:
+            # Skip the store if an invalidation raced with the load
+            if generation == self._generation and size <= self.max_bytes:
+                self._store(key, value, ttl, size, tags)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if key in self._data:
+                self._drop(key)
+
+    def invalidate_prefix(self, prefix):
+        """Drop every entry whose tuple key starts with ``prefix``."""
+        n = len(prefix)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._data if k[:n] == prefix]:
+                self._drop(key)
+
+    def invalidate_tag(self, tag):
+        """Drop every entry tagged with ``tag``, returns how many were dropped."""
+        with self._lock:
+            self._generation += 1
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "tags": len(self._tags),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+hierarchy_cache = TTLCache()
+# Rendered hierarchy pages keyed on (path, etag)
+page_cache = TTLCache(max_entries=1024, max_bytes=16 * 1024 * 1024)
+
+
+def _freeze(value):
+    if isinstance(value, (set, list, tuple)):
+        return frozenset(value)
+    return value
+
+
+def cached(name, *attrs):
+    """Cache a dd_io read method under ``(name, *[self.<attr>], *args, *kwargs)``.
+
+    Entries keyed on a project are also tagged ``("project", self.project)``.
+    Instances reading from the local replica (``self.use_replica``) bypass it.
+    """
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                if getattr(self, "use_replica", False):
+                    value = await method(self, *args, **kwargs)
+                    return value.value if isinstance(value, Tagged) else value
+                key = (name,) + tuple(getattr(self, a) for a in attrs) + args
+                key += tuple((k, _freeze(v)) for k, v in sorted(kwargs.items()))
+                tags = [("project", self.project)] if "project" in attrs else []
+                return await hierarchy_cache.aget_or_load(
+                    key, lambda: method(self, *args, **kwargs), TTLS[name], tags)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            # Replica reads are local and kept current by the sync, no need to cache them
+            if getattr(self, "use_replica", False):
+                value = method(self, *args, **kwargs)
+                return value.value if isinstance(value, Tagged) else value
+            key = (name,) + tuple(getattr(self, a) for a in attrs) + args
+            key += tuple((k, _freeze(v)) for k, v in sorted(kwargs.items()))
+            tags = [("project", self.project)] if "project" in attrs else []
+            return hierarchy_cache.get_or_load(key, lambda: method(self, *args, **kwargs), TTLS[name], tags)
+        return wrapper
+    return decorator
@@ -1,85 +1,340 @@
 #!/usr/bin/env python
 import os
-import ayon_api
+import logging
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+from asgiref.sync import sync_to_async
 from pprint import pprint
 from dotenv import load_dotenv
+from .ayon_pool import PooledConnection
+from .ayon_async import AsyncAyonConnection
+from .metrics import instrument_methods
+from .cache import cached, tagged, hierarchy_cache
+from .ayon_graphql import get_sequence_shots, get_shot_tasks, get_task, resolve_fields
+from .ayon_graphql import get_project_tasks_page
+from .ayon_graphql import aget_projects, aget_users, aget_sequences, aget_sequence_shots
+from .ayon_graphql import aget_shot_tasks, aget_project_tasks_page, aget_task, aget_user_tasks
+from .task_index import forget_task, lookup_project, record_task, alookup_project
+from .bulk import bulk_create
+from . import replica
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+FANOUT_WORKERS = int(os.environ.get("AYON_FANOUT_WORKERS", 8))
+FANOUT_TIMEOUT = float(os.environ.get("AYON_FANOUT_TIMEOUT", 10))
+TASK_PAGE_SIZE = int(os.environ.get("AYON_TASK_PAGE_SIZE", 100))
+# Serve reads from the local replica (manage.py sync_ayon) once it is loaded
+REPLICA_READS = os.environ.get("AYON_REPLICA_READS", "0") == "1"
+
+_fanout = None
+_fanout_lock = threading.Lock()
+
+
+def _get_fanout():
+    global _fanout
+    if _fanout is None:
+        with _fanout_lock:
+            if _fanout is None:
+                _fanout = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="ayon-fanout")
+    return _fanout
+
+
+@instrument_methods()
 class dd_io():
     def __init__(self, project=None, seq = None, shot = None , user= None):
         self.project = project
         self.seq = seq
         self.shot = shot
         self.user = user
-        self.con = ayon_api.GlobalServerAPI()
-        self.con.login("balajid", "Gotham9!")
+        # Sessions are borrowed from the shared pool per call, no login here
+        self.con = PooledConnection()
+        self.acon = AsyncAyonConnection()
+        self.use_replica = REPLICA_READS and replica.is_ready()
 
 
+    @cached("projects")
     def io_get_projects(self):
-        ayon_projects = self.con.get_projects()
+        if self.use_replica:
+            return replica.projects()
+        ayon_projects = self.con.get_projects(fields={"name"})
         projects = []
         for project in ayon_projects:
             projects.append(project["name"])
         return projects
 
+    @cached("users")
     def io_get_users(self):
-        ayon_users = self.con.get_users()
+        if self.use_replica:
+            return replica.users()
+        ayon_users = self.con.get_users(fields={"name", "accessGroups"})
         users = []
         for user in ayon_users:
             users.append(user["name"])
         return users
         
-    def io_get_tasks(self):
-        shot_id = self.io_get_shot_id()
+    def io_get_tasks_page(self, after=None, limit=TASK_PAGE_SIZE, fields=None, fallback=True):
+        """One page of the shot's or project's tasks, returns ``(tasks, next_cursor)``.
+
+        A resolved shot returns all of its tasks at once, the project-wide
+        fallback pages with AYON GraphQL cursors. Without ``fallback`` a
+        shot that does not resolve returns ``(None, None)``.
+        """
+        fields = resolve_fields(fields)
+        shot_id, tasks = self._get_shot_tasks(fields)
         if shot_id is not None:
-            ayon_tasks = self.con.get_tasks(self.project, folder_ids = [shot_id])
-        else:
-            ayon_tasks = self.con.get_tasks(self.project)
-        tasks = []
-        for task in ayon_tasks:
-            tasks.append(task)
-        return tasks
-
-    def io_get_task(self, task_id):
-        if task_id is not None:
-            ayon_tasks = self.con.get_tasks("HYD", task_ids = task_id)
-        else :
+            return tasks, None
+        if not fallback:
+            return None, None
+        if self.use_replica:
+            return replica.tasks_page(self.project, fields, limit, after)
+        return get_project_tasks_page(self.con, self.project, fields, limit, after)
+
+    @cached("shot_tasks", "project", "seq", "shot")
+    def _get_shot_tasks(self, fields):
+        if self.seq is None or self.shot is None:
+            return None, []
+        if self.use_replica:
+            return replica.shot_tasks(self.project, self.seq, self.shot, fields)
+        shot_id, tasks = get_shot_tasks(self.con, self.project, self.seq, self.shot, fields)
+        if shot_id is None:
+            return tagged((None, []), ("tasks", self.project))
+        tags = [("folder", shot_id), ("tasks_of", shot_id)] + [("task", task["id"]) for task in tasks]
+        return tagged((shot_id, tasks), *tags)
+
+    @cached("task")
+    def io_get_task(self, task_id, fields=None):
+        if task_id is None:
             print("Please check for task ID")
             return None
-        tasks = []
-        for task in ayon_tasks:
-            tasks.append(task)
-        return tasks
+        if self.use_replica:
+            task = replica.task(task_id, fields)
+            return [task] if task else []
+        project = lookup_project(task_id)
+        if project is not None:
+            task = get_task(self.con, project, task_id, fields)
+            if task is None:
+                forget_task(task_id)
+        else:
+            project, task = self._find_task(task_id, fields)
+            if task is not None:
+                record_task(task_id, project)
+        tasks = [task] if task else []
+        return tagged(tasks, ("task", task_id))
 
+    def _find_task(self, task_id, fields=None):
+        # Index miss (not built yet or a brand new task): ask every project at once
+        futures = {
+            _get_fanout().submit(contextvars.copy_context().run, get_task, self.con, project, task_id, fields): project
+            for project in self.io_get_projects()
+        }
+        try:
+            for future in as_completed(futures, timeout=FANOUT_TIMEOUT):
+                if future.exception() is None and future.result() is not None:
+                    return futures[future], future.result()
+        except TimeoutError:
+            logger.warning("Looking up task %s timed out after %ss", task_id, FANOUT_TIMEOUT)
+        return None, None
 
-    def io_get_user_tasks(self, project):
+    def io_get_user_tasks(self, project, fields=None):
         try:
             print(f"Fetching tasks for user: {self.user}")
-            # Attempt to use the assignees filter directly
-            ayon_tasks = self.con.get_tasks(project, assignees=self.user)
-            tasks = [task for task in ayon_tasks]
-            return tasks
+            return self._get_user_tasks(project, fields=fields)
         except Exception as e:
             print(f"Error fetching tasks: {e}")
             return []
 
+    def io_get_user_tasks_by_project(self, projects=None, timeout=FANOUT_TIMEOUT, fields=None):
+        """Fetch the user's tasks from every project concurrently.
+
+        Returns ``(tasks_by_project, unavailable)``; a project that fails or
+        misses the timeout is listed in ``unavailable`` instead of blocking
+        the others.
+        """
+        if projects is None:
+            projects = self.io_get_projects()
+        # copy_context keeps the request's metrics attached in the worker threads
+        futures = {
+            project: _get_fanout().submit(contextvars.copy_context().run, self._get_user_tasks, project, fields=fields)
+            for project in projects
+        }
+        done, _ = wait(futures.values(), timeout=timeout)
+        tasks = {}
+        unavailable = []
+        for project, future in futures.items():
+            if future in done and future.exception() is None:
+                tasks[project] = future.result()
+                continue
+            # Only drops calls still queued, a running one ends at the
+            # pooled session's AYON_REQUEST_TIMEOUT
+            future.cancel()
+            unavailable.append(project)
+            if future in done:
+                logger.warning("Fetching %s tasks for %s failed: %s", project, self.user, future.exception())
+            else:
+                logger.warning("Fetching %s tasks for %s timed out after %ss", project, self.user, timeout)
+        return tasks, unavailable
 
+    @cached("user_tasks", "user")
+    def _get_user_tasks(self, project, fields=None):
+        if self.use_replica:
+            return replica.user_tasks(project, self.user, fields)
+        # Attempt to use the assignees filter directly
+        ayon_tasks = self.con.get_tasks(project, assignees=self.user, fields=resolve_fields(fields))
+        tasks = [task for task in ayon_tasks]
+        # Any task event in the project may add or remove an assignment
+        return tagged(tasks, ("tasks", project), ("project", project))
+
+
+    @cached("sequences", "project")
     def io_get_sequences(self):
-        ayon_sequences = self.con.get_folders(self.project, folder_types="Sequence")
+        if self.use_replica:
+            return replica.sequences(self.project)
+        ayon_sequences = self.con.get_folders(self.project, folder_types="Sequence", fields={"id", "name"})
         sequences = []
+        tags = []
         for sequence in ayon_sequences:
             sequences.append(sequence["name"])
-        return sequences
+            tags.append(("folder", sequence["id"]))
+        return tagged(sequences, *tags)
         
+    @cached("shots", "project", "seq")
     def io_get_shots(self):
-        get_seq = self.con.get_folder_by_name(self.project,self.seq)
-        seq_id = get_seq["id"]
+        if self.use_replica:
+            return replica.shots(self.project, self.seq)
+        # Sequence lookup and its shots in one GraphQL request
+        seq_id, ayon_shots = get_sequence_shots(self.con, self.project, self.seq)
         shots = []
-        ayon_shots = self.con.get_folders(self.project, parent_ids = [seq_id], folder_types="Shot")
+        tags = [("folder", seq_id)]
         for shot in ayon_shots:
             shots.append(shot["name"])
-        return shots
+            tags.append(("folder", shot["id"]))
+        return tagged(shots, *tags)
+
+    # Async reads for the ASGI views. They share cache entries with the sync
+    # methods above and return the same shapes. Construct dd_io itself with
+    # sync_to_async, __init__ may touch the replica tables.
+
+    @cached("projects")
+    async def aio_get_projects(self):
+        if self.use_replica:
+            return await sync_to_async(replica.projects)()
+        return [project["name"] for project in await aget_projects(self.acon)]
+
+    @cached("users")
+    async def aio_get_users(self):
+        if self.use_replica:
+            return await sync_to_async(replica.users)()
+        return [user["name"] for user in await aget_users(self.acon)]
+
+    @cached("sequences", "project")
+    async def aio_get_sequences(self):
+        if self.use_replica:
+            return await sync_to_async(replica.sequences)(self.project)
+        ayon_sequences = await aget_sequences(self.acon, self.project)
+        sequences = [sequence["name"] for sequence in ayon_sequences]
+        return tagged(sequences, *[("folder", sequence["id"]) for sequence in ayon_sequences])
+
+    @cached("shots", "project", "seq")
+    async def aio_get_shots(self):
+        if self.use_replica:
+            return await sync_to_async(replica.shots)(self.project, self.seq)
+        seq_id, ayon_shots = await aget_sequence_shots(self.acon, self.project, self.seq)
+        shots = [shot["name"] for shot in ayon_shots]
+        return tagged(shots, ("folder", seq_id), *[("folder", shot["id"]) for shot in ayon_shots])
+
+    async def aio_get_tasks_page(self, after=None, limit=TASK_PAGE_SIZE, fields=None, fallback=True):
+        fields = resolve_fields(fields)
+        shot_id, tasks = await self._aget_shot_tasks(fields)
+        if shot_id is not None:
+            return tasks, None
+        if not fallback:
+            return None, None
+        if self.use_replica:
+            return await sync_to_async(replica.tasks_page)(self.project, fields, limit, after)
+        return await aget_project_tasks_page(self.acon, self.project, fields, limit, after)
+
+    @cached("shot_tasks", "project", "seq", "shot")
+    async def _aget_shot_tasks(self, fields):
+        if self.seq is None or self.shot is None:
+            return None, []
+        if self.use_replica:
+            return await sync_to_async(replica.shot_tasks)(self.project, self.seq, self.shot, fields)
+        shot_id, tasks = await aget_shot_tasks(self.acon, self.project, self.seq, self.shot, fields)
+        if shot_id is None:
+            return tagged((None, []), ("tasks", self.project))
+        tags = [("folder", shot_id), ("tasks_of", shot_id)] + [("task", task["id"]) for task in tasks]
+        return tagged((shot_id, tasks), *tags)
+
+    @cached("task")
+    async def aio_get_task(self, task_id, fields=None):
+        if task_id is None:
+            return None
+        if self.use_replica:
+            task = await sync_to_async(replica.task)(task_id, fields)
+            return [task] if task else []
+        project = await alookup_project(task_id)
+        if project is not None:
+            task = await aget_task(self.acon, project, task_id, fields)
+            if task is None:
+                await sync_to_async(forget_task, thread_sensitive=False)(task_id)
+        else:
+            project, task = await self._afind_task(task_id, fields)
+            if task is not None:
+                await sync_to_async(record_task, thread_sensitive=False)(task_id, project)
+        tasks = [task] if task else []
+        return tagged(tasks, ("task", task_id))
+
+    async def _afind_task(self, task_id, fields=None):
+        # Index miss, ask every project at once like _find_task
+        async def find(project):
+            return project, await aget_task(self.acon, project, task_id, fields)
+
+        pending = {asyncio.ensure_future(find(project)) for project in await self.aio_get_projects()}
+        deadline = asyncio.get_running_loop().time() + FANOUT_TIMEOUT
+        try:
+            while pending:
+                timeout = deadline - asyncio.get_running_loop().time()
+                done, pending = await asyncio.wait(pending, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.warning("Looking up task %s timed out after %ss", task_id, FANOUT_TIMEOUT)
+                    break
+                for lookup in done:
+                    if lookup.exception() is None and lookup.result()[1] is not None:
+                        return lookup.result()
+        finally:
+            # The first hit wins, the slower projects are not waited for
+            for lookup in pending:
+                lookup.cancel()
+        return None, None
+
+    async def aio_get_user_tasks_by_project(self, projects=None, timeout=FANOUT_TIMEOUT, fields=None):
+        """Async io_get_user_tasks_by_project, every project in flight at once."""
+        if projects is None:
+            projects = await self.aio_get_projects()
+        results = await asyncio.gather(
+            *[asyncio.wait_for(self._aget_user_tasks(project, fields=fields), timeout) for project in projects],
+            return_exceptions=True,
+        )
+        tasks = {}
+        unavailable = []
+        for project, result in zip(projects, results):
+            if isinstance(result, Exception):
+                unavailable.append(project)
+                logger.warning("Fetching %s tasks for %s failed: %r", project, self.user, result)
+            else:
+                tasks[project] = result
+        return tasks, unavailable
+
+    @cached("user_tasks", "user")
+    async def _aget_user_tasks(self, project, fields=None):
+        if self.use_replica:
+            return await sync_to_async(replica.user_tasks)(project, self.user, fields)
+        tasks = await aget_user_tasks(self.acon, project, self.user, resolve_fields(fields))
+        return tagged(tasks, ("tasks", project), ("project", project))
 
     def io_get_shot_id(self):
         try:
@@ -101,6 +356,7 @@ class dd_io():
         try:
             proj_code = self.project.upper()
             self.con.create_project(self.project, proj_code ,preset_name = "DDHB")
+            hierarchy_cache.invalidate(("projects",))
             return f"{self.project} Project Created successfully"
         except Exception as e :
             return e
@@ -108,6 +364,7 @@ class dd_io():
     def io_create_sequence(self):
         try:
             self.con.create_folder(self.project, self.seq ,folder_type="Sequence")
+            hierarchy_cache.invalidate(("sequences", self.project))
             return f"{self.seq} Sequence Created successfully"
         except Exception as e :
             return e
@@ -117,10 +374,23 @@ class dd_io():
             get_seq = self.con.get_folder_by_name(self.project,self.seq)
             seq_id = get_seq["id"]
             self.con.create_folder(self.project, self.shot, parent_id = seq_id , folder_type="Shot")
+            hierarchy_cache.invalidate(("shots", self.project, self.seq))
             return f"{self.shot} Shot Created successfully on {self.seq} Sequence {self.project} project"
         except Exception as e :
             return e
 
+    def io_bulk_create(self, rows, chunk_size=None, dry_run=False):
+        """Create the sequences and shots of manifest rows (bulk.read_manifest) in batches.
+
+        Returns one report item per folder, see bulk.bulk_create.
+        """
+        kwargs = {"chunk_size": chunk_size} if chunk_size else {}
+        report = bulk_create(self.con, self.project, rows, dry_run=dry_run, **kwargs)
+        if not dry_run:
+            hierarchy_cache.invalidate(("sequences", self.project))
+            hierarchy_cache.invalidate_prefix(("shots", self.project))
+        return report
+
     def io_get_events(self):
         ayon_events = self.con.get_events(limit=100)
         events = [event for event in ayon_events ]
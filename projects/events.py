@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from .ayon_pool import PooledConnection
+from .cache import hierarchy_cache
+from .task_index import forget_task, record_task
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_EVENTS = os.environ.get("AYON_EVENT_FOLLOWER", "1") == "1"
+POLL_INTERVAL = float(os.environ.get("AYON_EVENT_POLL_INTERVAL", 5))
+BATCH_SIZE = int(os.environ.get("AYON_EVENT_BATCH_SIZE", 500))
+TOPICS = ["entity.project.*", "entity.folder.*", "entity.task.*"]
+EVENT_FIELDS = {"id", "topic", "project", "summary", "createdAt"}
+# Polls re-read this far before the cursor, createdAt is not unique and
+# events committed late can carry an older time
+CURSOR_OVERLAP = timedelta(seconds=float(os.environ.get("AYON_EVENT_CURSOR_OVERLAP", 2)))
+
+
+def _summary(event):
+    summary = event.get("summary") or {}
+    if isinstance(summary, str):
+        try:
+            summary = json.loads(summary)
+        except ValueError:
+            summary = {}
+    return summary
+
+
+def invalidate_for_event(event, cache=hierarchy_cache):
+    """Drop only the cached entries an AYON entity event can have changed."""
+    topic = event.get("topic") or ""
+    project = event.get("project")
+    summary = _summary(event)
+    entity_id = summary.get("entityId")
+    parent_id = summary.get("parentId")
+
+    if topic.startswith("entity.project."):
+        cache.invalidate(("projects",))
+        if project:
+            cache.invalidate_tag(("project", project))
+
+    elif topic.startswith("entity.folder."):
+        # New or renamed root folders only show up in the sequence list
+        cache.invalidate(("sequences", project))
+        for folder_id in (entity_id, parent_id):
+            if folder_id:
+                cache.invalidate_tag(("folder", folder_id))
+
+    elif topic.startswith("entity.task."):
+        cache.invalidate_tag(("tasks", project))
+        if entity_id:
+            cache.invalidate_tag(("task", entity_id))
+        if parent_id:
+            cache.invalidate_tag(("tasks_of", parent_id))
+
+
+def index_task_event(event):
+    """Keep the task id -> project index current."""
+    topic = event.get("topic") or ""
+    if not topic.startswith("entity.task."):
+        return
+    task_id = _summary(event).get("entityId")
+    if not task_id:
+        return
+    if topic == "entity.task.deleted":
+        forget_task(task_id)
+    elif event.get("project"):
+        record_task(task_id, event["project"])
+
+
+def search_index_event(event):
+    # Imported here, the search index reads through dd_io which imports this module
+    from .search import apply_event
+    apply_event(event)
+
+
+# Time of the last event that touched each hierarchy scope, the page ETags
+# derive from it. A scope no event has touched since the follower started
+# is looked up in AYON once, so every process agrees on its version.
+SCOPE_TOPICS = {"projects": ["entity.project.*"], "folders": ["entity.project.*", "entity.folder.*"]}
+_scope_versions = {}
+_scope_versions_lock = threading.Lock()
+
+
+def _set_scope_version(scope, created):
+    with _scope_versions_lock:
+        _scope_versions[scope] = max(_scope_versions.get(scope, ""), created)
+
+
+def record_hierarchy_version(event):
+    topic = event.get("topic") or ""
+    project = event.get("project")
+    created = event.get("createdAt")
+    if topic.startswith("entity.project."):
+        _set_scope_version(("projects",), created)
+        if project:
+            _set_scope_version(("folders", project), created)
+    elif topic.startswith("entity.folder.") and project:
+        _set_scope_version(("folders", project), created)
+
+
+def latest_scope_event(con, scope):
+    """createdAt of the newest event touching ``scope`` in AYON, "" if there is none."""
+    from ayon_api.utils import SortOrder
+    kwargs = {"project_names": [scope[1]]} if scope[0] == "folders" else {}
+    latest = list(con.get_events(
+        topics=SCOPE_TOPICS[scope[0]], fields={"createdAt"}, limit=1, order=SortOrder.descending, **kwargs))
+    return latest[0]["createdAt"] if latest else ""
+
+
+class SeenEvents():
+    """Bounded set of recently processed event ids, oldest dropped first."""
+
+    def __init__(self, size=4 * BATCH_SIZE):
+        self.size = size
+        self._ids = OrderedDict()
+
+    def __contains__(self, event_id):
+        return event_id in self._ids
+
+    def add(self, event_id):
+        self._ids[event_id] = None
+        self._ids.move_to_end(event_id)
+        while len(self._ids) > self.size:
+            self._ids.popitem(last=False)
+
+
+def _rewind(cursor):
+    try:
+        created = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return cursor
+    return (created - CURSOR_OVERLAP).isoformat()
+
+
+def events_since(con, cursor, seen, topics=TOPICS, fields=EVENT_FIELDS, limit=BATCH_SIZE):
+    """Events at or shortly before ``cursor`` not in ``seen``, oldest first.
+
+    AYON's newer_than filter is strict, so events sharing the cursor's
+    createdAt would be skipped. The query starts CURSOR_OVERLAP earlier
+    and the ids already handled are dropped instead.
+    """
+    from ayon_api.utils import SortOrder
+
+    def fetch(newer_than):
+        kwargs = {"newer_than": newer_than} if newer_than else {}
+        return list(con.get_events(topics=topics, fields=fields, limit=limit, order=SortOrder.ascending, **kwargs))
+
+    events = fetch(_rewind(cursor))
+    fresh = [event for event in events if event["id"] not in seen]
+    if not fresh and len(events) >= limit:
+        # The overlap window alone fills a batch, step past it
+        fresh = [event for event in fetch(cursor) if event["id"] not in seen]
+    return fresh
+
+
+class EventFollower(threading.Thread):
+    """Polls the AYON event stream from a cursor and invalidates the cache."""
+
+    def __init__(self, con=None, interval=POLL_INTERVAL, handlers=None):
+        super().__init__(name="ayon-event-follower", daemon=True)
+        self.con = con or PooledConnection()
+        self.interval = interval
+        # Versions are bumped last, after the cache entries are gone
+        self.handlers = handlers or [invalidate_for_event, index_task_event, search_index_event, record_hierarchy_version]
+        self.cursor = None
+        self.base_cursor = None
+        self.recent = deque(maxlen=100)
+        self.processed = 0
+        self._seen = SeenEvents()
+        self._stop_event = threading.Event()
+
+    def _init_cursor(self):
+        from ayon_api.utils import SortOrder
+        latest = list(self.con.get_events(
+            topics=TOPICS, fields=EVENT_FIELDS, limit=1, order=SortOrder.descending))
+        # Nothing is cached yet when we start, older events are irrelevant
+        self.cursor = latest[0]["createdAt"] if latest else None
+        self.base_cursor = self.cursor or ""
+        if latest:
+            self._seen.add(latest[0]["id"])
+
+    def poll(self):
+        if self.cursor is None:
+            self._init_cursor()
+            if self.cursor is None:
+                return 0
+        events = events_since(self.con, self.cursor, self._seen)
+        for event in events:
+            for handler in self.handlers:
+                try:
+                    handler(event)
+                except Exception:
+                    logger.exception("Event handler failed for %s", event.get("id"))
+            self._seen.add(event["id"])
+            self.recent.append(event)
+            self.cursor = max(self.cursor, event["createdAt"])
+        self.processed += len(events)
+        return len(events)
+
+    def run(self):
+        backoff = self.interval
+        while not self._stop_event.is_set():
+            try:
+                count = self.poll()
+                backoff = self.interval
+            except Exception as e:
+                logger.warning("AYON event poll failed: %s", e)
+                count = 0
+                backoff = min(backoff * 2, 60)
+            # Drain backlogs without sleeping
+            if count < BATCH_SIZE:
+                self._stop_event.wait(backoff)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_follower = None
+_follower_pid = None
+_follower_lock = threading.Lock()
+
+
+def start_event_follower():
+    """Start the per-process follower once, again after a fork.
+
+    Only web processes call this (app ready and the background services
+    middleware), management commands and job workers have no cache to keep.
+    """
+    global _follower, _follower_pid
+    if not FOLLOW_EVENTS:
+        return None
+    if _follower is not None and _follower_pid == os.getpid():
+        return _follower
+    with _follower_lock:
+        if _follower is None or _follower_pid != os.getpid():
+            _follower = EventFollower()
+            _follower_pid = os.getpid()
+            _follower.start()
+    return _follower
+
+
+def running_follower():
+    """This process's follower, None where none was started (shells, scripts, tests)."""
+    if _follower is not None and _follower_pid == os.getpid():
+        return _follower
+    return None
+
+
+def hierarchy_version(*scope):
+    """Event time ``scope`` last changed at, ``("projects",)`` or ``("folders", project)``.
+
+    None while no follower is running (or has not polled yet) in this process,
+    or when AYON cannot be asked.
+    """
+    follower = running_follower()
+    if follower is None or follower.base_cursor is None:
+        return None
+    version = _scope_versions.get(scope)
+    if version is None:
+        # The follower records every later event, one lookup per scope is enough
+        try:
+            _set_scope_version(scope, latest_scope_event(follower.con, scope))
+        except Exception:
+            logger.exception("Looking up the version of %s failed", scope)
+            return None
+        version = _scope_versions[scope]
+    return version
@@ -0,0 +1,344 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from django.conf import settings
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from projects.iotc import time_data_collection
+from projects.timecard import normalized_fields
+from projects import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Upserts per bulk_write
+BATCH_SIZE = int(os.environ.get("IOSPACE_INGEST_BATCH_SIZE", 1000))
+# Requests arriving within this many seconds of each other share their writes,
+# 0 writes every request on its own
+FLUSH_WINDOW = float(os.environ.get("IOSPACE_INGEST_FLUSH_WINDOW", 0.02))
+# Entries accepted in one request
+MAX_REQUEST_ENTRIES = int(os.environ.get("IOSPACE_INGEST_MAX_ENTRIES", 5000))
+# time_data keeps naive wall clock times, posted times with an offset are converted to this zone
+TIME_ZONE = ZoneInfo(os.environ.get("IOSPACE_TIME_DATA_TZ") or settings.TIME_ZONE)
+DUPLICATE_KEY = 11000
+
+ingested = metrics.Counter(
+    "iospace_ingest_entries_total", "Time entries posted to the ingest endpoint.", ("status",))
+flush_requests = metrics.Histogram(
+    "iospace_ingest_flush_requests", "Ingest requests whose entries were written together.", (),
+    (1, 2, 4, 8, 16, 32, 64, 128))
+
+
+class InvalidEntry(ValueError):
+    pass
+
+
+def _text(raw, field, required=True):
+    value = raw.get(field)
+    value = str(value).strip() if value is not None else ""
+    if not value and required:
+        raise InvalidEntry(f"{field} is required")
+    return value or None
+
+
+def _datetime(value, field):
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).astimezone(TIME_ZONE).replace(tzinfo=None)
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise InvalidEntry(f"{field} must be an ISO 8601 datetime or epoch seconds, got {value!r}")
+    if parsed.tzinfo is not None:
+        # Same zone as the naive times already stored, then naive like them
+        parsed = parsed.astimezone(TIME_ZONE).replace(tzinfo=None)
+    return parsed
+
+
+def _clock(value, field):
+    try:
+        parts = [int(p) for p in str(value).split(":")]
+    except ValueError:
+        parts = []
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3 or not (0 <= parts[0] < 24 and 0 <= parts[1] < 60 and 0 <= parts[2] < 60):
+        raise InvalidEntry(f"{field} must be HH:MM[:SS], got {value!r}")
+    return timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+
+
+def _session(raw):
+    # start/stop datetimes, or the date + start_time/stop_time the legacy clients send
+    if raw.get("start") is not None:
+        if raw.get("stop") is None:
+            raise InvalidEntry("stop is required")
+        return _datetime(raw["start"], "start"), _datetime(raw["stop"], "stop")
+    if raw.get("date") is None or raw.get("start_time") is None or raw.get("stop_time") is None:
+        raise InvalidEntry("start and stop, or date, start_time and stop_time are required")
+    try:
+        day = datetime.strptime(str(raw["date"]).replace(":", "-"), "%Y-%m-%d")
+    except ValueError:
+        raise InvalidEntry(f"date must be YYYY-MM-DD, got {raw['date']!r}")
+    start = day + _clock(raw["start_time"], "start_time")
+    stop = day + _clock(raw["stop_time"], "stop_time")
+    if stop < start:
+        # Session ran past midnight
+        stop += timedelta(days=1)
+    return start, stop
+
+
+def _hms(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def entry_key(entry):
+    """Natural key of a session: who, on which workstation, starting when."""
+    return f"{entry['login']}|{entry['system_id']}|{entry['date']:%Y-%m-%d}|{entry['start_time']}"
+
+
+def normalize_entry(raw):
+    """A v2 time_data document from one posted session, or InvalidEntry."""
+    if not isinstance(raw, dict):
+        raise InvalidEntry("entry must be an object")
+    login = _text(raw, "login").lower()
+    system_id = _text(raw, "system_id")
+    start, stop = _session(raw)
+    seconds = int((stop - start).total_seconds())
+    if seconds < 0:
+        raise InvalidEntry("stop is before start")
+    if seconds > 24 * 3600:
+        raise InvalidEntry("sessions longer than 24 hours are not accepted")
+
+    task = raw.get("task")
+    task_id = _text(raw, "task_id", required=False)
+    if isinstance(task, str):
+        task_id, task = task_id or task.strip(), None
+    if task is None and task_id is None:
+        raise InvalidEntry("task or task_id is required")
+    project = raw.get("project")
+    if isinstance(project, str):
+        project = [project]
+
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    entry = {
+        "login": login,
+        "date": day.strftime("%Y-%m-%d"),
+        "day": day.strftime("%A"),
+        "task": task if task is not None else {"task": f"ID: {task_id}"},
+        "start_time": start.strftime("%H:%M:%S"),
+        "stop_time": stop.strftime("%H:%M:%S"),
+        "work_time": _hms(seconds),
+        "system_id": system_id,
+        "department": _text(raw, "department", required=False),
+        "project": project or [],
+    }
+    entry.update(normalized_fields(entry))
+    if task_id:
+        entry["task_id"] = task_id
+    entry["entry_key"] = entry_key(entry)
+    return entry
+
+
+def validate(raw_entries, login=None):
+    """(entries, rejected): ``(index, document)`` per good entry and ``{"index", "error"}`` per bad one.
+
+    With ``login`` every entry must be booked for that login.
+    """
+    entries = []
+    rejected = []
+    for index, raw in enumerate(raw_entries):
+        try:
+            entry = normalize_entry(raw)
+            if login is not None and entry["login"] != login.lower():
+                raise InvalidEntry(f"login must be {login.lower()}, the signed in user")
+            entries.append((index, entry))
+        except InvalidEntry as e:
+            rejected.append({"index": index, "error": str(e)})
+    return entries, rejected
+
+
+_index_ensured = False
+
+
+def ensure_ingest_index(collection=time_data_collection):
+    global _index_ensured
+    if _index_ensured:
+        return
+    # Partial, so entries written before ingestion existed need no key
+    collection.create_index(
+        [("entry_key", ASCENDING)], unique=True,
+        partialFilterExpression={"entry_key": {"$exists": True}},
+    )
+    _index_ensured = True
+
+
+def _upsert(entry):
+    # A resent running session only moves the stop forward, the rest is
+    # written once. Seconds grow with stop_time and stay ordered across
+    # midnight, where the HH:MM:SS strings do not.
+    fields = {k: v for k, v in entry.items() if k != "work_seconds"}
+    return UpdateOne(
+        {"entry_key": entry["entry_key"]},
+        {"$setOnInsert": fields, "$max": {"work_seconds": entry["work_seconds"]}},
+        upsert=True,
+    )
+
+
+def _stamp(entry):
+    # Runs after the upsert: the entry holding these seconds gets their stop
+    # and a server side ingested_at the rollups pick it up by. A resend
+    # that changed nothing matches no document.
+    return UpdateOne(
+        {
+            "entry_key": entry["entry_key"],
+            "work_seconds": entry["work_seconds"],
+            "$or": [{"stop_time": {"$ne": entry["stop_time"]}}, {"ingested_at": {"$exists": False}}],
+        },
+        {"$set": {"stop_time": entry["stop_time"], "work_time": entry["work_time"]},
+         "$currentDate": {"ingested_at": True}},
+    )
+
+
+def _bulk(collection, ops):
+    """bulk_write unordered; returns (result counts, {op index: error})."""
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        return result.bulk_api_result, {}
+    except BulkWriteError as e:
+        return e.details, {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+
+def _write_chunk(entries, collection):
+    """(indexes of the inserted entries, {index: error} of the failed ones)."""
+    ops = [_upsert(entry) for entry in entries]
+    counts, errors = _bulk(collection, ops)
+    upserted = {item["index"] for item in counts.get("upserted", [])}
+    # Two first posts of one session raced on the unique index, the loser
+    # now finds the winner's document
+    racing = [i for i, error in errors.items() if error.get("code") == DUPLICATE_KEY]
+    if racing:
+        _, retry_errors = _bulk(collection, [ops[i] for i in racing])
+        for i in racing:
+            del errors[i]
+        errors.update({racing[i]: error for i, error in retry_errors.items()})
+
+    written = [i for i in range(len(entries)) if i not in errors]
+    if written:
+        _, stamp_errors = _bulk(collection, [_stamp(entries[i]) for i in written])
+        errors.update({written[i]: error for i, error in stamp_errors.items()})
+    failed = {i: error.get("errmsg", "write failed") for i, error in errors.items()}
+    return upserted - set(failed), failed
+
+
+class _Submission():
+    __slots__ = ("documents", "collection", "inserted", "failed", "done")
+
+    def __init__(self, documents, collection):
+        self.documents = documents
+        self.collection = collection
+        self.inserted = set()
+        self.failed = {}
+        self.done = threading.Event()
+
+
+class WriteBatcher():
+    """Group commit for ingest requests.
+
+    Workstations post a few entries every minute, one upsert and one stamp
+    round trip per request would make Mongo latency the cost of every post.
+    The first request to arrive leads: it waits up to ``window`` seconds
+    (less once ``batch_size`` entries are pending), takes what the others
+    posted meanwhile and writes it all in shared bulk_writes. Every request
+    is answered once the flush holding its entries has landed.
+    """
+
+    def __init__(self, window=FLUSH_WINDOW, batch_size=BATCH_SIZE):
+        self.window = window
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_entries = 0
+        self._leading = False
+        self._cond = threading.Condition()
+
+    def write(self, documents, collection):
+        """(inserted indexes, {index: error}) for ``documents``."""
+        submission = _Submission(documents, collection)
+        with self._cond:
+            self._pending.append(submission)
+            self._pending_entries += len(documents)
+            lead = not self._leading
+            self._leading = True
+            self._cond.notify_all()
+        if not lead:
+            submission.done.wait()
+            return submission.inserted, submission.failed
+
+        with self._cond:
+            if self.window > 0:
+                self._cond.wait_for(lambda: self._pending_entries >= self.batch_size, timeout=self.window)
+            batch, self._pending = self._pending, []
+            self._pending_entries = 0
+            # Requests from here on gather behind a new leader
+            self._leading = False
+        self._flush(batch)
+        return submission.inserted, submission.failed
+
+    def _flush(self, batch):
+        flush_requests.observe(len(batch))
+        try:
+            groups = {}
+            for submission in batch:
+                groups.setdefault(id(submission.collection), []).append(submission)
+            for submissions in groups.values():
+                owners = [(s, i) for s in submissions for i in range(len(s.documents))]
+                for start in range(0, len(owners), self.batch_size):
+                    self._write(owners[start:start + self.batch_size], submissions[0].collection)
+        finally:
+            for submission in batch:
+                submission.done.set()
+
+    def _write(self, owners, collection):
+        try:
+            inserted, failed = _write_chunk([s.documents[i] for s, i in owners], collection)
+        except Exception as e:
+            logger.error(f"Writing {len(owners)} time entries failed: {e}")
+            inserted, failed = set(), {n: str(e) for n in range(len(owners))}
+        for n, (submission, i) in enumerate(owners):
+            if n in failed:
+                submission.failed[i] = failed[n]
+            elif n in inserted:
+                submission.inserted.add(i)
+
+
+batcher = WriteBatcher()
+
+
+def write_entries(entries, collection=time_data_collection, batcher=batcher):
+    """Upsert validated ``(index, document)`` pairs on their entry_key before returning.
+
+    Returns ``{"inserted", "existing", "failed"}``: sessions stored for the
+    first time, sessions already stored (a running one posted again is
+    extended) and ``{"index", "error"}`` for each entry that was not stored
+    so the client can resend exactly those. A workstation resending a batch
+    after a timeout books nothing twice.
+    """
+    result = {"inserted": 0, "existing": 0, "failed": []}
+    if not entries:
+        return result
+    ensure_ingest_index(collection)
+    inserted, failed = batcher.write([entry for _, entry in entries], collection)
+    result["inserted"] = len(inserted)
+    result["existing"] = len(entries) - len(inserted) - len(failed)
+    result["failed"] = [{"index": entries[i][0], "error": error} for i, error in sorted(failed.items())]
+
+    ingested.inc(result["inserted"], status="inserted")
+    ingested.inc(result["existing"], status="existing")
+    ingested.inc(len(result["failed"]), status="failed")
+    if result["failed"]:
+        logger.error("%s time entries were not written, first error: %s",
+                     len(result["failed"]), result["failed"][0]["error"])
+    # The rollup refresher folds them into the summary within its interval
+    return result
@@ -1,12 +1,100 @@
 import pymongo
 import os
+import asyncio
+import weakref
+import threading
 from dotenv import load_dotenv
+from projects.metrics import MongoCommandMetrics
 load_dotenv()
-PORT = int(os.environ["port"])
-MONGO_URL = os.environ["mongo_url"]
-# MongoDB connection
-client = pymongo.MongoClient(MONGO_URL, PORT)
-db = client['ddConnect']
+
+DB_NAME = os.environ.get("MONGO_DB", "ddConnect")
+# Connections per process, size it with the worker count so the server limit holds
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 20))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 300000))
+# How long a request waits for a free pooled connection
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+# Unset by default, rollup rebuilds and exports run long aggregations
+SOCKET_TIMEOUT_MS = int(os.environ["MONGO_SOCKET_TIMEOUT_MS"]) if os.environ.get("MONGO_SOCKET_TIMEOUT_MS") else None
+READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+
+
+def client_options():
+    return {
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": SOCKET_TIMEOUT_MS,
+        "readPreference": READ_PREFERENCE,
+        "event_listeners": [MongoCommandMetrics()],
+    }
+
+
+def _new_client(client_class):
+    # Read when the first client is made, not at import
+    return client_class(os.environ["mongo_url"], int(os.environ["port"]), **client_options())
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process wide MongoClient, created on first use and again after a fork."""
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            # Pools and monitor threads inherited from a parent process must not be used
+            _client = _new_client(pymongo.MongoClient)
+            _client_pid = os.getpid()
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+class LazyCollection():
+    """Stands in for a collection of the default database until it is first used."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+    def __getitem__(self, name):
+        return get_db()[self.name][name]
+
+
+class LazyDatabase():
+    def __getitem__(self, name):
+        return LazyCollection(name)
+
+    def __getattr__(self, attr):
+        return getattr(get_db(), attr)
+
+
+# Importing these does not connect, so views and commands start without Mongo
+db = LazyDatabase()
 time_data_collection = db['time_data']
 users_collection = db['users']
 
+# Async clients for the ASGI views, one per event loop since they bind to it
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_db():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = _async_clients[loop] = _new_client(pymongo.AsyncMongoClient)
+    return async_client[DB_NAME]
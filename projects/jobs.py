@@ -0,0 +1,301 @@
+import os
+import time
+import random
+import socket
+import inspect
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+from .ddio import dd_io
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Queued jobs are run by `manage.py run_jobs`. Set to 1 to run them in every web
+# process instead, each polls SQLite every POLL_INTERVAL seconds with WORKERS threads.
+RUN_JOBS = os.environ.get("IOSPACE_JOB_RUNNER", "0") == "1"
+WORKERS = int(os.environ.get("IOSPACE_JOB_WORKERS", 4))
+POLL_INTERVAL = float(os.environ.get("IOSPACE_JOB_POLL_INTERVAL", 2))
+MAX_ATTEMPTS = int(os.environ.get("IOSPACE_JOB_MAX_ATTEMPTS", 3))
+# Retry n waits RETRY_BASE * 2**(n-1) seconds, jittered and capped at RETRY_MAX
+RETRY_BASE = float(os.environ.get("IOSPACE_JOB_RETRY_BASE", 5))
+RETRY_MAX = float(os.environ.get("IOSPACE_JOB_RETRY_MAX", 300))
+# Runners bump updated_at of their running jobs this often
+HEARTBEAT_INTERVAL = float(os.environ.get("IOSPACE_JOB_HEARTBEAT", 30))
+# Running jobs without a heartbeat for this long belonged to a worker that died
+STALE_AFTER = float(os.environ.get("IOSPACE_JOB_STALE_AFTER", 300))
+
+
+class JobFailed(Exception):
+    """Raised by a job to fail it without further retries."""
+
+
+_kinds = {}
+
+
+def job_kind(name):
+    """Register a function as the handler of one job kind, its kwargs are the job params."""
+    def decorator(func):
+        _kinds[name] = func
+        return func
+    return decorator
+
+
+def kinds():
+    return sorted(_kinds)
+
+
+def _created(result):
+    # The dd_io write methods return the exception instead of raising it
+    if isinstance(result, Exception):
+        raise result
+    return {"status": "created", "message": result}
+
+
+# Each handler checks for the entity first, so a retry after a timeout that
+# did reach AYON does not fail on "already exists"
+
+
+@job_kind("create_project")
+def create_project(project):
+    val = dd_io(project)
+    if val.con.get_project(project):
+        return {"status": "exists", "message": f"{project} already exists"}
+    return _created(val.io_create_project())
+
+
+@job_kind("create_sequence")
+def create_sequence(project, sequence):
+    val = dd_io(project, sequence)
+    if not val.con.get_project(project):
+        raise JobFailed(f"project {project} does not exist")
+    if val.con.get_folder_by_name(project, sequence):
+        return {"status": "exists", "message": f"{sequence} already exists"}
+    return _created(val.io_create_sequence())
+
+
+@job_kind("create_shot")
+def create_shot(project, sequence, shot):
+    val = dd_io(project, sequence, shot)
+    parent = val.con.get_folder_by_name(project, sequence)
+    if not parent:
+        raise JobFailed(f"sequence {sequence} does not exist in {project}")
+    if list(val.con.get_folders(project, folder_names=[shot], parent_ids=[parent["id"]], fields={"id"})):
+        return {"status": "exists", "message": f"{shot} already exists in {sequence}"}
+    return _created(val.io_create_shot())
+
+
+def submit(kind, params, created_by="", max_attempts=MAX_ATTEMPTS):
+    """Queue a job and return it; ValueError for an unknown kind or bad params."""
+    handler = _kinds.get(kind)
+    if handler is None:
+        raise ValueError(f"unknown job kind {kind!r}, expected one of {', '.join(kinds())}")
+    try:
+        inspect.signature(handler).bind(**params)
+    except TypeError as e:
+        raise ValueError(f"bad params for {kind}: {e}")
+    job = Job.objects.create(
+        kind=kind, params=params, created_by=created_by or "",
+        max_attempts=max_attempts, run_after=timezone.now(),
+    )
+    runner = _runner
+    if runner is not None and _runner_pid == os.getpid():
+        runner.wake()
+    return job
+
+
+def job_dict(job):
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "params": job.params,
+        "status": job.status,
+        "done": job.done,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "result": job.result,
+        "error": job.error or None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        # When a queued retry is due
+        "run_after": job.run_after.isoformat() if job.status == Job.QUEUED else None,
+    }
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_MAX, RETRY_BASE * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker``; returns their ids.
+
+    The conditional update is what makes a job run once when several
+    processes poll the same table.
+    """
+    now = timezone.now()
+    due = (Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+           .order_by("run_after", "id").values_list("id", flat=True)[:limit])
+    claimed = []
+    for pk in list(due):
+        updated = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, updated_at=now, attempts=F("attempts") + 1)
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale():
+    cutoff = timezone.now() - timedelta(seconds=STALE_AFTER)
+    # Jobs claimed before updated_at existed only have started_at
+    silent = Q(updated_at__lt=cutoff) | Q(updated_at__isnull=True, started_at__lt=cutoff)
+    count = Job.objects.filter(silent, status=Job.RUNNING).update(
+        status=Job.QUEUED, worker="", run_after=timezone.now(), error="worker stopped responding")
+    if count:
+        logger.warning("Requeued %s stale jobs", count)
+    return count
+
+
+def run_job(pk, worker):
+    """Run one job claimed by ``worker`` and record its outcome.
+
+    The outcome is only written while the job is still running for
+    ``worker``, a job requeued as stale meanwhile belongs to whoever
+    claimed it next.
+    """
+    job = Job.objects.get(pk=pk)
+    claimed = Job.objects.filter(pk=pk, worker=worker, status=Job.RUNNING)
+    try:
+        handler = _kinds.get(job.kind)
+        if handler is None:
+            raise JobFailed(f"unknown job kind {job.kind!r}")
+        result = handler(**job.params)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        now = timezone.now()
+        if not isinstance(e, JobFailed) and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            logger.warning("Job %s failed (attempt %s/%s), retrying in %.0fs: %s",
+                           job, job.attempts, job.max_attempts, delay, error)
+            updated = claimed.update(
+                status=Job.QUEUED, worker="", error=error, run_after=now + timedelta(seconds=delay))
+        else:
+            logger.error("Job %s failed: %s", job, error)
+            updated = claimed.update(status=Job.FAILED, error=error, finished_at=now)
+        if not updated:
+            logger.warning("Job %s is no longer running as %s, its failure was not recorded", job, worker)
+        return False
+    updated = claimed.update(status=Job.SUCCEEDED, result=result, error="", finished_at=timezone.now())
+    if not updated:
+        logger.warning("Job %s is no longer running as %s, its result was not recorded", job, worker)
+    return bool(updated)
+
+
+class JobRunner(threading.Thread):
+    """Polls the job table and runs due jobs on a thread pool."""
+
+    def __init__(self, workers=WORKERS, interval=POLL_INTERVAL):
+        super().__init__(name="job-runner", daemon=True)
+        self.workers = workers
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="job-worker")
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._last_stale_check = float("-inf")
+        self._last_heartbeat = float("-inf")
+
+    def wake(self):
+        self._wake.set()
+
+    def busy(self):
+        with self._lock:
+            return bool(self._running)
+
+    def _execute(self, pk):
+        try:
+            run_job(pk, self.worker_id)
+        except Exception:
+            logger.exception("Job %s could not be recorded", pk)
+        finally:
+            with self._lock:
+                self._running.discard(pk)
+            # Pool threads outlive requests, give their connection back
+            close_old_connections()
+            self.wake()
+
+    def heartbeat(self):
+        """Bump updated_at of the jobs this runner is running so they are not requeued."""
+        with self._lock:
+            running = list(self._running)
+        if running:
+            Job.objects.filter(pk__in=running, worker=self.worker_id, status=Job.RUNNING).update(
+                updated_at=timezone.now())
+        self._last_heartbeat = time.monotonic()
+
+    def poll(self):
+        if time.monotonic() - self._last_heartbeat >= HEARTBEAT_INTERVAL:
+            self.heartbeat()
+        if time.monotonic() - self._last_stale_check > STALE_AFTER / 4:
+            requeue_stale()
+            self._last_stale_check = time.monotonic()
+        with self._lock:
+            free = self.workers - len(self._running)
+        if free <= 0:
+            return 0
+        claimed = claim(self.worker_id, free)
+        for pk in claimed:
+            with self._lock:
+                self._running.add(pk)
+            self.executor.submit(self._execute, pk)
+        return len(claimed)
+
+    def run(self):
+        backoff = self.interval
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+                backoff = self.interval
+            except Exception as e:
+                logger.warning("Job poll failed: %s", e)
+                backoff = min(backoff * 2, 60)
+            finally:
+                close_old_connections()
+            self._wake.wait(backoff)
+            self._wake.clear()
+
+    def stop(self, wait=True):
+        self._stop_event.set()
+        self._wake.set()
+        self.executor.shutdown(wait=wait)
+
+
+_runner = None
+_runner_pid = None
+_runner_lock = threading.Lock()
+
+
+def start_job_runner(force=False):
+    """Start the per-process runner once, again after a fork."""
+    global _runner, _runner_pid
+    if not (RUN_JOBS or force):
+        return None
+    if _runner is not None and _runner_pid == os.getpid():
+        return _runner
+    with _runner_lock:
+        if _runner is None or _runner_pid != os.getpid():
+            _runner = JobRunner()
+            _runner_pid = os.getpid()
+            _runner.start()
+    return _runner
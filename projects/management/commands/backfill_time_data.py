@@ -0,0 +1,67 @@
+import time
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, UpdateOne
+from projects.iotc import time_data_collection
+from projects.timecard import SCHEMA_VERSION, ensure_indexes, normalized_fields
+
+
+class Command(BaseCommand):
+    help = "Backfill time_data entries to the normalized schema (datetime date, task_id, work_seconds)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many entries.")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--show-failed", type=int, default=20,
+                            help="List this many entries whose date could not be parsed.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        limit = options["limit"]
+        # Already migrated entries are skipped, so an interrupted run just resumes
+        pending = {"schema_version": {"$ne": SCHEMA_VERSION}}
+        total = time_data_collection.count_documents(pending)
+        self.stdout.write(f"{total} entries to backfill")
+
+        fields = {"date": 1, "task": 1, "work_time": 1, "schema_version": 1}
+        last_id = None
+        done = 0
+        failed = 0
+        failed_samples = []
+        started = time.monotonic()
+        while limit is None or done < limit:
+            query = dict(pending)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            size = batch_size if limit is None else min(batch_size, limit - done)
+            batch = list(time_data_collection.find(query, fields).sort("_id", ASCENDING).limit(size))
+            if not batch:
+                break
+            ops = []
+            for entry in batch:
+                update = normalized_fields(entry)
+                if "schema_version" not in update:
+                    # Left pending with its raw date, nothing is written
+                    failed += 1
+                    if len(failed_samples) < options["show_failed"]:
+                        failed_samples.append((entry["_id"], entry.get("date")))
+                    continue
+                # ingested_at has the rollup refresh regroup the entry's day
+                ops.append(UpdateOne({"_id": entry["_id"]}, {"$set": update, "$currentDate": {"ingested_at": True}}))
+            if ops and not options["dry_run"]:
+                time_data_collection.bulk_write(ops, ordered=False)
+            last_id = batch[-1]["_id"]
+            done += len(batch)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f"{done}/{total} entries ({rate:.0f}/s), last _id {last_id}")
+
+        if not options["dry_run"]:
+            ensure_indexes()
+        if failed:
+            self.stderr.write(self.style.WARNING(
+                f"{failed} entries have a date that could not be parsed and were left unmigrated:"))
+            for _id, date in failed_samples:
+                self.stderr.write(f"  {_id}: date {date!r}")
+            if failed > len(failed_samples):
+                self.stderr.write(f"  ... and {failed - len(failed_samples)} more")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {done - failed} entries"))
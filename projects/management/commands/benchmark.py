@@ -0,0 +1,143 @@
+import os
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _levels(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every page against a fake AYON server and a Mongo stand-in, "
+            "e.g. --projects 100 --shots 200 --tasks 10 --timecard-rows 5000000 --mongod mongod")
+
+    # The URL checks would import the app, which reads AYON settings at import, before the fakes are up
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=10)
+        parser.add_argument("--sequences", type=int, default=10, help="Per project.")
+        parser.add_argument("--shots", type=int, default=200, help="Per project, spread over the sequences.")
+        parser.add_argument("--tasks", type=int, default=10, help="Per shot.")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--timecard-rows", type=int, default=100000)
+        parser.add_argument("--concurrency", type=_levels, default=[1, 8, 32],
+                            help="Comma separated levels, default 1,8,32.")
+        parser.add_argument("--requests", type=int, default=100, help="Requests per URL and level.")
+        parser.add_argument("--mongod", help="mongod binary for a throwaway server, default is mongomock "
+                                             "(no rollup summaries, no async views).")
+        parser.add_argument("--async-views", action="store_true",
+                            help="Route pages to the async views and serve them with uvicorn (needs --mongod).")
+        parser.add_argument("--cold", action="store_true", help="Clear the hierarchy cache before each run.")
+        parser.add_argument("--only", help="Only URLs containing this text.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", dest="json_path", help="Also write the results here.")
+
+    def handle(self, *args, **options):
+        from projects.bench.fake_ayon import FakeAyonData, FakeAyonServer
+        from projects.bench.mongo import MongoStandIn, seed_time_data
+        from projects.bench.runner import ROLLUP_ROUTES
+
+        if options["async_views"] and not options["mongod"]:
+            # The async views use pymongo's AsyncMongoClient, mongomock has no counterpart
+            raise CommandError("--async-views needs --mongod")
+        if options["async_views"]:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("--async-views serves the ASGI app with uvicorn, install it first")
+
+        # Everything below reads its settings at import time
+        os.environ["AYON_EVENT_FOLLOWER"] = "0"
+        os.environ.pop("AYON_API_KEY", None)
+        os.environ["IOSPACE_ASYNC_VIEWS"] = "1" if options["async_views"] else "0"
+
+        mongo = MongoStandIn(options["mongod"])
+        try:
+            mongo.start()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        ayon = None
+        app = None
+        try:
+            started = time.perf_counter()
+            username = os.environ.get("AYON_USERNAME", "balajid")
+            data = FakeAyonData.generate(
+                projects=options["projects"], sequences=options["sequences"], shots=options["shots"],
+                tasks=options["tasks"], users=options["users"], extra_users=[username], seed=options["seed"],
+            )
+            ayon = FakeAyonServer(data).start()
+            os.environ["AYON_SERVER_URL"] = ayon.url
+            self.stdout.write(f"Fake AYON at {ayon.url}: {len(data.projects)} projects, {len(data.owner)} entities")
+
+            from projects.iotc import time_data_collection
+            rows = seed_time_data(time_data_collection, data, options["timecard_rows"], seed=options["seed"])
+            self.stdout.write(f"Seeded {rows} time_data rows into {mongo.kind} "
+                              f"({time.perf_counter() - started:.1f}s setup)")
+            if mongo.kind == "mongomock":
+                self.stdout.write("mongomock cannot build the daily rollup, skipping the summary pages "
+                                  "(pass --mongod to benchmark them)")
+            else:
+                self._rebuild_rollups()
+
+            results = self._run(data, options, skip=ROLLUP_ROUTES if mongo.kind == "mongomock" else ())
+        finally:
+            if ayon is not None:
+                ayon.stop()
+            mongo.stop()
+
+        from projects.bench.runner import format_table
+        self.stdout.write(format_table(results))
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump({"options": {k: v for k, v in options.items() if k != "stdout"}, "results": results},
+                          f, indent=2, default=str)
+
+    def _rebuild_rollups(self):
+        from projects.rollups import rebuild_rollups
+        try:
+            rebuild_rollups()
+        except Exception as e:
+            self.stderr.write(f"Rollup rebuild failed, summary pages will be empty: {e}")
+
+    def _run(self, data, options, skip=()):
+        from projects import urls
+        from projects.cache import hierarchy_cache
+        from projects.bench.runner import AppServer, AsgiAppServer, discover_urls, run_level
+
+        settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ["127.0.0.1"]
+        project = next(iter(data.projects.values()))
+        shot = next(f for f in project["folders"].values() if f["folderType"] == "Shot")
+        sequence = project["folders"][shot["parentId"]]
+        sample = {
+            "project_name": project["name"],
+            "sequence_name": sequence["name"],
+            "shot_name": shot["name"],
+            "task_id": data.tasks_by_folder[shot["id"]][0]["id"],
+        }
+        targets = discover_urls(urls.urlpatterns, sample, skip)
+        if options["only"]:
+            targets = [(label, path) for label, path in targets if options["only"] in path]
+
+        if options["async_views"]:
+            from django.core.asgi import get_asgi_application
+            app = AsgiAppServer(get_asgi_application()).start()
+        else:
+            from django.core.wsgi import get_wsgi_application
+            app = AppServer(get_wsgi_application()).start()
+        results = []
+        try:
+            for label, path in targets:
+                for concurrency in options["concurrency"]:
+                    if options["cold"]:
+                        hierarchy_cache.clear()
+                    result = run_level(app.url, path, concurrency, max(options["requests"], concurrency))
+                    result.update(url=label, concurrency=concurrency)
+                    results.append(result)
+                    self.stdout.write(f"{label} x{concurrency}: p50 {result['p50_ms']} ms, "
+                                      f"{result['rps']} req/s, {result['errors']} errors")
+        finally:
+            app.stop()
+        return results
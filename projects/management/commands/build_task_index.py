@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from projects.ayon_pool import PooledConnection
+from projects.ddio import dd_io
+from projects.task_index import index_project
+
+
+class Command(BaseCommand):
+    help = "Bulk build the task id -> project index used by task_detail."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", action="append", dest="projects",
+                            help="Only index this project, may be repeated.")
+
+    def handle(self, *args, **options):
+        con = PooledConnection()
+        projects = options["projects"] or dd_io().io_get_projects()
+        total = 0
+        for project in projects:
+            try:
+                count = index_project(con, project)
+            except Exception as e:
+                self.stderr.write(f"{project}: {e}")
+                continue
+            total += count
+            self.stdout.write(f"{project}: {count} tasks")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} tasks from {len(projects)} projects"))
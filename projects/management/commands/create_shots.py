@@ -0,0 +1,42 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from projects.bulk import CHUNK_SIZE, ManifestError, read_manifest
+from projects.ddio import dd_io
+
+
+class Command(BaseCommand):
+    help = "Create the sequences and shots listed in a CSV or JSON manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project")
+        parser.add_argument("manifest",
+                            help="CSV with sequence,shot,frame_start,frame_end,... columns or JSON.")
+        parser.add_argument("--format", choices=["csv", "json"],
+                            help="Manifest format, guessed from the extension by default.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                            help="Operations per AYON request.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Resolve the manifest against AYON without creating anything.")
+        parser.add_argument("--report", help="Write the per-folder report to this JSON file.")
+
+    def handle(self, *args, **options):
+        try:
+            rows = read_manifest(options["manifest"], options["format"])
+        except (OSError, ValueError, ManifestError) as e:
+            raise CommandError(f"Could not read {options['manifest']}: {e}")
+
+        report = dd_io(options["project"]).io_bulk_create(rows, options["chunk_size"], options["dry_run"])
+        if options["report"]:
+            with open(options["report"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+        counts = {}
+        for item in report:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+            if item["status"] == "failed":
+                name = f"{item['sequence']}/{item['shot']}" if item["shot"] else item["sequence"]
+                self.stderr.write(f"{name}: {item['error']}")
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+        if counts.get("failed"):
+            raise CommandError(f"Bulk create finished with failures: {summary}")
+        self.stdout.write(self.style.SUCCESS(f"{options['project']}: {summary}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from projects.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = ("Regroup the days with newly ingested time_data entries, or rebuild the daily rollup with --rebuild. "
+            "Web processes do this every IOSPACE_ROLLUP_REFRESH_INTERVAL seconds, set it to 0 to run this from cron instead.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Recompute from scratch.")
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            rows = rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt daily rollup ({rows} rows)"))
+        elif update_rollups():
+            self.stdout.write(self.style.SUCCESS("Daily rollup updated"))
+        else:
+            self.stdout.write("Daily rollup already up to date")
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from projects import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (AYON project, sequence and shot creation)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=jobs.WORKERS)
+        parser.add_argument("--interval", type=float, default=jobs.POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true",
+                            help="Run jobs until none are due, then exit.")
+
+    def handle(self, *args, **options):
+        runner = jobs.JobRunner(workers=options["workers"], interval=options["interval"])
+        if options["once"]:
+            count = 0
+            while True:
+                claimed = runner.poll()
+                count += claimed
+                if not claimed and not runner.busy():
+                    break
+                time.sleep(0.1)
+            runner.stop()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs"))
+            return
+        self.stdout.write(f"Running jobs with {options['workers']} workers as {runner.worker_id}")
+        runner.start()
+        try:
+            while runner.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, waiting for running jobs")
+            runner.stop()
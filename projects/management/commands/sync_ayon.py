@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from projects.ayon_pool import PooledConnection
+from projects.events import BATCH_SIZE, POLL_INTERVAL
+from projects.replica import full_sync, sync_events
+
+
+class Command(BaseCommand):
+    help = "Load the local AYON replica and apply new events from the stored cursor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="Reload everything instead of applying events.")
+        parser.add_argument("--follow", action="store_true",
+                            help="Keep polling for events.")
+        parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        con = PooledConnection()
+        if options["full"]:
+            count = full_sync(con, log=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f"Loaded {count} projects"))
+            if not options["follow"]:
+                return
+        while True:
+            count = sync_events(con)
+            self.stdout.write(f"Applied {count} events")
+            if not options["follow"]:
+                return
+            # Drain backlogs without sleeping
+            if count < BATCH_SIZE:
+                time.sleep(options["interval"])
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+import os
+import time
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+load_dotenv()
+
+# Add a Server-Timing header with the upstream breakdown to every response
+SERVER_TIMING = os.environ.get("IOSPACE_SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric():
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._labels(key)} {value}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., sum, count]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state):
+            lines.append(f"{self.name}_bucket{self._labels(key, ('le', repr(float(bound))))} {count}")
+        lines.append(f"{self.name}_bucket{self._labels(key, ('le', '+Inf'))} {state[-1]}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {state[-2]}")
+        lines.append(f"{self.name}_count{self._labels(key)} {state[-1]}")
+        return lines
+
+
+# Values are kept per process and start at zero with it. Behind several
+# gunicorn/uvicorn workers a scrape only sees the worker that answered, so
+# scrape every worker (or run one) and sum the series in Prometheus.
+REGISTRY = []
+
+request_seconds = Histogram(
+    "iospace_request_duration_seconds", "Time spent serving a request.", ("view", "method", "status"))
+response_bytes = Histogram(
+    "iospace_response_bytes", "Size of non-streaming response bodies.", ("view",), SIZE_BUCKETS)
+upstream_seconds = Histogram(
+    "iospace_upstream_duration_seconds", "Latency of AYON and Mongo calls.", ("upstream", "operation", "view"))
+upstream_items = Histogram(
+    "iospace_upstream_result_size", "Items (or bytes for raw HTTP) returned by an upstream call.",
+    ("upstream", "operation", "view"), SIZE_BUCKETS)
+upstream_errors = Counter(
+    "iospace_upstream_errors_total", "Failed AYON and Mongo calls.", ("upstream", "operation", "view"))
+ddio_seconds = Histogram(
+    "iospace_ddio_duration_seconds", "Time spent in dd_io read methods, cache hits included.", ("method", "view"))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings():
+    """Per-request upstream totals, feeds the Server-Timing header."""
+
+    def __init__(self, view):
+        self.view = view
+        self.started = time.perf_counter()
+        self.upstream = {}  # upstream -> [calls, seconds]
+        self._lock = threading.Lock()
+
+    def add(self, upstream, seconds):
+        with self._lock:
+            entry = self.upstream.setdefault(upstream, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{calls} calls"'
+                 for name, (calls, seconds) in sorted(self.upstream.items())]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("iospace_request_timings", default=None)
+
+
+def start_request(view):
+    timings = RequestTimings(view)
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def set_request_view(view):
+    timings = _current.get()
+    if timings is not None:
+        timings.view = view
+
+
+def current_view():
+    timings = _current.get()
+    return timings.view if timings is not None else "background"
+
+
+def record(upstream, operation, seconds, size=None, error=False):
+    view = current_view()
+    upstream_seconds.observe(seconds, upstream=upstream, operation=operation, view=view)
+    if error:
+        upstream_errors.inc(upstream=upstream, operation=operation, view=view)
+    elif size is not None:
+        upstream_items.observe(size, upstream=upstream, operation=operation, view=view)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(upstream, seconds)
+
+
+@contextmanager
+def track(upstream, operation):
+    """Time an upstream call; set ``.size`` on the yielded object to record its payload."""
+    call = _Call()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        record(upstream, operation, time.perf_counter() - started, error=True)
+        raise
+    record(upstream, operation, time.perf_counter() - started, call.size)
+
+
+class _Call():
+    size = None
+
+
+def instrument_methods(prefixes=("io_", "aio_")):
+    """Class decorator timing every public dd_io read/write method."""
+    def decorator(cls):
+        for name, method in list(vars(cls).items()):
+            if not name.startswith(prefixes) or not callable(method):
+                continue
+            # Generators only do their work while being consumed
+            if inspect.isgeneratorfunction(method):
+                continue
+            setattr(cls, name, _timed(name, method))
+        return cls
+    return decorator
+
+
+def _timed(name, method):
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                ddio_seconds.observe(time.perf_counter() - started, method=name, view=current_view())
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            ddio_seconds.observe(time.perf_counter() - started, method=name, view=current_view())
+    return wrapper
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding the upstream metrics."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        reply = event.reply or {}
+        batch = (reply.get("cursor") or {})
+        docs = batch.get("firstBatch", batch.get("nextBatch"))
+        size = len(docs) if docs is not None else reply.get("n")
+        record("mongo", event.command_name, event.duration_micros / 1e6, size)
+
+    def failed(self, event):
+        record("mongo", event.command_name, event.duration_micros / 1e6, error=True)
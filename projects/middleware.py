@@ -0,0 +1,80 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from .apps import is_web_process, start_background_services
+from .metrics import SERVER_TIMING, request_seconds, response_bytes, start_request, end_request, set_request_view
+
+
+class MetricsMiddleware():
+    """Request latency and size per view, plus the optional Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request(_view_name(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request(_view_name(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self._finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # URL resolution happens after __call__ starts, label the request now
+        set_request_view(_view_name(request))
+
+    def _finish(self, request, response, timings):
+        view = _view_name(request)
+        request_seconds.observe(
+            time.perf_counter() - timings.started, view=view, method=request.method, status=response.status_code)
+        if not response.streaming:
+            response_bytes.observe(len(response.content), view=view)
+        if SERVER_TIMING:
+            response["Server-Timing"] = timings.server_timing()
+        return response
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.url_name or match.view_name or "unnamed"
+
+
+class BackgroundServicesMiddleware():
+    """Makes sure the event follower, job runner and rollup refresher run in every serving process.
+
+    App ready starts it already, this covers workers forked from a
+    preloaded parent, which do not inherit its threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # Test clients and management commands handling requests have no use for them
+        if not is_web_process():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Only a pid check once the services are running
+        start_background_services()
+        return self.get_response(request)
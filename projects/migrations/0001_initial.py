@@ -0,0 +1,68 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AyonProject',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AyonUser',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('cursor', models.CharField(blank=True, max_length=64, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AyonTask',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('project', models.CharField(max_length=255)),
+                ('folder_id', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=255)),
+                ('label', models.CharField(blank=True, max_length=255, null=True)),
+                ('task_type', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(blank=True, max_length=64)),
+                ('assignees', models.JSONField(default=list)),
+                ('attrib', models.JSONField(default=dict)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'folder_id'], name='projects_ay_project_63cb96_idx'), models.Index(fields=['project', 'name'], name='projects_ay_project_efe79b_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AyonFolder',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('project', models.CharField(max_length=255)),
+                ('name', models.CharField(max_length=255)),
+                ('folder_type', models.CharField(max_length=64)),
+                ('parent_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('path', models.CharField(blank=True, max_length=1024)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'folder_type', 'name'], name='projects_ay_project_41fecb_idx'), models.Index(fields=['project', 'parent_id'], name='projects_ay_project_6ccffd_idx')],
+            },
+        ),
+    ]
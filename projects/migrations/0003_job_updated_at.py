@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
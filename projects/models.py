@@ -1,2 +1,105 @@
 from django.db import models
 
+
+# Local read replica of the AYON hierarchy, kept in sync by `manage.py sync_ayon`
+
+
+class AyonProject(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class AyonFolder(models.Model):
+    id = models.CharField(max_length=64, primary_key=True)
+    project = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    folder_type = models.CharField(max_length=64)
+    parent_id = models.CharField(max_length=64, null=True, blank=True)
+    path = models.CharField(max_length=1024, blank=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "folder_type", "name"]),
+            models.Index(fields=["project", "parent_id"]),
+        ]
+
+    def __str__(self):
+        return self.path or self.name
+
+
+class AyonTask(models.Model):
+    id = models.CharField(max_length=64, primary_key=True)
+    project = models.CharField(max_length=255)
+    folder_id = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    label = models.CharField(max_length=255, null=True, blank=True)
+    task_type = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=64, blank=True)
+    assignees = models.JSONField(default=list)
+    attrib = models.JSONField(default=dict)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "folder_id"]),
+            models.Index(fields=["project", "name"]),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class AyonUser(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+
+    def __str__(self):
+        return self.name
+
+
+class SyncState(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    cursor = models.CharField(max_length=64, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# Background jobs for slow AYON writes, run by projects.jobs
+
+
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, SUCCEEDED, FAILED)]
+
+    kind = models.CharField(max_length=64)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.CharField(max_length=255, blank=True)
+    worker = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Heartbeat of the worker running the job
+    updated_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+
+    @property
+    def done(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,266 @@
+import os
+import time
+import logging
+from django.db import transaction
+from .models import AyonFolder, AyonProject, AyonTask, AyonUser, SyncState
+from .ayon_graphql import FIELD_PRESETS, get_task, iter_project_tasks, resolve_fields
+from .events import EVENT_FIELDS, SeenEvents, _summary, events_since
+
+logger = logging.getLogger(__name__)
+
+REPLICA_TOPICS = ["entity.project.*", "entity.folder.*", "entity.task.*"]
+FOLDER_FIELDS = {"id", "name", "folderType", "parentId", "path", "active"}
+TASK_FIELDS = FIELD_PRESETS["default"]
+USER_REFRESH_INTERVAL = float(os.environ.get("AYON_REPLICA_USER_REFRESH", 300))
+EVENTS_KEY = "events"
+USERS_KEY = "users"
+
+# AYON task field -> AyonTask column
+TASK_COLUMNS = {
+    "id": "id",
+    "name": "name",
+    "label": "label",
+    "taskType": "task_type",
+    "status": "status",
+    "assignees": "assignees",
+    "folderId": "folder_id",
+    "active": "active",
+}
+
+_ready = False
+# Events re-read by the cursor overlap are applied once per process, applying
+# one again after a restart is harmless since every handler refetches
+_seen = SeenEvents()
+
+
+def is_ready():
+    """True once a full load has completed."""
+    global _ready
+    if not _ready:
+        _ready = SyncState.objects.filter(key=EVENTS_KEY).exists()
+    return _ready
+
+
+# Reads, shaped like the AYON responses dd_io returns
+
+
+def task_dict(task, fields=None):
+    data = {}
+    for field in resolve_fields(fields):
+        if field.startswith("attrib."):
+            name = field.split(".", 1)[1]
+            data.setdefault("attrib", {})[name] = task.attrib.get(name)
+        elif field in TASK_COLUMNS:
+            data[field] = getattr(task, TASK_COLUMNS[field])
+    return data
+
+
+def projects():
+    return list(AyonProject.objects.filter(active=True).order_by("name").values_list("name", flat=True))
+
+
+def users():
+    return list(AyonUser.objects.order_by("name").values_list("name", flat=True))
+
+
+def sequences(project):
+    folders = AyonFolder.objects.filter(project=project, folder_type="Sequence")
+    return list(folders.order_by("name").values_list("name", flat=True))
+
+
+def _sequence(project, sequence):
+    # First folder with that name, like get_folder_by_name
+    return AyonFolder.objects.filter(project=project, name=sequence).order_by("id").first()
+
+
+def shots(project, sequence):
+    seq = _sequence(project, sequence)
+    if seq is None:
+        return []
+    folders = AyonFolder.objects.filter(project=project, parent_id=seq.id, folder_type="Shot")
+    return list(folders.order_by("name").values_list("name", flat=True))
+
+
+def shot_tasks(project, sequence, shot, fields=None):
+    """``(shot_id, tasks)`` like ayon_graphql.get_shot_tasks."""
+    seq = _sequence(project, sequence)
+    if seq is None:
+        return None, []
+    folder = AyonFolder.objects.filter(project=project, parent_id=seq.id, folder_type="Shot", name=shot).first()
+    if folder is None:
+        return None, []
+    tasks = AyonTask.objects.filter(project=project, folder_id=folder.id, active=True).order_by("name")
+    return folder.id, [task_dict(task, fields) for task in tasks]
+
+
+def tasks_page(project, fields=None, limit=100, after=None):
+    """Keyset page on the task id, returns ``(tasks, next_cursor)``."""
+    tasks = AyonTask.objects.filter(project=project, active=True).order_by("id")
+    if after:
+        tasks = tasks.filter(id__gt=after)
+    page = list(tasks[:limit + 1])
+    next_cursor = page[limit - 1].id if len(page) > limit else None
+    return [task_dict(task, fields) for task in page[:limit]], next_cursor
+
+
+def user_tasks(project, user, fields=None):
+    # JSON containment is not available on SQLite, narrow in SQL then check exactly
+    tasks = AyonTask.objects.filter(project=project, active=True, assignees__icontains=user)
+    return [task_dict(task, fields) for task in tasks if user in task.assignees]
+
+
+def task(task_id, fields=None):
+    row = AyonTask.objects.filter(id=task_id).first()
+    if row is None:
+        return None
+    data = task_dict(row, fields)
+    folder = AyonFolder.objects.filter(id=row.folder_id).first()
+    if folder is not None:
+        data["folder"] = {"id": folder.id, "name": folder.name, "path": folder.path, "folderType": folder.folder_type}
+    return data
+
+
+# Sync
+
+
+def _folder_row(project, folder):
+    return AyonFolder(
+        id=folder["id"],
+        project=project,
+        name=folder["name"],
+        folder_type=folder.get("folderType") or "",
+        parent_id=folder.get("parentId"),
+        path=folder.get("path") or "",
+        active=folder.get("active", True),
+    )
+
+
+def _task_row(project, task):
+    return AyonTask(
+        id=task["id"],
+        project=project,
+        folder_id=task.get("folderId") or "",
+        name=task["name"],
+        label=task.get("label"),
+        task_type=task.get("taskType") or "",
+        status=task.get("status") or "",
+        assignees=task.get("assignees") or [],
+        attrib=task.get("attrib") or {},
+        active=task.get("active", True),
+    )
+
+
+def _save(row):
+    # Replace the whole row, the AYON entity is the source of truth
+    type(row).objects.filter(pk=row.pk).delete()
+    row.save(force_insert=True)
+
+
+def sync_users(con):
+    names = [user["name"] for user in con.get_users(fields={"name", "accessGroups"})]
+    with transaction.atomic():
+        AyonUser.objects.exclude(name__in=names).delete()
+        AyonUser.objects.bulk_create([AyonUser(name=name) for name in names], ignore_conflicts=True)
+        SyncState.objects.update_or_create(key=USERS_KEY)
+    return len(names)
+
+
+def sync_project(con, project):
+    """Replace one project's folders and tasks, returns ``(folders, tasks)``."""
+    folders = [_folder_row(project, f) for f in con.get_folders(project, fields=FOLDER_FIELDS)]
+    tasks = [_task_row(project, t) for t in iter_project_tasks(con, project, TASK_FIELDS, active=None)]
+    with transaction.atomic():
+        AyonProject.objects.update_or_create(name=project, defaults={"active": True})
+        AyonFolder.objects.filter(project=project).delete()
+        AyonFolder.objects.bulk_create(folders, batch_size=500)
+        AyonTask.objects.filter(project=project).delete()
+        AyonTask.objects.bulk_create(tasks, batch_size=500)
+    return len(folders), len(tasks)
+
+
+def _drop_project(project):
+    with transaction.atomic():
+        AyonTask.objects.filter(project=project).delete()
+        AyonFolder.objects.filter(project=project).delete()
+        AyonProject.objects.filter(name=project).delete()
+
+
+def full_sync(con, log=logger.info):
+    """Bulk load everything and start following events from now."""
+    from ayon_api.utils import SortOrder
+    # Taken before loading so changes made during the load are replayed
+    latest = con.get_events(topics=REPLICA_TOPICS, fields={"createdAt"}, limit=1, order=SortOrder.descending)
+    cursor = latest[0]["createdAt"] if latest else ""
+
+    log(f"users: {sync_users(con)}")
+    names = [project["name"] for project in con.get_projects(fields={"name"})]
+    for project in names:
+        folders, tasks = sync_project(con, project)
+        log(f"{project}: {folders} folders, {tasks} tasks")
+    for project in AyonProject.objects.exclude(name__in=names).values_list("name", flat=True):
+        _drop_project(project)
+
+    SyncState.objects.update_or_create(key=EVENTS_KEY, defaults={"cursor": cursor})
+    return len(names)
+
+
+def apply_event(con, event):
+    topic = event.get("topic") or ""
+    project = event.get("project")
+    entity_id = _summary(event).get("entityId")
+    if not project:
+        return
+
+    if topic.startswith("entity.project."):
+        if topic == "entity.project.deleted":
+            _drop_project(project)
+        elif topic == "entity.project.created":
+            sync_project(con, project)
+        else:
+            active = (con.get_project(project) or {}).get("active", False)
+            AyonProject.objects.update_or_create(name=project, defaults={"active": active})
+
+    elif topic.startswith("entity.folder.") and entity_id:
+        folder = con.get_folder_by_id(project, entity_id, fields=FOLDER_FIELDS)
+        if folder is None:
+            AyonTask.objects.filter(folder_id=entity_id).delete()
+            AyonFolder.objects.filter(id=entity_id).delete()
+        else:
+            _save(_folder_row(project, folder))
+
+    elif topic.startswith("entity.task.") and entity_id:
+        found = get_task(con, project, entity_id, TASK_FIELDS)
+        if found is None:
+            AyonTask.objects.filter(id=entity_id).delete()
+        else:
+            _save(_task_row(project, found))
+
+
+def sync_events(con):
+    """Apply events since the stored cursor, returns how many were applied.
+
+    Runs a full load first when the replica has never been built.
+    """
+    state = SyncState.objects.filter(key=EVENTS_KEY).first()
+    if state is None:
+        full_sync(con)
+        return 0
+
+    users_state = SyncState.objects.filter(key=USERS_KEY).first()
+    if users_state is None or time.time() - users_state.updated_at.timestamp() > USER_REFRESH_INTERVAL:
+        sync_users(con)
+
+    events = events_since(con, state.cursor, _seen, topics=REPLICA_TOPICS, fields=EVENT_FIELDS)
+    applied = 0
+    for event in events:
+        try:
+            apply_event(con, event)
+        except Exception:
+            # Leave the cursor on the failed event so the next run retries it
+            logger.exception("Replica sync failed on event %s", event.get("id"))
+            break
+        _seen.add(event["id"])
+        state.cursor = max(state.cursor or "", event["createdAt"])
+        state.save(update_fields=["cursor", "updated_at"])
+        applied += 1
+    return applied
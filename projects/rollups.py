@@ -0,0 +1,210 @@
+import os
+import logging
+import threading
+from datetime import timedelta
+from pymongo import ASCENDING, DESCENDING
+from projects.iotc import db, time_data_collection
+from projects.timecard import SCHEMA_VERSION, parse_date, prefix_filter
+
+logger = logging.getLogger(__name__)
+
+DAILY_ROLLUP = "time_rollup_daily"
+# Web processes fold new entries into the rollup this often in the background,
+# 0 leaves it to `manage.py rollup_time_data` (e.g. from cron)
+REFRESH_INTERVAL = float(os.environ.get("IOSPACE_ROLLUP_REFRESH_INTERVAL", 60))
+GROUP_FIELDS = ("login", "department", "project")
+PERIODS = ("day", "week", "month", "all")
+# Entries ingested up to this long before the watermark are looked at again,
+# a write can become visible after a later ingested_at was already read
+OVERLAP = timedelta(seconds=float(os.environ.get("IOSPACE_ROLLUP_OVERLAP", 300)))
+
+rollup_collection = db[DAILY_ROLLUP]
+state_collection = db["rollup_state"]
+
+ROLLUP_INDEXES = [
+    [("_id.day", DESCENDING)],
+    [("_id.login", ASCENDING), ("_id.day", DESCENDING)],
+    [("_id.department", ASCENDING), ("_id.day", DESCENDING)],
+    [("_id.project", ASCENDING), ("_id.day", DESCENDING)],
+]
+
+_refresh_lock = threading.Lock()
+
+
+def _daily_pipeline(match):
+    return [
+        {"$match": dict(match, schema_version=SCHEMA_VERSION, date={"$type": "date"})},
+        # An entry booked on several projects counts towards each of them
+        {"$unwind": {"path": "$project", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {"day": "$date", "login": "$login", "department": "$department", "project": "$project"},
+            "seconds": {"$sum": {"$ifNull": ["$work_seconds", 0]}},
+            "entries": {"$sum": 1},
+        }},
+    ]
+
+
+def _latest_ingested():
+    latest = time_data_collection.find_one(
+        {"ingested_at": {"$exists": True}}, {"ingested_at": 1}, sort=[("ingested_at", DESCENDING)])
+    return latest["ingested_at"] if latest else None
+
+
+def ensure_rollup_indexes():
+    for keys in ROLLUP_INDEXES:
+        rollup_collection.create_index(keys)
+    time_data_collection.create_index(
+        [("ingested_at", ASCENDING)], partialFilterExpression={"ingested_at": {"$exists": True}})
+
+
+def rebuild_rollups():
+    """Recompute the daily rollup from scratch and reset the watermark."""
+    # Read first, entries ingested while the rebuild runs are inside the overlap
+    upto = _latest_ingested()
+    pipeline = _daily_pipeline({})
+    # $out swaps the collection in atomically, readers never see it half built
+    pipeline.append({"$out": DAILY_ROLLUP})
+    time_data_collection.aggregate(pipeline, allowDiskUse=True)
+    ensure_rollup_indexes()
+    state_collection.update_one({"_id": DAILY_ROLLUP}, {"$set": {"watermark": upto}}, upsert=True)
+    return rollup_collection.estimated_document_count()
+
+
+def update_rollups():
+    """Recompute the days that entries ingested since the watermark fall on.
+
+    ``ingested_at`` is set by the server on every write that makes an entry
+    count (ingest, backfill). Whole days are regrouped and replace their
+    rollup rows, so folding an entry twice, as the OVERLAP window and
+    concurrent callers do, cannot count it twice. The watermark only moves
+    once the merge went through. Returns True when days were refreshed.
+    """
+    state = state_collection.find_one({"_id": DAILY_ROLLUP})
+    if state is None or "watermark" not in state:
+        # First run, or a watermark from the old ObjectId scheme
+        rebuild_rollups()
+        return True
+    watermark = state["watermark"]
+    since = {"$gt": watermark - OVERLAP} if watermark else {"$exists": True}
+    touched = list(time_data_collection.aggregate([
+        {"$match": {"ingested_at": since, "schema_version": SCHEMA_VERSION, "date": {"$type": "date"}}},
+        {"$group": {"_id": None, "days": {"$addToSet": "$date"}, "latest": {"$max": "$ingested_at"}}},
+    ]))
+    if not touched or not touched[0]["days"]:
+        return None
+
+    pipeline = _daily_pipeline({"date": {"$in": touched[0]["days"]}})
+    pipeline.append({"$merge": {
+        "into": DAILY_ROLLUP,
+        "on": "_id",
+        "whenMatched": "replace",
+        "whenNotMatched": "insert",
+    }})
+    time_data_collection.aggregate(pipeline, allowDiskUse=True)
+    # $max keeps a slower concurrent caller from moving the watermark back
+    operator = "$max" if watermark else "$set"
+    state_collection.update_one({"_id": DAILY_ROLLUP}, {operator: {"watermark": touched[0]["latest"]}})
+    return True
+
+
+def refresh_rollups():
+    """update_rollups(), skipped while another thread of this process runs it."""
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        update_rollups()
+    except Exception as e:
+        logger.error(f"Updating time rollups failed: {e}")
+    finally:
+        _refresh_lock.release()
+
+
+class RollupRefresher(threading.Thread):
+    """Keeps the daily rollup current so the summary views only read it."""
+
+    def __init__(self, interval=REFRESH_INTERVAL):
+        super().__init__(name="rollup-refresher", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            refresh_rollups()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_refresher = None
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+
+def start_rollup_refresher():
+    """Start the per-process refresher once, again after a fork."""
+    global _refresher, _refresher_pid
+    if REFRESH_INTERVAL <= 0:
+        return None
+    if _refresher is not None and _refresher_pid == os.getpid():
+        return _refresher
+    with _refresher_lock:
+        if _refresher is None or _refresher_pid != os.getpid():
+            _refresher = RollupRefresher()
+            _refresher_pid = os.getpid()
+            _refresher.start()
+    return _refresher
+
+
+def _period_expr(period):
+    day = "$_id.day"
+    if period == "week":
+        return {"$dateFromParts": {"isoWeekYear": {"$isoWeekYear": day}, "isoWeek": {"$isoWeek": day}}}
+    if period == "month":
+        return {"$dateFromParts": {"year": {"$year": day}, "month": {"$month": day}}}
+    if period == "all":
+        return None
+    return day
+
+
+def summary(params):
+    """Totals from the daily rollup grouped by GROUP_FIELDS and a period."""
+    requested = (params.get("group") or "login").split(",")
+    group_by = [f for f in GROUP_FIELDS if f in requested]
+    period = params.get("period") if params.get("period") in PERIODS else "day"
+
+    match = {}
+    for field in GROUP_FIELDS:
+        value = params.get(field)
+        if value:
+            match[f"_id.{field}"] = prefix_filter(value)
+    day_range = {}
+    for param, op in (("date_from", "$gte"), ("date_to", "$lte")):
+        value = params.get(param)
+        if value:
+            try:
+                day_range[op] = parse_date(value)
+            except ValueError:
+                pass
+    if day_range:
+        match["_id.day"] = day_range
+
+    group_id = {field: f"$_id.{field}" for field in group_by}
+    period_expr = _period_expr(period)
+    if period_expr is not None:
+        group_id["period"] = period_expr
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": group_id, "seconds": {"$sum": "$seconds"}, "entries": {"$sum": "$entries"}}},
+        {"$sort": dict([("_id.period", DESCENDING)] + [(f"_id.{f}", ASCENDING) for f in group_by])},
+    ]
+
+    rows = []
+    for item in rollup_collection.aggregate(pipeline):
+        row = dict(item["_id"])
+        if "period" in row:
+            row["period"] = row["period"].strftime('%Y-%m-%d')
+        row["hours"] = round(item["seconds"] / 3600, 2)
+        row["entries"] = item["entries"]
+        rows.append(row)
+    return {"group_by": group_by, "period": period, "rows": rows}
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+from django.urls import reverse
+from .ddio import dd_io
+from .ayon_graphql import get_task, iter_project_tasks
+from .cache import TTLS, hierarchy_cache, tagged
+from .events import _summary
+from . import replica
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Sources older than this are reloaded in the background, events keep them current in between
+REFRESH_INTERVAL = float(os.environ.get("IOSPACE_SEARCH_REFRESH", 900))
+# Seconds before a source that failed to load is tried again
+RETRY_INTERVAL = 60
+# Share of the query trigrams a name needs before it is scored
+MIN_OVERLAP = 0.3
+MIN_FUZZY_SCORE = 0.35
+FOLDER_FIELDS = {"id", "name", "folderType", "path"}
+# Only these folders are indexed, other folder types are not searchable
+FOLDER_TYPES = ["Sequence", "Shot"]
+TASK_FIELDS = {"id", "name", "taskType", "folderId"}
+# Tasks held across all projects, projects past the budget are searched on demand
+MAX_TASKS = int(os.environ.get("IOSPACE_SEARCH_MAX_TASKS", 500000))
+KINDS = ("project", "sequence", "shot", "task", "user")
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def trigrams(text, closed=True):
+    # Two leading pads so one and two character prefixes have their own grams
+    padded = "  " + text + (" " if closed else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Doc():
+    __slots__ = ("key", "kind", "name", "norm", "project", "path", "grams", "source")
+
+    def __init__(self, kind, key, name, project=None, path=None):
+        self.key = (kind, key)
+        self.kind = kind
+        self.name = name
+        self.norm = normalize(name)
+        self.project = project
+        self.path = path
+        self.grams = trigrams(self.norm)
+        self.source = None
+
+    def url(self):
+        if self.kind == "project":
+            return reverse("seq", args=[self.name])
+        if self.kind == "sequence":
+            return reverse("shot", args=[self.project, self.name])
+        if self.kind == "shot":
+            parts = (self.path or "").strip("/").split("/")
+            if len(parts) >= 2:
+                return reverse("task", args=[self.project, parts[-2], self.name])
+            return None
+        if self.kind == "task":
+            return reverse("task_detail", args=[self.key[1]])
+        if self.kind == "user":
+            return reverse("user")
+        return None
+
+    def as_dict(self, score):
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "project": self.project,
+            "path": self.path,
+            "url": self.url(),
+            "score": round(score, 3),
+        }
+
+
+def load_project_docs(project):
+    """Sequence and shot docs of one project, from the replica when it is in use."""
+    val = dd_io(project)
+    if val.use_replica:
+        folders = replica.AyonFolder.objects.filter(project=project, active=True, folder_type__in=FOLDER_TYPES)
+        folders = [{"id": f.id, "name": f.name, "folderType": f.folder_type, "path": f.path} for f in folders]
+    else:
+        folders = val.con.get_folders(project, folder_types=FOLDER_TYPES, fields=FOLDER_FIELDS)
+    return [
+        Doc(folder["folderType"].lower(), folder["id"], folder["name"], project, (folder.get("path") or "").strip("/"))
+        for folder in folders
+    ]
+
+
+def load_project_tasks(project):
+    """(id, name, path) of the active tasks of one project."""
+    val = dd_io(project)
+    if val.use_replica:
+        folders = {f.id: f.path for f in replica.AyonFolder.objects.filter(project=project)}
+        tasks = (replica.task_dict(t, TASK_FIELDS) for t in replica.AyonTask.objects.filter(project=project, active=True))
+    else:
+        folders = {f["id"]: f.get("path") for f in val.con.get_folders(project, fields={"id", "path"})}
+        tasks = iter_project_tasks(val.con, project, TASK_FIELDS)
+    rows = []
+    for task in tasks:
+        folder_path = (folders.get(task.get("folderId")) or "").strip("/")
+        rows.append((task["id"], task["name"], f"{folder_path}/{task['name']}".lstrip("/")))
+    return rows
+
+
+def _load_task_docs(project):
+    docs = [Doc("task", task_id, name, project, path) for task_id, name, path in load_project_tasks(project)]
+    # Task events drop the entry, the TTL covers folder renames
+    return tagged(docs, ("tasks", project), ("project", project))
+
+
+def project_task_docs(project):
+    """Task docs of one project past the MAX_TASKS budget, kept in the hierarchy cache."""
+    return hierarchy_cache.get_or_load(("search_tasks", project), lambda: _load_task_docs(project), TTLS["tasks"])
+
+
+def _score(doc, norm, grams, overlap):
+    if doc.norm == norm:
+        return 3.0
+    if doc.norm.startswith(norm):
+        return 2.0 + len(norm) / len(doc.norm)
+    if norm in doc.norm:
+        return 1.0 + len(norm) / len(doc.norm)
+    # Dice coefficient of the trigram sets
+    score = 2.0 * overlap / (len(grams) + len(doc.grams))
+    return score if score >= MIN_FUZZY_SCORE else None
+
+
+class SearchIndex():
+    """In-memory trigram index over project, sequence, shot, task and user names.
+
+    Docs are grouped by source (``("projects",)``, ``("users",)`` or
+    ``("project", name)``) and a source is swapped in whole when it is
+    reloaded. Tasks outnumber folders by far but share a handful of names,
+    so only each distinct task name is in the trigram index and a matched
+    name expands to its tasks. At most MAX_TASKS tasks are held, a search
+    within a project past that budget scores its tasks on demand.
+    """
+
+    def __init__(self):
+        self._docs = {}  # doc key -> Doc
+        self._grams = {}  # trigram -> set of doc keys
+        self._sources = {}  # source -> set of doc keys
+        self._loaded = {}  # source -> monotonic load time
+        self._stale = set()
+        self._failed = {}  # source -> monotonic time of the last failed load
+        self._tasks = {}  # task id -> (name, project, path, source)
+        self._task_ids = {}  # normalized task name -> set of task ids
+        self._source_tasks = {}  # source -> set of task ids
+        self._over_budget = set()  # sources whose tasks are not held
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def _add(self, doc, source):
+        if doc.key in self._docs:
+            self._remove(doc.key)
+        doc.source = source
+        self._docs[doc.key] = doc
+        self._sources.setdefault(source, set()).add(doc.key)
+        for gram in doc.grams:
+            self._grams.setdefault(gram, set()).add(doc.key)
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        keys = self._sources.get(doc.source)
+        if keys is not None:
+            keys.discard(key)
+        for gram in doc.grams:
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+    def _add_task(self, source, task_id, name, project, path):
+        self._remove_task(task_id)
+        norm = normalize(name)
+        if norm not in self._task_ids:
+            self._task_ids[norm] = set()
+            self._add(Doc("task_name", norm, name), ("task_names",))
+        self._task_ids[norm].add(task_id)
+        self._tasks[task_id] = (name, project, path, source)
+        self._source_tasks.setdefault(source, set()).add(task_id)
+
+    def _remove_task(self, task_id):
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return
+        norm = normalize(task[0])
+        ids = self._task_ids.get(norm)
+        if ids is not None:
+            ids.discard(task_id)
+            if not ids:
+                del self._task_ids[norm]
+                self._remove(("task_name", norm))
+        ids = self._source_tasks.get(task[3])
+        if ids is not None:
+            ids.discard(task_id)
+
+    def _drop_tasks(self, source):
+        for task_id in list(self._source_tasks.pop(source, ())):
+            self._remove_task(task_id)
+        self._over_budget.discard(source)
+
+    def replace(self, source, docs, tasks=None):
+        """Swap in the docs, and the (id, name, path) tasks of a project source."""
+        with self._lock:
+            for key in list(self._sources.pop(source, ())):
+                self._remove(key)
+            for doc in docs:
+                self._add(doc, source)
+            if tasks is not None:
+                self._drop_tasks(source)
+                if len(self._tasks) + len(tasks) > MAX_TASKS:
+                    logger.warning("Search index holds %s tasks, the tasks of %s are searched on demand",
+                                   len(self._tasks), source[1])
+                    self._over_budget.add(source)
+                else:
+                    for task_id, name, path in tasks:
+                        self._add_task(source, task_id, name, source[1], path)
+            self._loaded[source] = time.monotonic()
+            self._stale.discard(source)
+            self._failed.pop(source, None)
+
+    def drop(self, source):
+        with self._lock:
+            for key in list(self._sources.pop(source, ())):
+                self._remove(key)
+            self._drop_tasks(source)
+            self._loaded.pop(source, None)
+            self._stale.discard(source)
+
+    def upsert(self, source, doc):
+        with self._lock:
+            self._add(doc, source)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def upsert_task(self, source, task_id, name, path):
+        with self._lock:
+            if source in self._loaded and source not in self._over_budget:
+                self._add_task(source, task_id, name, source[1], path)
+
+    def remove_task(self, task_id):
+        with self._lock:
+            self._remove_task(task_id)
+
+    def is_loaded(self, source):
+        with self._lock:
+            return source in self._loaded
+
+    def loaded_sources(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def mark_stale(self, source):
+        with self._lock:
+            self._stale.add(source)
+
+    def _due(self):
+        now = time.monotonic()
+        with self._lock:
+            due = set(self._stale)
+            due.update(s for s, at in self._loaded.items() if now - at > REFRESH_INTERVAL)
+            projects = [key[1] for key in self._sources.get(("projects",), ())]
+            due.update(("project", p) for p in projects if ("project", p) not in self._loaded)
+            return {s for s in due if now - self._failed.get(s, -RETRY_INTERVAL) >= RETRY_INTERVAL}
+
+    def _load(self, source):
+        if source == ("projects",):
+            projects = dd_io().io_get_projects()
+            self.replace(source, [Doc("project", name, name, name) for name in projects])
+            for stale in [s for s in self.loaded_sources() if s[0] == "project" and s[1] not in projects]:
+                self.drop(stale)
+        elif source == ("users",):
+            self.replace(source, [Doc("user", name, name) for name in dd_io().io_get_users()])
+        else:
+            self.replace(source, load_project_docs(source[1]), load_project_tasks(source[1]))
+
+    def refresh(self, sources=None):
+        """Reload ``sources`` (default: every due source), project lists first."""
+        sources = sorted(sources if sources is not None else self._due(), key=lambda s: s[0] != "projects")
+        for source in sources:
+            try:
+                self._load(source)
+            except Exception as e:
+                logger.warning("Search index load of %s failed: %s", source, e)
+                with self._lock:
+                    self._failed[source] = time.monotonic()
+        return len(sources)
+
+    def _refresh_until_done(self):
+        # New projects only become due once the project list is loaded
+        while self.refresh():
+            pass
+
+    def ensure_fresh(self):
+        """Load the name lists inline on first use, everything else in the background.
+
+        Returns True while a background refresh is running.
+        """
+        if not self.is_loaded(("projects",)):
+            self.refresh([("projects",), ("users",)])
+        with self._lock:
+            running = self._refresher is not None and self._refresher.is_alive()
+            if running:
+                return True
+        if not self._due():
+            return False
+        with self._lock:
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(
+                    target=self._refresh_until_done, name="search-index-refresh", daemon=True)
+                self._refresher.start()
+        return True
+
+    def search(self, query, limit=20, kinds=None, project=None):
+        """Prefix, substring and trigram-fuzzy matches on names, best first."""
+        norm = normalize(query)
+        if not norm:
+            return []
+        grams = trigrams(norm)
+        needed = max(1, int(len(grams) * MIN_OVERLAP))
+        with_tasks = not kinds or "task" in kinds
+        # Only the posting lists are read under the lock, docs never change once added
+        with self._lock:
+            counts = Counter()
+            for gram in grams:
+                counts.update(self._grams.get(gram, ()))
+            candidates = [(self._docs[key], overlap) for key, overlap in counts.items() if overlap >= needed]
+            on_demand = with_tasks and ("project", project) in self._over_budget
+        if on_demand:
+            for doc in project_task_docs(project):
+                overlap = len(grams & doc.grams)
+                if overlap >= needed:
+                    candidates.append((doc, overlap))
+
+        scored = []
+        names = []
+        for doc, overlap in candidates:
+            if doc.kind == "task_name":
+                if not with_tasks:
+                    continue
+            elif kinds and doc.kind not in kinds:
+                continue
+            elif project and doc.project != project:
+                continue
+            score = _score(doc, norm, grams, overlap)
+            if score is None:
+                continue
+            if doc.kind == "task_name":
+                names.append((-score, len(doc.norm), doc.norm))
+            else:
+                scored.append((-score, len(doc.norm), doc.name, doc.path or "", doc))
+        scored.extend(self._expand_task_names(sorted(names), limit, project))
+        best = heapq.nsmallest(limit, scored, key=lambda item: item[:4])
+        return [doc.as_dict(-score) for score, _, _, _, doc in best]
+
+    def _expand_task_names(self, names, limit, project):
+        # Best names first, every task of a name shares its score. Common names
+        # ("comp") have tens of thousands of tasks, only ``limit`` are taken.
+        found = []
+        for score, length, norm in names:
+            if len(found) >= limit:
+                break
+            with self._lock:
+                tasks = (self._tasks[task_id] + (task_id,) for task_id in self._task_ids.get(norm, ()))
+                if project:
+                    tasks = (task for task in tasks if task[1] == project)
+                tasks = list(itertools.islice(tasks, limit - len(found)))
+            for name, task_project, path, _, task_id in tasks:
+                found.append((score, length, name, path, Doc("task", task_id, name, task_project, path)))
+        return found
+
+    def stats(self):
+        with self._lock:
+            return {
+                "docs": len(self._docs),
+                "tasks": len(self._tasks),
+                "grams": len(self._grams),
+                "sources": len(self._loaded),
+                "stale": len(self._stale),
+            }
+
+
+search_index = SearchIndex()
+
+
+def apply_event(event, index=search_index):
+    """Keep the index current from an AYON entity event."""
+    topic = event.get("topic") or ""
+    project = event.get("project")
+    entity_id = _summary(event).get("entityId")
+    if not project:
+        return
+    source = ("project", project)
+
+    if topic.startswith("entity.project."):
+        index.mark_stale(("projects",))
+        if topic == "entity.project.deleted":
+            index.drop(source)
+
+    elif topic.startswith("entity.folder."):
+        # A rename or move changes the path of everything below the folder
+        if index.is_loaded(source):
+            index.mark_stale(source)
+
+    elif topic.startswith("entity.task.") and entity_id:
+        if topic == "entity.task.deleted":
+            index.remove_task(entity_id)
+            return
+        if not index.is_loaded(source):
+            return
+        task = get_task(dd_io(project).con, project, entity_id, {"id", "name", "active"})
+        if task is None or not task.get("active", True):
+            index.remove_task(entity_id)
+            return
+        folder_path = ((task.get("folder") or {}).get("path") or "").strip("/")
+        index.upsert_task(source, task["id"], task["name"], f"{folder_path}/{task['name']}".lstrip("/"))
+
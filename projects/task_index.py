@@ -0,0 +1,69 @@
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from projects.iotc import db, get_async_db
+from .ayon_graphql import iter_project_tasks
+
+logger = logging.getLogger(__name__)
+
+# task id -> project, so a task can be fetched without knowing its show
+task_index_collection = db["ayon_task_index"]
+
+_indexes_ensured = False
+
+
+def ensure_task_index_indexes():
+    global _indexes_ensured
+    if _indexes_ensured:
+        return
+    task_index_collection.create_index([("project", ASCENDING)])
+    _indexes_ensured = True
+
+
+def lookup_project(task_id):
+    entry = task_index_collection.find_one({"_id": task_id}, {"project": 1})
+    return entry["project"] if entry else None
+
+
+async def alookup_project(task_id):
+    entry = await get_async_db()[task_index_collection.name].find_one({"_id": task_id}, {"project": 1})
+    return entry["project"] if entry else None
+
+
+def record_task(task_id, project):
+    task_index_collection.update_one(
+        {"_id": task_id},
+        {"$set": {"project": project, "indexed_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def forget_task(task_id):
+    task_index_collection.delete_one({"_id": task_id})
+
+
+def index_project(con, project, batch_size=1000):
+    """Index every task of a project and drop ids it no longer has.
+
+    Returns the number of tasks indexed.
+    """
+    ensure_task_index_indexes()
+    started = datetime.utcnow()
+    ops = []
+    count = 0
+    for task in iter_project_tasks(con, project, fields={"id"}, active=None):
+        ops.append(UpdateOne(
+            {"_id": task["id"]},
+            {"$set": {"project": project, "indexed_at": started}},
+            upsert=True,
+        ))
+        if len(ops) >= batch_size:
+            task_index_collection.bulk_write(ops, ordered=False)
+            count += len(ops)
+            ops = []
+    if ops:
+        task_index_collection.bulk_write(ops, ordered=False)
+        count += len(ops)
+    task_index_collection.delete_many({"project": project, "indexed_at": {"$lt": started}})
+    return count
+
@@ -0,0 +1,39 @@
+import os
+from unittest import mock
+from django.test import SimpleTestCase
+from projects import iotc, ingest, timecard
+
+
+class MongoMixin():
+    """Points ``projects.iotc`` at a fresh mongomock client for each test.
+
+    mongomock has no $merge or async client, the rollups and async views
+    are covered by the benchmark against a real mongod.
+    """
+
+    def setUp(self):
+        import mongomock
+        saved = iotc._client, iotc._client_pid
+        iotc._client = mongomock.MongoClient()
+        iotc._client_pid = os.getpid()
+        timecard._indexes_ensured = False
+        ingest._index_ensured = False
+
+        def restore():
+            iotc._client, iotc._client_pid = saved
+            timecard._indexes_ensured = False
+            ingest._index_ensured = False
+        self.addCleanup(restore)
+
+        # pymongo 4.11's UpdateOne passes a sort mongomock 4.3 does not take
+        add_update = mongomock.collection.BulkOperationBuilder.add_update
+        patcher = mock.patch.object(
+            mongomock.collection.BulkOperationBuilder, "add_update",
+            lambda builder, *args, sort=None, **kwargs: add_update(builder, *args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.time_data = iotc.get_db()["time_data"]
+
+
+class MongoTestCase(MongoMixin, SimpleTestCase):
+    pass
@@ -0,0 +1,71 @@
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from projects.auth import _dn_key, _group_names_key, forget_ldap_user
+from projects.bench.fake_ldap import PASSWORD, FakeLDAPDirectory, FakeLDAPServer
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=["projects.auth.CachedLDAPBackend"],
+    CACHES={"default": dict(LOCMEM, LOCATION="ldap-tests"), "sessions": LOCMEM},
+    AUTH_LDAP_CACHE_TIMEOUT=300,
+)
+class CachedLDAPBackendTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeLDAPServer(FakeLDAPDirectory.generate(users=5, usernames=["alice"])).start()
+        cls.addClassCleanup(cls.server.stop)
+        ldap_settings = override_settings(**cls.server.django_settings())
+        ldap_settings.enable()
+        cls.addClassCleanup(ldap_settings.disable)
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def login(self, password=PASSWORD, username="alice"):
+        before = self.server.counts()
+        user = authenticate(None, username=username, password=password)
+        after = self.server.counts()
+        return user, {name: after[name] - before[name] for name in after}
+
+    def test_repeat_login_reuses_the_dn_and_groups(self):
+        user, first = self.login()
+        self.assertEqual(user.username, "alice")
+        self.assertEqual(sorted(g.name for g in user.groups.all()), ["admins", "artists", "leads"])
+
+        user, cost = self.login()
+        self.assertEqual(user.username, "alice")
+        # Still a bind with the password, only the attributes are searched for
+        self.assertEqual(cost["searches"], 1)
+        self.assertLess(cost["searches"], first["searches"])
+        self.assertEqual(sorted(g.name for g in user.groups.all()), ["admins", "artists", "leads"])
+
+    def test_forget_drops_the_dn_and_group_names(self):
+        user, _ = self.login()
+        dn = caches["default"].get(_dn_key("alice"))
+        self.assertTrue(dn)
+        self.assertIsNotNone(caches["default"].get(_group_names_key(dn)))
+
+        forget_ldap_user("alice")
+        self.assertIsNone(caches["default"].get(_dn_key("alice")))
+        self.assertIsNone(caches["default"].get(_group_names_key(dn)))
+        _, cost = self.login()
+        self.assertGreater(cost["searches"], 1)
+
+    def test_failed_login_drops_the_cached_lookups(self):
+        self.login()
+        user, _ = self.login(password="wrong")
+        self.assertIsNone(user)
+        self.assertIsNone(caches["default"].get(_dn_key("alice")))
+        user, cost = self.login()
+        self.assertEqual(user.username, "alice")
+        self.assertGreater(cost["searches"], 1)
+
+    def test_unknown_users_are_searched_again(self):
+        user, _ = self.login(username="nobody")
+        self.assertIsNone(user)
+        _, cost = self.login(username="nobody")
+        self.assertGreater(cost["searches"], 0)
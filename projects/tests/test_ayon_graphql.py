@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase
+from projects.ayon_graphql import get_project_tasks_page, iter_project_tasks
+
+
+class FakeResponse():
+    def __init__(self, data):
+        self.errors = None
+        self.data = {"data": data}
+
+
+class FakeTasks():
+    """query_graphql for the project tasks connection over a list, cursors are positions."""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.requests = 0
+
+    def query_graphql(self, query, variables):
+        self.requests += 1
+        start = int(variables["after"]) + 1 if variables["after"] is not None else 0
+        page = self.tasks[start:start + variables["first"]]
+        end = start + len(page) - 1
+        return FakeResponse({"project": {"tasks": {
+            "pageInfo": {"hasNextPage": end + 1 < len(self.tasks), "endCursor": str(end)},
+            "edges": [{"cursor": str(start + i), "node": task} for i, task in enumerate(page)],
+        }}})
+
+
+def tasks(pattern):
+    # "a" an active task, "i" an inactive one
+    return [{"id": f"t{n}", "active": flag == "a"} for n, flag in enumerate(pattern)]
+
+
+class ProjectTasksPageTests(SimpleTestCase):
+    def ids(self, page):
+        return [task["id"] for task in page]
+
+    def test_pages_are_full_despite_inactive_tasks(self):
+        con = FakeTasks(tasks("aiiiaaiia"))
+        page, after = get_project_tasks_page(con, "p", first=3)
+        self.assertEqual(self.ids(page), ["t0", "t4", "t5"])
+        page, after = get_project_tasks_page(con, "p", first=3, after=after)
+        self.assertEqual((self.ids(page), after), (["t8"], None))
+
+    def test_no_cursor_when_only_inactive_tasks_remain(self):
+        con = FakeTasks(tasks("aaiaii"))
+        page, after = get_project_tasks_page(con, "p", first=3)
+        self.assertEqual((self.ids(page), after), (["t0", "t1", "t3"], None))
+        self.assertEqual(con.requests, 2)
+
+    def test_cursor_resumes_after_the_last_task_kept(self):
+        con = FakeTasks(tasks("aiaaaa"))
+        page, after = get_project_tasks_page(con, "p", first=4)
+        self.assertEqual(self.ids(page), ["t0", "t2", "t3", "t4"])
+        page, after = get_project_tasks_page(con, "p", first=4, after=after)
+        self.assertEqual((self.ids(page), after), (["t5"], None))
+
+    def test_iteration_keeps_every_task_once(self):
+        con = FakeTasks(tasks("aiaiiaaaia" * 3))
+        self.assertEqual(len(list(iter_project_tasks(con, "p", page_size=4))), 18)
+        self.assertEqual(len(list(iter_project_tasks(con, "p", page_size=4, active=None))), 30)
@@ -0,0 +1,127 @@
+import os
+from unittest import mock
+import requests
+from ayon_api.exceptions import UnauthorizedError
+from django.test import SimpleTestCase
+from projects import ayon_pool
+from projects.ayon_pool import AyonPool
+
+
+class FakeServer():
+    """Token issuer shared by the fake sessions, a login rotates the token."""
+
+    def __init__(self):
+        self.token = "t0"
+        self.logins = 0
+        self.sessions = []
+
+
+class FakeServerAPI():
+    def __init__(self, server, token=None):
+        self.server = server
+        self.access_token = token
+        self.closed = False
+        self.result = ["ABC"]
+        server.sessions.append(self)
+
+    @property
+    def has_valid_token(self):
+        return self.access_token == self.server.token
+
+    def validate_token(self):
+        return self.has_valid_token
+
+    def login(self, username, password):
+        self.server.logins += 1
+        self.server.token = f"t{self.server.logins}"
+        self.access_token = self.server.token
+
+    def set_token(self, token):
+        if token != self.server.token:
+            raise UnauthorizedError("expired")
+        self.access_token = token
+
+    def create_session(self):
+        pass
+
+    def close_session(self):
+        self.closed = True
+
+    def get_projects(self):
+        if not self.has_valid_token:
+            raise UnauthorizedError("expired")
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class AyonPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeServer()
+        patcher = mock.patch("ayon_api.ServerAPI", lambda url, token=None, **kwargs: FakeServerAPI(self.server, token))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = AyonPool(url="http://ayon", size=2, timeout=0.1)
+
+    def test_sessions_share_one_login(self):
+        with self.pool.connection() as first, self.pool.connection() as second:
+            self.assertIsNot(first, second)
+        self.assertEqual(self.server.logins, 1)
+        self.assertEqual(self.pool.call("get_projects"), ["ABC"])
+        self.assertEqual(len(self.server.sessions), 2)
+
+    def test_expired_token_is_renewed_once_for_every_session(self):
+        with self.pool.connection(), self.pool.connection():
+            pass
+        # The server forgets the token, e.g. after a restart
+        self.server.token = "rotated"
+        with self.pool.connection():
+            self.assertEqual(self.pool.call("get_projects"), ["ABC"])
+        # The other session picks up the renewed token without a login
+        self.assertEqual(self.pool.call("get_projects"), ["ABC"])
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual({con.access_token for con in self.server.sessions}, {self.pool.token})
+
+    def test_idle_sessions_are_revalidated(self):
+        with self.pool.connection() as con:
+            pass
+        self.server.token = "rotated"
+        with mock.patch.object(ayon_pool, "TOKEN_CHECK_INTERVAL", 0):
+            with self.pool.connection() as again:
+                self.assertIs(again, con)
+                self.assertTrue(again.has_valid_token)
+        self.assertEqual(self.server.logins, 2)
+
+    def test_transport_errors_discard_the_session(self):
+        with self.pool.connection() as broken:
+            pass
+        broken.result = requests.exceptions.ConnectionError("reset by peer")
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.pool.call("get_projects")
+        self.assertTrue(broken.closed)
+
+        with self.pool.connection() as first, self.pool.connection() as second:
+            self.assertNotIn(broken, (first, second))
+
+    def test_other_errors_keep_the_session(self):
+        with self.pool.connection() as con:
+            pass
+        con.result = ValueError("bad filter")
+        with self.assertRaises(ValueError):
+            self.pool.call("get_projects")
+        with self.pool.connection() as again:
+            self.assertIs(again, con)
+        self.assertFalse(con.closed)
+
+    def test_forked_child_does_not_reuse_the_parents_sessions(self):
+        with self.pool.connection() as parent, self.pool.connection():
+            pass
+        with mock.patch("projects.ayon_pool.os.getpid", return_value=os.getpid() + 1):
+            with self.pool.connection() as child, self.pool.connection() as other:
+                self.assertNotIn(parent, (child, other))
+            with self.pool.connection() as again:
+                self.assertIn(again, (child, other))
+        self.assertFalse(parent.closed)
+        self.assertEqual(len(self.server.sessions), 4)
+        # The child reuses the shared token, no new login
+        self.assertEqual(self.server.logins, 1)
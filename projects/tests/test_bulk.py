@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from django.test import SimpleTestCase
+from projects.bulk import ManifestError, bulk_create, read_manifest
+
+
+class FakeOperations():
+    """get_folders and send_batch_operations over an in-memory folder list."""
+
+    def __init__(self, folders=(), fail=()):
+        self.folders = list(folders)
+        self.fail = set(fail)
+        self.batches = []
+
+    def get_folders(self, project, folder_types=None, fields=None):
+        return [f for f in self.folders if f["folderType"] in folder_types]
+
+    def send_batch_operations(self, project, ops, can_fail=False, raise_on_fail=True):
+        self.batches.append(ops)
+        results = []
+        for op in ops:
+            success = op["data"]["name"] not in self.fail
+            if success:
+                self.folders.append({"id": op["entityId"], "name": op["data"]["name"],
+                                     "folderType": op["data"]["folderType"], "parentId": op["data"].get("parentId")})
+            results.append({"id": op["id"], "success": success, "detail": None if success else "name taken"})
+        return results
+
+
+def rows(*pairs):
+    return [{"sequence": sequence, "shot": shot, "attrib": {}} for sequence, shot in pairs]
+
+
+def statuses(report):
+    return {(item["sequence"], item["shot"]): item["status"] for item in report}
+
+
+class BulkCreateTests(SimpleTestCase):
+    def test_creates_sequences_before_their_shots_in_chunks(self):
+        con = FakeOperations()
+        report = bulk_create(con, "p", rows(("sq010", "sh010"), ("sq010", "sh020"), ("sq020", "sh010")), chunk_size=2)
+        self.assertEqual(set(statuses(report).values()), {"created"})
+        kinds = [[op["data"]["folderType"] for op in batch] for batch in con.batches]
+        self.assertEqual(kinds, [["Sequence", "Sequence"], ["Shot", "Shot"], ["Shot"]])
+        sequence_ids = {item["sequence"]: item["id"] for item in report if item["shot"] is None}
+        shot_parents = {op["data"]["name"] + op["data"]["parentId"] for batch in con.batches[1:] for op in batch}
+        self.assertIn("sh010" + sequence_ids["sq020"], shot_parents)
+
+    def test_rerun_skips_existing_folders(self):
+        con = FakeOperations()
+        bulk_create(con, "p", rows(("sq010", "sh010")))
+        report = bulk_create(con, "p", rows(("sq010", "sh010"), ("sq010", "sh020")))
+        self.assertEqual(statuses(report), {
+            ("sq010", None): "exists", ("sq010", "sh010"): "exists", ("sq010", "sh020"): "created"})
+
+    def test_failed_sequence_fails_its_shots_without_sending_them(self):
+        con = FakeOperations(fail={"sq020", "sh030"})
+        report = bulk_create(con, "p", rows(("sq010", "sh030"), ("sq010", "sh040"), ("sq020", "sh010")))
+        self.assertEqual(statuses(report), {
+            ("sq010", None): "created", ("sq020", None): "failed",
+            ("sq010", "sh030"): "failed", ("sq010", "sh040"): "created", ("sq020", "sh010"): "failed"})
+        errors = {item["shot"]: item.get("error") for item in report if item["status"] == "failed"}
+        self.assertEqual(errors["sh010"], "sequence sq020 was not created")
+        self.assertEqual(errors["sh030"], "name taken")
+        self.assertNotIn("sh010", [op["data"]["name"] for batch in con.batches for op in batch])
+
+    def test_dry_run_sends_nothing(self):
+        con = FakeOperations()
+        report = bulk_create(con, "p", rows(("sq010", "sh010")), dry_run=True)
+        self.assertEqual(set(statuses(report).values()), {"planned"})
+        self.assertEqual(con.batches, [])
+
+
+class ReadManifestTests(SimpleTestCase):
+    def write(self, name, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_csv_and_nested_json(self):
+        csv_rows = read_manifest(self.write("m.csv", "sequence,shot,frame_start,fps\nsq010,sh010,1001,24\nsq020,,,\n"))
+        self.assertEqual(csv_rows, [
+            {"sequence": "sq010", "shot": "sh010", "attrib": {"frameStart": 1001, "fps": 24.0}},
+            {"sequence": "sq020", "shot": None, "attrib": {}},
+        ])
+        data = {"sequences": [{"name": "sq010", "shots": [{"name": "sh010", "frameEnd": 1100}]}, {"name": "sq020"}]}
+        json_rows = read_manifest(self.write("m.json", json.dumps(data)))
+        self.assertEqual(json_rows, [
+            {"sequence": "sq010", "shot": "sh010", "attrib": {"frameEnd": 1100}},
+            {"sequence": "sq020", "shot": None, "attrib": {}},
+        ])
+
+    def test_bad_rows_name_their_line(self):
+        with self.assertRaisesMessage(ManifestError, "row 2: frame_start must be a number"):
+            read_manifest(self.write("m.csv", "sequence,shot,frame_start\nsq010,sh010,1\nsq010,sh020,x\n"))
+        with self.assertRaisesMessage(ManifestError, "row 1: sequence is required"):
+            read_manifest(self.write("m.csv", "sequence,shot\n,sh010\n"))
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from projects.cache import TTLCache, cached, hierarchy_cache, tagged
+
+
+class TTLCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TTLCache(max_entries=3, max_bytes=1024 * 1024)
+        self.now = 1000.0
+        patcher = mock.patch("projects.cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_or_load_caches_until_ttl(self):
+        calls = []
+        load = lambda: calls.append(1) or "value"
+        self.assertEqual(self.cache.get_or_load("k", load, 10), "value")
+        self.assertEqual(self.cache.get_or_load("k", load, 10), "value")
+        self.assertEqual(len(calls), 1)
+        self.now += 11
+        self.cache.get_or_load("k", load, 10)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for key in "abc":
+            self.cache.set(key, key, 10)
+        self.cache.get("a")
+        self.cache.set("d", "d", 10)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_byte_budget(self):
+        cache = TTLCache(max_entries=100, max_bytes=300)
+        cache.set("big", "x" * 1000, 10)
+        self.assertIsNone(cache.get("big"))
+        cache.set("a", "x" * 200, 10)
+        cache.set("b", "x" * 200, 10)
+        self.assertIsNone(cache.get("a"))
+        self.assertLessEqual(cache.bytes, 300)
+
+    def test_invalidate_tag_and_prefix(self):
+        self.cache.get_or_load(("tasks", "p", "sq", "sh"), lambda: tagged([1], ("folder", "f1")), 10)
+        self.cache.get_or_load(("tasks", "p", "sq", "sh2"), lambda: [2], 10, [("folder", "f2")])
+        self.cache.set(("shots", "p", "sq"), [3], 10)
+        self.assertEqual(self.cache.invalidate_tag(("folder", "f1")), 1)
+        self.assertIsNone(self.cache.get(("tasks", "p", "sq", "sh")))
+        self.assertEqual(self.cache.get(("tasks", "p", "sq", "sh2")), [2])
+        self.cache.invalidate_prefix(("tasks", "p"))
+        self.assertIsNone(self.cache.get(("tasks", "p", "sq", "sh2")))
+        self.assertEqual(self.cache.get(("shots", "p", "sq")), [3])
+
+    def test_loader_errors_are_not_cached(self):
+        def fail():
+            raise RuntimeError("down")
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_load("k", fail, 10)
+        self.assertEqual(self.cache.get_or_load("k", lambda: "ok", 10), "ok")
+
+    def test_invalidation_during_load_skips_the_store(self):
+        def load():
+            self.cache.invalidate("k")
+            return "stale"
+        self.assertEqual(self.cache.get_or_load("k", load, 10), "stale")
+        self.assertIsNone(self.cache.get("k"))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_misses_run_the_loader_once(self):
+        cache = TTLCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", load, 10)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Followers are queued on the flight before the leader finishes
+        while cache.stats()["coalesced"] < 4:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 5)
+
+    def test_concurrent_async_misses_run_the_loader_once(self):
+        cache = TTLCache()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def main():
+            first = asyncio.ensure_future(cache.aget_or_load("k", load, 10))
+            await asyncio.sleep(0)
+            # A cancelled caller leaves the load running for the others
+            first.cancel()
+            results = await asyncio.gather(*(cache.aget_or_load("k", load, 10) for _ in range(5)))
+            return results + [await cache.aget_or_load("k", load, 10)]
+
+        self.assertEqual(asyncio.run(main()), ["value"] * 6)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["coalesced"], 5)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_async_loader_errors_reach_every_caller(self):
+        cache = TTLCache()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("AYON down")
+
+        async def main():
+            return await asyncio.gather(*(cache.aget_or_load("k", load, 10) for _ in range(3)),
+                                        return_exceptions=True)
+
+        self.assertEqual([str(e) for e in asyncio.run(main())], ["AYON down"] * 3)
+        self.assertIsNone(cache.get("k"))
+
+
+class Reader():
+    use_replica = False
+
+    def __init__(self, project):
+        self.project = project
+        self.calls = 0
+
+    @cached("sequences", "project")
+    def sequences(self):
+        self.calls += 1
+        return [f"{self.project}_sq010"]
+
+
+class CachedDecoratorTests(SimpleTestCase):
+    def setUp(self):
+        hierarchy_cache.clear()
+        self.addCleanup(hierarchy_cache.clear)
+
+    def test_keyed_on_attrs_and_tagged_with_the_project(self):
+        a, b = Reader("alpha"), Reader("beta")
+        a.sequences()
+        a.sequences()
+        b.sequences()
+        self.assertEqual((a.calls, b.calls), (1, 1))
+        hierarchy_cache.invalidate_tag(("project", "alpha"))
+        a.sequences()
+        b.sequences()
+        self.assertEqual((a.calls, b.calls), (2, 1))
+
+    def test_replica_reads_bypass_the_cache(self):
+        reader = Reader("alpha")
+        reader.use_replica = True
+        reader.sequences()
+        reader.sequences()
+        self.assertEqual(reader.calls, 2)
@@ -0,0 +1,30 @@
+import asyncio
+from unittest import mock
+from django.test import SimpleTestCase
+from projects.ddio import dd_io
+
+
+class AsyncFindTaskTests(SimpleTestCase):
+    def find(self, delays, timeout=0.2):
+        # delays: project -> (seconds, task or None)
+        async def aget_task(acon, project, task_id, fields=None):
+            seconds, task = delays[project]
+            await asyncio.sleep(seconds)
+            return task
+
+        async def projects(self):
+            return list(delays)
+
+        val = dd_io()
+        with mock.patch("projects.ddio.aget_task", aget_task), \
+                mock.patch.object(dd_io, "aio_get_projects", projects), \
+                mock.patch("projects.ddio.FANOUT_TIMEOUT", timeout):
+            return asyncio.run(val._afind_task("t1"))
+
+    def test_first_hit_wins_without_waiting_for_slow_projects(self):
+        found = self.find({"slow": (5, None), "hit": (0.01, {"id": "t1"}), "miss": (0, None)}, timeout=2)
+        self.assertEqual(found, ("hit", {"id": "t1"}))
+
+    def test_fan_out_is_bounded(self):
+        with self.assertLogs("projects.ddio", "WARNING"):
+            self.assertEqual(self.find({"slow": (5, None), "miss": (0, None)}), (None, None))
@@ -0,0 +1,170 @@
+import os
+import sys
+from fnmatch import fnmatch
+from unittest import mock
+from django.test import SimpleTestCase
+from projects import events
+from projects.apps import is_web_process
+from projects.cache import TTLCache
+from projects.events import EventFollower, SeenEvents, events_since, invalidate_for_event
+
+
+class FakeEvents():
+    """get_events over a list, with AYON's strict newer_than and ascending order."""
+
+    def __init__(self, events):
+        self.events = events
+        self.queries = []
+
+    def get_events(self, topics=None, fields=None, limit=None, order=None, newer_than=None, project_names=None):
+        self.queries.append(newer_than)
+        events = sorted(self.events, key=lambda e: e["createdAt"], reverse=order is not None and order.name == "descending")
+        if topics:
+            events = [e for e in events if any(fnmatch(e["topic"], topic) for topic in topics)]
+        if project_names:
+            events = [e for e in events if e["project"] in project_names]
+        if newer_than:
+            events = [e for e in events if e["createdAt"] > newer_than]
+        return iter(events[:limit])
+
+
+def event(event_id, created, topic="entity.task.changed", project="p", **summary):
+    return {"id": event_id, "topic": topic, "project": project, "summary": summary, "createdAt": created}
+
+
+T0 = "2024-05-02T09:00:00.000000+00:00"
+T1 = "2024-05-02T09:00:01.000000+00:00"
+T2 = "2024-05-02T09:00:02.000000+00:00"
+T3 = "2024-05-02T09:00:03.000000+00:00"
+
+
+class InvalidateForEventTests(SimpleTestCase):
+    def test_task_event_drops_only_related_entries(self):
+        cache = TTLCache()
+        cache.set(("task", "t1"), 1, 60, [("task", "t1")])
+        cache.set(("task", "t2"), 2, 60, [("task", "t2")])
+        cache.set(("tasks", "p", "sq", "sh"), 3, 60, [("tasks_of", "shot1")])
+        invalidate_for_event(event("e", T0, entityId="t1", parentId="shot1"), cache)
+        self.assertIsNone(cache.get(("task", "t1")))
+        self.assertIsNone(cache.get(("tasks", "p", "sq", "sh")))
+        self.assertEqual(cache.get(("task", "t2")), 2)
+
+    def test_folder_event_drops_the_sequence_list(self):
+        cache = TTLCache()
+        cache.set(("sequences", "p"), ["sq010"], 60)
+        cache.set(("sequences", "q"), ["sq010"], 60)
+        invalidate_for_event(event("e", T0, topic="entity.folder.created", entityId="f1"), cache)
+        self.assertIsNone(cache.get(("sequences", "p")))
+        self.assertEqual(cache.get(("sequences", "q")), ["sq010"])
+
+
+class EventFollowerTests(SimpleTestCase):
+    def follower(self, con):
+        handled = []
+        return EventFollower(con=con, handlers=[lambda e: handled.append(e["id"])]), handled
+
+    def test_events_sharing_the_cursor_time_are_not_skipped(self):
+        con = FakeEvents([event("a", T0)])
+        follower, handled = self.follower(con)
+        self.assertEqual(follower.poll(), 0)  # Starts at the latest event
+        con.events += [event("b", T0), event("c", T1)]
+        self.assertEqual(follower.poll(), 2)
+        self.assertEqual(handled, ["b", "c"])
+        self.assertEqual(follower.cursor, T1)
+        # The overlap re-reads b and c, they are not handled twice
+        self.assertEqual(follower.poll(), 0)
+        self.assertEqual(handled, ["b", "c"])
+
+    def test_full_batch_of_seen_events_steps_past_the_overlap(self):
+        con = FakeEvents([event(str(i), T0) for i in range(3)] + [event("new", T1)])
+        seen = SeenEvents()
+        for i in range(3):
+            seen.add(str(i))
+        fresh = events_since(con, T0, seen, limit=3)
+        self.assertEqual([e["id"] for e in fresh], ["new"])
+        self.assertEqual(con.queries[-1], T0)
+
+    def test_seen_events_is_bounded(self):
+        seen = SeenEvents(size=2)
+        for event_id in "abc":
+            seen.add(event_id)
+        self.assertNotIn("a", seen)
+        self.assertIn("c", seen)
+
+
+class WebProcessTests(SimpleTestCase):
+    def check(self, argv, run_main=None, web=None):
+        env = {"RUN_MAIN": run_main} if run_main else {}
+        if web:
+            env["IOSPACE_WEB_PROCESS"] = web
+        with mock.patch.object(sys, "argv", argv), mock.patch.dict(os.environ, env):
+            if not run_main:
+                os.environ.pop("RUN_MAIN", None)
+            if not web:
+                os.environ.pop("IOSPACE_WEB_PROCESS", None)
+            return is_web_process()
+
+    def test_management_commands_are_not_web_processes(self):
+        self.assertFalse(self.check(["manage.py", "sync_ayon", "--follow"]))
+        self.assertFalse(self.check(["manage.py", "run_jobs"]))
+        self.assertFalse(self.check(["manage.py", "runserver"]))
+
+    def test_servers_are_web_processes(self):
+        self.assertTrue(self.check(["manage.py", "runserver"], run_main="true"))
+        self.assertTrue(self.check(["manage.py", "runserver", "--noreload"]))
+        self.assertTrue(self.check(["/usr/local/bin/gunicorn", "iospace.wsgi"], web="1"))
+
+    def test_other_programs_must_opt_in(self):
+        self.assertFalse(self.check(["/usr/local/bin/pytest"]))
+        self.assertFalse(self.check(["/usr/local/bin/celery", "worker"]))
+        self.assertFalse(self.check(["script.py"]))
+
+    def test_hierarchy_version_does_not_start_a_follower(self):
+        with mock.patch.object(events, "_follower", None), mock.patch.object(events, "EventFollower") as follower:
+            self.assertIsNone(events.hierarchy_version("projects"))
+        follower.assert_not_called()
+
+
+class HierarchyVersionTests(SimpleTestCase):
+    def setUp(self):
+        self.con = FakeEvents([
+            event("1", T0, "entity.project.changed"),
+            event("2", T1, "entity.folder.created"),
+            event("3", T2, "entity.task.changed"),
+            event("4", T3, "entity.folder.changed", project="q"),
+        ])
+        patcher = mock.patch.object(events, "_scope_versions", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def versions(self, base_cursor):
+        # A process whose follower started at ``base_cursor``
+        follower = EventFollower(con=self.con)
+        follower.base_cursor = base_cursor
+        with mock.patch.object(events, "_follower", follower), mock.patch.object(events, "_follower_pid", os.getpid()), \
+                mock.patch.object(events, "_scope_versions", {}):
+            return [events.hierarchy_version(*scope) for scope in (("projects",), ("folders", "p"), ("folders", "x"))]
+
+    def test_processes_started_apart_agree_on_versions(self):
+        self.assertEqual(self.versions(T1), [T0, T1, ""])
+        self.assertEqual(self.versions(T3), [T0, T1, ""])
+
+    def test_events_move_the_version_forward_only(self):
+        follower = EventFollower(con=self.con)
+        follower.base_cursor = T3
+        with mock.patch.object(events, "_follower", follower), mock.patch.object(events, "_follower_pid", os.getpid()):
+            self.assertEqual(events.hierarchy_version("folders", "p"), T1)
+            queries = len(self.con.queries)
+            events.record_hierarchy_version(event("5", T3, "entity.folder.changed"))
+            self.assertEqual(events.hierarchy_version("folders", "p"), T3)
+            events.record_hierarchy_version(event("6", T2, "entity.folder.changed"))
+            self.assertEqual(events.hierarchy_version("folders", "p"), T3)
+            self.assertEqual(len(self.con.queries), queries)
+
+    def test_failed_lookup_falls_back_to_no_version(self):
+        follower = EventFollower(con=mock.Mock(**{"get_events.side_effect": RuntimeError("down")}))
+        follower.base_cursor = T3
+        with mock.patch.object(events, "_follower", follower), mock.patch.object(events, "_follower_pid", os.getpid()):
+            with self.assertLogs("projects.events", "ERROR"):
+                self.assertIsNone(events.hierarchy_version("projects"))
+            self.assertNotIn(("projects",), events._scope_versions)
@@ -0,0 +1,155 @@
+import json
+import threading
+from datetime import datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+from pymongo.errors import AutoReconnect
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from projects.ingest import InvalidEntry, WriteBatcher, normalize_entry, validate, write_entries
+from projects.tests.mongo import MongoMixin, MongoTestCase
+
+
+def raw_entry(**fields):
+    entry = {"login": "jdoe", "system_id": "ws01", "task_id": "t1", "date": "2024-05-02",
+             "start_time": "09:00", "stop_time": "10:00"}
+    entry.update(fields)
+    return entry
+
+
+class NormalizeEntryTests(MongoTestCase):
+    def test_legacy_fields(self):
+        entry = normalize_entry(raw_entry(login="JDoe", project="ABC"))
+        self.assertEqual(entry["login"], "jdoe")
+        self.assertEqual(entry["date"], datetime(2024, 5, 2))
+        self.assertEqual((entry["work_time"], entry["work_seconds"]), ("01:00:00", 3600))
+        self.assertEqual(entry["project"], ["ABC"])
+        self.assertEqual(entry["entry_key"], "jdoe|ws01|2024-05-02|09:00:00")
+
+    def test_session_past_midnight(self):
+        entry = normalize_entry(raw_entry(start_time="23:30", stop_time="00:30"))
+        self.assertEqual((entry["date"], entry["work_seconds"]), (datetime(2024, 5, 2), 3600))
+
+    def test_offsets_and_epochs_land_in_one_zone(self):
+        with mock.patch("projects.ingest.TIME_ZONE", ZoneInfo("Asia/Kolkata")):
+            offset = normalize_entry({"login": "a", "system_id": "s", "task_id": "t",
+                                      "start": "2024-05-02T04:00:00Z", "stop": "2024-05-02T10:00:00+05:30"})
+            epoch = normalize_entry({"login": "a", "system_id": "s", "task_id": "t",
+                                     "start": datetime(2024, 5, 2, 4, tzinfo=ZoneInfo("UTC")).timestamp(),
+                                     "stop": "2024-05-02T10:00:00"})
+        for entry in (offset, epoch):
+            self.assertEqual((entry["start_time"], entry["stop_time"]), ("09:30:00", "10:00:00"))
+
+    def test_bad_entries(self):
+        for raw in ("x", raw_entry(login=""), raw_entry(task_id=None), raw_entry(date="02/05/2024"),
+                    raw_entry(start_time="25:00"), {"login": "a", "system_id": "s", "task_id": "t", "start": 0}):
+            with self.assertRaises(InvalidEntry):
+                normalize_entry(raw)
+
+    def test_validate_reports_indexes_and_enforces_login(self):
+        entries, rejected = validate([raw_entry(), raw_entry(login="other"), {}], login="JDoe")
+        self.assertEqual([index for index, _ in entries], [0])
+        self.assertEqual([item["index"] for item in rejected], [1, 2])
+        self.assertIn("signed in user", rejected[0]["error"])
+
+
+class WriteEntriesTests(MongoTestCase):
+    def write(self, *raws):
+        entries, rejected = validate(raws)
+        self.assertEqual(rejected, [])
+        return write_entries(entries, self.time_data)
+
+    def test_resent_batch_books_nothing_twice(self):
+        first = self.write(raw_entry(), raw_entry(start_time="11:00", stop_time="12:00"))
+        self.assertEqual((first["inserted"], first["failed"]), (2, []))
+        again = self.write(raw_entry(), raw_entry(start_time="11:00", stop_time="12:00"))
+        self.assertEqual((again["inserted"], again["existing"]), (0, 2))
+        self.assertEqual(self.time_data.count_documents({}), 2)
+        self.assertTrue(all(isinstance(e["ingested_at"], datetime) for e in self.time_data.find()))
+
+    def test_running_session_moves_its_stop_forward_only(self):
+        self.write(raw_entry(stop_time="09:10"))
+        self.write(raw_entry(stop_time="23:50"))
+        result = self.write(raw_entry(stop_time="09:30"))
+        self.assertEqual((result["inserted"], result["existing"]), (0, 1))
+        stored = self.time_data.find_one({})
+        self.assertEqual((stored["stop_time"], stored["work_time"], stored["work_seconds"]),
+                         ("23:50:00", "14:50:00", 53400))
+
+    def test_failed_entries_are_returned(self):
+        entries, _ = validate([raw_entry(), raw_entry(start_time="11:00")])
+        with mock.patch.object(type(self.time_data), "bulk_write", side_effect=AutoReconnect("down")):
+            result = write_entries(entries, self.time_data)
+        self.assertEqual([item["index"] for item in result["failed"]], [0, 1])
+        self.assertEqual(result["inserted"], 0)
+
+    def test_concurrent_requests_share_one_flush(self):
+        batcher = WriteBatcher(window=5, batch_size=4)
+        calls = []
+        bulk_write = type(self.time_data).bulk_write
+
+        def counting(collection, ops, **kwargs):
+            calls.append(len(ops))
+            return bulk_write(collection, ops, **kwargs)
+        results = {}
+
+        def post(n):
+            entries, _ = validate([raw_entry(start_time=f"{n:02d}:00", stop_time=f"{n:02d}:30"),
+                                   raw_entry(start_time=f"{n:02d}:40", stop_time=f"{n:02d}:50")])
+            results[n] = write_entries(entries, self.time_data, batcher)
+        with mock.patch.object(type(self.time_data), "bulk_write", counting):
+            # Two requests of two entries fill the batch, the leader does not wait out the window
+            threads = [threading.Thread(target=post, args=(n,)) for n in (9, 10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(calls, [4, 4])
+        self.assertEqual([results[n]["inserted"] for n in (9, 10)], [2, 2])
+        self.assertEqual(self.time_data.count_documents({}), 4)
+
+    def test_failures_go_back_to_the_request_that_sent_them(self):
+        batcher = WriteBatcher(window=0)
+        entries, _ = validate([raw_entry(), raw_entry(start_time="11:00")])
+        with mock.patch("projects.ingest._write_chunk", return_value=({0}, {1: "E11000"})):
+            result = write_entries(entries, self.time_data, batcher)
+        self.assertEqual((result["inserted"], result["failed"]), (1, [{"index": 1, "error": "E11000"}]))
+
+
+class IngestViewTests(MongoMixin, TestCase):
+    url = "/api/time-data/ingest/"
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("jdoe", password="pw")
+
+    def post(self, client, entries, **headers):
+        return client.post(self.url, json.dumps(entries), content_type="application/json", **headers)
+
+    def test_token_clients_post_for_any_login(self):
+        with mock.patch.dict("os.environ", IOSPACE_INGEST_TOKEN="secret"):
+            response = self.post(Client(enforce_csrf_checks=True), [raw_entry(login="other")],
+                                 HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["inserted"], 1)
+            response = self.post(Client(), [raw_entry()], HTTP_AUTHORIZATION="Bearer wrong")
+            self.assertEqual(response.status_code, 401)
+
+    def test_session_needs_csrf_and_its_own_login(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        self.assertEqual(self.post(client, [raw_entry()]).status_code, 403)
+
+        client.get("/login/")
+        token = client.cookies["csrftoken"].value
+        response = self.post(client, [raw_entry(), raw_entry(login="other")], HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["inserted"], 1)
+        self.assertEqual([item["index"] for item in response.json()["rejected"]], [1])
+
+    def test_only_json_bodies(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.post(self.url, {"entries": "x"})
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(Client().post(self.url, [], content_type="application/json").status_code, 401)
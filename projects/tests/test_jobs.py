@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from projects import jobs
+from projects.apps import start_background_services
+from projects.models import Job
+
+
+def flaky():
+    raise RuntimeError("AYON timed out")
+
+
+def refused():
+    raise jobs.JobFailed("sequence sq010 does not exist")
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        handlers = {"ok": lambda **params: {"status": "created"}, "flaky": flaky, "refused": refused}
+        patcher = mock.patch.dict(jobs._kinds, handlers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def job(self, kind="ok", **fields):
+        fields.setdefault("run_after", timezone.now())
+        return Job.objects.create(kind=kind, **fields)
+
+    def test_a_job_is_claimed_once(self):
+        job = self.job()
+        self.assertEqual(jobs.claim("w1", 5), [job.pk])
+        self.assertEqual(jobs.claim("w2", 5), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.RUNNING, "w1", 1))
+        self.assertIsNotNone(job.updated_at)
+
+    def test_future_jobs_are_not_claimed(self):
+        self.job(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(jobs.claim("w1", 5), [])
+
+    def test_failure_is_retried_with_backoff_then_fails(self):
+        job = self.job("flaky", max_attempts=2)
+        jobs.claim("w1", 1)
+        self.assertFalse(jobs.run_job(job.pk, "w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.QUEUED, ""))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("AYON timed out", job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.claim("w1", 1)
+        jobs.run_job(job.pk, "w1")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_job_failed_is_not_retried(self):
+        job = self.job("refused")
+        jobs.claim("w1", 1)
+        jobs.run_job(job.pk, "w1")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    def test_silent_jobs_are_requeued_and_heartbeats_spare_them(self):
+        alive, dead = self.job(), self.job()
+        jobs.claim("w1", 2)
+        long_ago = timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 60)
+        Job.objects.update(started_at=long_ago, updated_at=long_ago)
+
+        runner = jobs.JobRunner(workers=1)
+        self.addCleanup(runner.stop, wait=False)
+        runner.worker_id = "w1"
+        runner._running = {alive.pk}
+        runner.heartbeat()
+        self.assertEqual(jobs.requeue_stale(), 1)
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(alive.status, Job.RUNNING)
+        self.assertEqual((dead.status, dead.worker), (Job.QUEUED, ""))
+
+    def test_requeued_job_keeps_the_outcome_of_its_new_worker(self):
+        job = self.job()
+        jobs.claim("w1", 1)
+        Job.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=jobs.STALE_AFTER + 60))
+        jobs.requeue_stale()
+        jobs.claim("w2", 1)
+
+        # The first worker was only slow, its late result must not end the second run
+        self.assertFalse(jobs.run_job(job.pk, "w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.RUNNING, "w2"))
+        self.assertTrue(jobs.run_job(job.pk, "w2"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {"status": "created"}))
+
+    def test_runner_is_opt_in_and_starts_with_the_app_not_on_submit(self):
+        with mock.patch.object(jobs, "_runner", None), mock.patch.object(jobs, "RUN_JOBS", False), \
+                mock.patch.object(jobs, "JobRunner") as runner, \
+                mock.patch("projects.events.start_event_follower"), \
+                mock.patch("projects.rollups.start_rollup_refresher"):
+            jobs.submit("ok", {})
+            start_background_services()
+            runner.assert_not_called()
+            with mock.patch.object(jobs, "RUN_JOBS", True):
+                start_background_services()
+            runner.return_value.start.assert_called_once()
+
+    def test_unknown_kind_or_params_are_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.submit("nope", {})
+        with self.assertRaises(ValueError):
+            jobs.submit("refused", {"project": "x"})
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase
+from projects import metrics
+from projects.metrics import Counter, Histogram, MongoCommandMetrics, instrument_methods
+
+
+class MetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(metrics, "REGISTRY", [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class RenderTests(MetricsTestCase):
+    def test_histogram_buckets_sum_and_count(self):
+        latency = Histogram("x_seconds", "Time spent.", ("view",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            latency.observe(value, view="tasks")
+        self.assertEqual(metrics.render(), "\n".join([
+            "# HELP x_seconds Time spent.",
+            "# TYPE x_seconds histogram",
+            'x_seconds_bucket{view="tasks",le="0.1"} 1',
+            'x_seconds_bucket{view="tasks",le="1.0"} 2',
+            'x_seconds_bucket{view="tasks",le="+Inf"} 3',
+            'x_seconds_sum{view="tasks"} 5.55',
+            'x_seconds_count{view="tasks"} 3',
+        ]) + "\n")
+
+    def test_label_values_are_escaped(self):
+        errors = Counter("x_total", "Errors.", ("view", "operation"))
+        errors.inc(view='a"b', operation="c\\d\ne")
+        errors.inc(2)
+        self.assertEqual(errors.render()[2:], [
+            'x_total{view="",operation=""} 2',
+            'x_total{view="a\\"b",operation="c\\\\d\\ne"} 1',
+        ])
+        self.assertEqual(Counter("y_total", "Unlabelled.").render(), [
+            "# HELP y_total Unlabelled.", "# TYPE y_total counter"])
+
+    def test_payload_sizes_are_per_view(self):
+        upstream_items = Histogram("x_size", "Items.", ("upstream", "operation", "view"), buckets=(10,))
+        with mock.patch.object(metrics, "upstream_items", upstream_items):
+            timings, token = metrics.start_request("show_tasks")
+            try:
+                metrics.record("ayon", "get_tasks", 0.01, size=3)
+            finally:
+                metrics.end_request(token)
+            metrics.record("ayon", "get_tasks", 0.01, size=30)
+        self.assertEqual(upstream_items._values, {
+            ("ayon", "get_tasks", "show_tasks"): [1, 3.0, 1],
+            ("ayon", "get_tasks", "background"): [0, 30.0, 1],
+        })
+        self.assertIn('ayon;dur=10.0;desc="1 calls"', timings.server_timing())
+
+
+class InstrumentMethodsTests(MetricsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seconds = Histogram("x_seconds", "Time spent.", ("method", "view"))
+        patcher = mock.patch.object(metrics, "ddio_seconds", self.seconds)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_async_and_failing_methods_are_timed(self):
+        def iterate(self):
+            yield 1
+
+        @instrument_methods()
+        class Reader():
+            def io_get(self):
+                return "sync"
+
+            async def aio_get(self):
+                return "async"
+
+            def io_fail(self):
+                raise ValueError("boom")
+
+            io_iter = iterate
+
+            def helper(self):
+                return "untimed"
+
+        reader = Reader()
+        self.assertEqual(reader.io_get(), "sync")
+        self.assertEqual(asyncio.run(reader.aio_get()), "async")
+        with self.assertRaises(ValueError):
+            reader.io_fail()
+        self.assertEqual(reader.helper(), "untimed")
+        self.assertIs(Reader.io_iter, iterate)
+        self.assertEqual(Reader.io_get.__name__, "io_get")
+        self.assertEqual({key: state[-1] for key, state in self.seconds._values.items()}, {
+            ("io_get", "background"): 1, ("aio_get", "background"): 1, ("io_fail", "background"): 1})
+
+
+class MongoCommandMetricsTests(SimpleTestCase):
+    def event(self, name, reply=None):
+        return SimpleNamespace(command_name=name, duration_micros=2500, reply=reply)
+
+    def test_result_sizes_from_the_reply(self):
+        listener = MongoCommandMetrics()
+        with mock.patch.object(metrics, "record") as record:
+            listener.succeeded(self.event("find", {"cursor": {"firstBatch": [{}, {}]}}))
+            listener.succeeded(self.event("getMore", {"cursor": {"nextBatch": [{}]}}))
+            listener.succeeded(self.event("insert", {"n": 4}))
+            listener.succeeded(self.event("ping", {}))
+            listener.failed(self.event("aggregate"))
+        self.assertEqual(record.call_args_list, [
+            mock.call("mongo", "find", 0.0025, 2),
+            mock.call("mongo", "getMore", 0.0025, 1),
+            mock.call("mongo", "insert", 0.0025, 4),
+            mock.call("mongo", "ping", 0.0025, None),
+            mock.call("mongo", "aggregate", 0.0025, error=True),
+        ])
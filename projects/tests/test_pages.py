@@ -0,0 +1,91 @@
+import asyncio
+from unittest import mock
+from django.test import RequestFactory, SimpleTestCase
+from projects import views
+from projects.cache import TTLCache
+
+VERSION = "2024-05-01T10:00:00+00:00"
+
+
+class EvictingCache(TTLCache):
+    """Answers get() from the cache, then loses the entry before get_or_load."""
+
+    def get_or_load(self, key, loader, ttl, tags=()):
+        self.clear()
+        return super().get_or_load(key, loader, ttl, tags)
+
+
+class HierarchyPageTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TTLCache()
+        self.version = VERSION
+        for target, value in (("page_cache", self.cache), ("hierarchy_version", lambda *scope: self.version)):
+            patcher = mock.patch.object(views, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.load_context = mock.Mock(return_value={"projects": ["ABC", "XYZ"]})
+
+    def get(self, **headers):
+        request = RequestFactory().get("/projects/", **headers)
+        return views._hierarchy_page(request, "projects.html", ("projects",), self.load_context)
+
+    def test_unchanged_page_is_a_304_without_loading(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b"XYZ", first.content)
+        self.assertEqual(first["Cache-Control"], "no-cache")
+        self.assertIn("Last-Modified", first)
+
+        response = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        self.assertEqual(self.load_context.call_count, 1)
+
+    def test_rendered_page_is_shared_until_the_version_moves(self):
+        first = self.get()
+        self.assertEqual(self.get().content, first.content)
+        self.assertEqual(self.load_context.call_count, 1)
+
+        self.version = "2024-05-01T11:00:00+00:00"
+        self.load_context.return_value = {"projects": ["ABC"]}
+        response = self.get(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertNotIn(b"XYZ", response.content)
+
+    def test_without_a_version_the_etag_follows_the_data(self):
+        self.version = None
+        first = self.get()
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        self.assertNotIn("Last-Modified", first)
+        self.load_context.return_value = {"projects": ["ABC"]}
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 200)
+
+
+class AsyncHierarchyPageTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = EvictingCache()
+        for target, value in (("page_cache", self.cache), ("hierarchy_version", lambda *scope: VERSION)):
+            patcher = mock.patch.object(views, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_page_evicted_after_the_lookup_is_still_served(self):
+        request = RequestFactory().get("/projects/")
+        etag, _ = views._page_validators(request, VERSION)
+        self.cache.set(("/projects/", etag), "<p>cached page</p>", 60)
+        load_context = mock.AsyncMock()
+
+        response = asyncio.run(views._ahierarchy_page(request, "projects.html", ("projects",), load_context))
+        self.assertEqual(response.content, b"<p>cached page</p>")
+        load_context.assert_not_called()
+
+    def test_unchanged_page_is_a_304_without_loading(self):
+        request = RequestFactory().get("/projects/")
+        etag, _ = views._page_validators(request, VERSION)
+        request = RequestFactory().get("/projects/", HTTP_IF_NONE_MATCH=etag)
+        load_context = mock.AsyncMock()
+
+        response = asyncio.run(views._ahierarchy_page(request, "projects.html", ("projects",), load_context))
+        self.assertEqual(response.status_code, 304)
+        load_context.assert_not_called()
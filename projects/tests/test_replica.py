@@ -0,0 +1,182 @@
+from unittest import mock
+from ayon_api.utils import SortOrder
+from django.test import TestCase
+from projects import ddio, replica
+from projects.ddio import dd_io
+from projects.events import SeenEvents
+from projects.models import AyonFolder, AyonProject, AyonTask, SyncState
+
+
+class FakeAyon():
+    """The ServerAPI calls the replica makes, over in-memory entities."""
+
+    def __init__(self):
+        self.users = ["alice", "bob"]
+        self.projects = {"ABC": True}
+        self.folders = {"ABC": [
+            {"id": "f1", "name": "sq010", "folderType": "Sequence", "parentId": None, "path": "/sq010"},
+            {"id": "f2", "name": "sh010", "folderType": "Shot", "parentId": "f1", "path": "/sq010/sh010"},
+            {"id": "f3", "name": "sh020", "folderType": "Shot", "parentId": "f1", "path": "/sq010/sh020"},
+        ]}
+        self.tasks = {"ABC": [
+            self.task("t1", "comp", "f2", ["alice"]),
+            self.task("t2", "anim", "f2", ["bob"]),
+            self.task("t3", "comp", "f3", ["alice", "bob"]),
+        ]}
+        self.events = []
+
+    def task(self, task_id, name, folder_id, assignees):
+        return {"id": task_id, "name": name, "taskType": name.title(), "status": "Ready",
+                "assignees": assignees, "folderId": folder_id, "active": True,
+                "attrib": {"fps": 25, "frameStart": 1001}}
+
+    def event(self, topic, entity_id, created_at, project="ABC"):
+        self.events.append({"id": f"e{len(self.events)}", "topic": topic, "project": project,
+                            "summary": {"entityId": entity_id}, "createdAt": created_at})
+
+    def get_users(self, fields=None):
+        return [{"name": name} for name in self.users]
+
+    def get_projects(self, fields=None):
+        return [{"name": name} for name in self.projects]
+
+    def get_project(self, project):
+        if project not in self.projects:
+            return None
+        return {"name": project, "active": self.projects[project]}
+
+    def get_folders(self, project, fields=None):
+        return list(self.folders.get(project, []))
+
+    def get_folder_by_id(self, project, folder_id, fields=None):
+        return next((f for f in self.folders.get(project, []) if f["id"] == folder_id), None)
+
+    def get_events(self, topics=None, fields=None, limit=None, order=None, newer_than=None):
+        events = sorted(self.events, key=lambda e: e["createdAt"], reverse=order == SortOrder.descending)
+        if newer_than:
+            events = [e for e in events if e["createdAt"] > newer_than]
+        return events[:limit]
+
+
+def iter_project_tasks(con, project, fields=None, active=True):
+    return iter(con.tasks.get(project, []))
+
+
+def get_task(con, project, task_id, fields=None):
+    return next((t for t in con.tasks.get(project, []) if t["id"] == task_id), None)
+
+
+class ReplicaTestCase(TestCase):
+    def setUp(self):
+        self.con = FakeAyon()
+        for target, value in (("iter_project_tasks", iter_project_tasks), ("get_task", get_task),
+                              ("_ready", False), ("_seen", SeenEvents())):
+            patcher = mock.patch.object(replica, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def cursor(self):
+        return SyncState.objects.get(key=replica.EVENTS_KEY).cursor
+
+
+class SyncTests(ReplicaTestCase):
+    def test_full_sync_loads_everything_and_drops_removed_projects(self):
+        AyonProject.objects.create(name="OLD")
+        AyonTask.objects.create(id="old", project="OLD", folder_id="x", name="comp")
+        self.con.event("entity.task.changed", "t1", "2024-05-01T10:00:00+00:00")
+        self.assertFalse(replica.is_ready())
+
+        log = mock.Mock()
+        self.assertEqual(replica.full_sync(self.con, log=log), 1)
+        self.assertTrue(replica.is_ready())
+        log.assert_any_call("ABC: 3 folders, 3 tasks")
+        self.assertEqual(replica.projects(), ["ABC"])
+        self.assertEqual(replica.users(), ["alice", "bob"])
+        self.assertFalse(AyonTask.objects.filter(project="OLD").exists())
+        # Events from before the load are not replayed
+        self.assertEqual(self.cursor(), "2024-05-01T10:00:00+00:00")
+
+    def test_apply_event_refetches_the_entity(self):
+        replica.full_sync(self.con)
+        self.con.tasks["ABC"][0]["status"] = "Done"
+        self.con.tasks["ABC"].pop(1)
+        self.con.folders["ABC"].pop(2)
+        self.con.projects["ABC"] = False
+
+        for topic, entity_id in (("entity.task.status_changed", "t1"), ("entity.task.deleted", "t2"),
+                                 ("entity.folder.deleted", "f3"), ("entity.project.changed", None)):
+            replica.apply_event(self.con, {"topic": topic, "project": "ABC", "summary": {"entityId": entity_id}})
+        self.assertEqual(AyonTask.objects.get(id="t1").status, "Done")
+        self.assertEqual(list(AyonTask.objects.values_list("id", flat=True)), ["t1"])
+        self.assertFalse(AyonFolder.objects.filter(id="f3").exists())
+        self.assertEqual(replica.projects(), [])
+
+        replica.apply_event(self.con, {"topic": "entity.project.deleted", "project": "ABC", "summary": {}})
+        self.assertFalse(AyonFolder.objects.exists())
+
+    def test_sync_events_loads_first_then_applies_each_event_once(self):
+        self.assertEqual(replica.sync_events(self.con), 0)
+        self.assertTrue(replica.is_ready())
+
+        self.con.tasks["ABC"].append(self.con.task("t4", "fx", "f3", []))
+        self.con.event("entity.task.created", "t4", "2024-05-01T10:00:00+00:00")
+        self.con.event("entity.task.created", "t4", "2024-05-01T10:00:01+00:00")
+        self.assertEqual(replica.sync_events(self.con), 2)
+        self.assertEqual(AyonTask.objects.get(id="t4").name, "fx")
+        self.assertEqual(self.cursor(), "2024-05-01T10:00:01+00:00")
+        # Re-read by the cursor overlap, but already applied
+        self.assertEqual(replica.sync_events(self.con), 0)
+
+    def test_failed_event_is_retried_from_the_cursor(self):
+        replica.sync_events(self.con)
+        self.con.event("entity.task.changed", "t1", "2024-05-01T10:00:00+00:00")
+        self.con.event("entity.task.changed", "t2", "2024-05-01T10:00:05+00:00")
+        with mock.patch.object(replica, "get_task", side_effect=[self.con.tasks["ABC"][0], RuntimeError("timeout")]):
+            with self.assertLogs("projects.replica", "ERROR"):
+                self.assertEqual(replica.sync_events(self.con), 1)
+        self.assertEqual(self.cursor(), "2024-05-01T10:00:00+00:00")
+        self.assertEqual(replica.sync_events(self.con), 1)
+        self.assertEqual(self.cursor(), "2024-05-01T10:00:05+00:00")
+
+
+class ReplicaReadTests(ReplicaTestCase):
+    def setUp(self):
+        super().setUp()
+        replica.full_sync(self.con)
+        patcher = mock.patch.object(ddio, "REPLICA_READS", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hierarchy_reads(self):
+        val = dd_io("ABC", "sq010")
+        self.assertTrue(val.use_replica)
+        self.assertEqual(val.io_get_projects(), ["ABC"])
+        self.assertEqual(val.io_get_users(), ["alice", "bob"])
+        self.assertEqual(val.io_get_sequences(), ["sq010"])
+        self.assertEqual(val.io_get_shots(), ["sh010", "sh020"])
+        self.assertEqual(dd_io("ABC", "sq999").io_get_shots(), [])
+
+    def test_shot_tasks_have_the_requested_fields(self):
+        tasks, cursor = dd_io("ABC", "sq010", "sh010").io_get_tasks_page(fields="tasks")
+        self.assertIsNone(cursor)
+        self.assertEqual(tasks, [
+            {"id": "t2", "name": "anim", "taskType": "Anim", "status": "Ready"},
+            {"id": "t1", "name": "comp", "taskType": "Comp", "status": "Ready"},
+        ])
+        tasks, _ = dd_io("ABC", "sq010", "sh010").io_get_tasks_page(fields={"name", "attrib.fps"})
+        self.assertEqual(tasks[0], {"id": "t2", "name": "anim", "attrib": {"fps": 25}})
+        self.assertEqual(dd_io("ABC", "sq010", "sh999").io_get_tasks_page(fallback=False), (None, None))
+
+    def test_project_tasks_are_paged_by_id(self):
+        val = dd_io("ABC")
+        tasks, cursor = val.io_get_tasks_page(limit=2, fields="tasks")
+        self.assertEqual(([t["id"] for t in tasks], cursor), (["t1", "t2"], "t2"))
+        tasks, cursor = val.io_get_tasks_page(after=cursor, limit=2, fields="tasks")
+        self.assertEqual(([t["id"] for t in tasks], cursor), (["t3"], None))
+
+    def test_task_and_user_tasks(self):
+        val = dd_io(user="bob")
+        [task] = val.io_get_task("t3", fields="task_detail")
+        self.assertEqual(task["folder"], {"id": "f3", "name": "sh020", "path": "/sq010/sh020", "folderType": "Shot"})
+        self.assertEqual(val.io_get_task("missing"), [])
+        self.assertEqual(sorted(t["id"] for t in val.io_get_user_tasks("ABC", fields="tasks")), ["t2", "t3"])
@@ -0,0 +1,107 @@
+import io
+from datetime import datetime, timedelta
+from unittest import mock
+import mongomock
+from django.core.management import call_command
+from django.test import RequestFactory
+from projects import rollups, views
+from projects.tests.mongo import MongoTestCase
+
+_aggregate = mongomock.collection.Collection.aggregate
+
+
+def _aggregate_with_merge(collection, pipeline, **kwargs):
+    # mongomock has no $out or $merge, apply the last stage by hand
+    last = pipeline[-1]
+    if "$out" not in last and "$merge" not in last:
+        return _aggregate(collection, pipeline)
+    rows = list(_aggregate(collection, pipeline[:-1]))
+    target = collection.database[last.get("$out") or last["$merge"]["into"]]
+    if "$out" in last:
+        target.delete_many({})
+    for row in rows:
+        target.replace_one({"_id": row["_id"]}, row, upsert=True)
+    return iter(())
+
+
+class RollupTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(mongomock.collection.Collection, "aggregate", _aggregate_with_merge)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = datetime(2024, 5, 10, 12)
+
+    def add(self, login, day, seconds, ingested_at=None, **fields):
+        entry = {"login": login, "date": datetime(2024, 5, day), "work_seconds": seconds,
+                 "department": "comp", "project": ["ABC"], "schema_version": 2}
+        if ingested_at is not None:
+            entry["ingested_at"] = ingested_at
+        entry.update(fields)
+        self.time_data.insert_one(entry)
+
+    def totals(self):
+        return {(row["_id"]["login"], row["_id"]["day"].day): row["seconds"]
+                for row in rollups.rollup_collection.find()}
+
+    def test_refresh_regroups_touched_days_without_double_counting(self):
+        self.add("a", 1, 100)
+        rollups.update_rollups()
+        self.assertEqual(self.totals(), {("a", 1): 100})
+
+        self.add("a", 1, 50, ingested_at=self.now)
+        self.add("b", 2, 30, ingested_at=self.now)
+        self.assertTrue(rollups.update_rollups())
+        # Still inside the overlap window, regrouping again changes nothing
+        self.assertTrue(rollups.update_rollups())
+        self.assertEqual(self.totals(), {("a", 1): 150, ("b", 2): 30})
+        self.assertEqual(rollups.state_collection.find_one()["watermark"], self.now)
+
+    def test_entry_visible_late_with_an_older_ingested_at_is_picked_up(self):
+        self.add("a", 1, 100, ingested_at=self.now)
+        rollups.update_rollups()
+        self.add("a", 3, 40, ingested_at=self.now - timedelta(seconds=30))
+        rollups.update_rollups()
+        self.assertEqual(self.totals(), {("a", 1): 100, ("a", 3): 40})
+        self.assertEqual(rollups.state_collection.find_one()["watermark"], self.now)
+
+    def test_watermark_stays_when_the_merge_fails(self):
+        self.add("a", 1, 100, ingested_at=self.now)
+        rollups.update_rollups()
+        later = self.now + timedelta(hours=1)
+        self.add("a", 2, 10, ingested_at=later)
+        with mock.patch.object(mongomock.collection.Collection, "aggregate",
+                               side_effect=[iter([{"days": [datetime(2024, 5, 2)], "latest": later}]),
+                                            RuntimeError("merge failed")]):
+            with self.assertRaises(RuntimeError):
+                rollups.update_rollups()
+        self.assertEqual(rollups.state_collection.find_one()["watermark"], self.now)
+        rollups.update_rollups()
+        self.assertEqual(self.totals(), {("a", 1): 100, ("a", 2): 10})
+
+    def test_first_run_rebuilds_and_reports_it(self):
+        self.add("a", 1, 100)
+        out = io.StringIO()
+        call_command("rollup_time_data", stdout=out)
+        self.assertIn("Daily rollup updated", out.getvalue())
+        self.assertEqual(self.totals(), {("a", 1): 100})
+        call_command("rollup_time_data", stdout=out)
+        self.assertIn("already up to date", out.getvalue())
+
+    def test_summary_views_only_read_the_rollup(self):
+        self.add("a", 1, 3600)
+        rollups.rebuild_rollups()
+        self.add("b", 1, 3600, ingested_at=self.now)
+        with mock.patch.object(rollups, "update_rollups") as update:
+            response = views.time_data_summary_json(RequestFactory().get("/", {"period": "all"}))
+        update.assert_not_called()
+        self.assertIn(b'"login": "a"', response.content)
+        self.assertNotIn(b'"login": "b"', response.content)
+
+    def test_summary_filters_like_the_table(self):
+        self.add("JDoe", 1, 3600)
+        self.add("ajdoe", 1, 3600)
+        rollups.rebuild_rollups()
+        logins = lambda **params: [row["login"] for row in rollups.summary(dict(params, period="all"))["rows"]]
+        self.assertEqual(logins(login="jdoe"), ["JDoe"])
+        self.assertEqual(logins(login="doe"), [])
@@ -0,0 +1,93 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from projects.cache import TTLCache
+from projects import search
+from projects.search import Doc, SearchIndex, apply_event
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.replace(("projects",), [Doc("project", "alpha", "alpha", "alpha"), Doc("project", "beta", "beta", "beta")])
+        self.index.replace(("project", "alpha"), [
+            Doc("sequence", "f1", "sq010", "alpha", "sq010"),
+            Doc("shot", "f2", "sh0100", "alpha", "sq010/sh0100"),
+            Doc("shot", "f3", "sh0200", "alpha", "sq010/sh0200"),
+        ], [("t1", "lighting", "sq010/sh0100/lighting"), ("t2", "comp", "sq010/sh0100/comp"),
+            ("t3", "comp", "sq010/sh0200/comp")])
+        self.index.replace(("project", "beta"), [], [("t4", "Comp", "sq020/sh0300/Comp")])
+        self.task_docs = [Doc("task", "t9", "lighting", "gamma", "sq090/sh0900/lighting")]
+        cache = mock.patch("projects.search.hierarchy_cache", TTLCache())
+        cache.start()
+        self.addCleanup(cache.stop)
+        self.loads = []
+        loader = mock.patch("projects.search._load_task_docs",
+                            lambda project: self.loads.append(project) or self.task_docs)
+        loader.start()
+        self.addCleanup(loader.stop)
+
+    def test_prefix_beats_fuzzy(self):
+        self.assertEqual(names(self.index.search("sh01"))[0], "sh0100")
+        self.assertEqual(names(self.index.search("sh0", kinds=["shot"])), ["sh0100", "sh0200"])
+
+    def test_tasks_are_found_across_projects(self):
+        results = self.index.search("comp")
+        self.assertEqual([(r["project"], r["path"]) for r in results], [
+            ("beta", "sq020/sh0300/Comp"), ("alpha", "sq010/sh0100/comp"), ("alpha", "sq010/sh0200/comp")])
+        self.assertEqual(names(self.index.search("lightng")), ["lighting"])
+        self.assertEqual(len(self.index.search("comp", limit=2)), 2)
+        self.assertEqual(names(self.index.search("comp", project="beta")), ["Comp"])
+        self.assertEqual(names(self.index.search("comp", kinds=["shot"])), [])
+        self.assertEqual(self.loads, [])
+
+    def test_task_names_are_indexed_once(self):
+        # Two projects, the sequence, two shots and two distinct task names
+        self.assertEqual(self.index.stats()["docs"], 7)
+        self.assertEqual(self.index.stats()["tasks"], 4)
+        self.index.drop(("project", "beta"))
+        self.index.remove_task("t2")
+        self.index.remove_task("t3")
+        self.assertEqual(names(self.index.search("comp", kinds=["task"])), [])
+        self.assertEqual(self.index.stats()["tasks"], 1)
+
+    def test_projects_past_the_budget_are_searched_on_demand(self):
+        with mock.patch("projects.search.MAX_TASKS", 4):
+            self.index.replace(("project", "gamma"), [], [("t9", "lighting", "sq090/sh0900/lighting")])
+        self.assertEqual(self.index.stats()["tasks"], 4)
+        self.assertEqual(names(self.index.search("lighting")), ["lighting"])
+        self.assertEqual(self.loads, [])
+        self.assertEqual([r["project"] for r in self.index.search("lighting", project="gamma")], ["gamma"])
+        self.assertEqual(self.loads, ["gamma"])
+
+    def test_scoring_runs_outside_the_lock(self):
+        held = []
+        real_score = search._score
+
+        def score(*args):
+            held.append(self.index._lock.locked())
+            return real_score(*args)
+        with mock.patch("projects.search._score", score):
+            self.index.search("sh0")
+        self.assertTrue(held)
+        self.assertFalse(any(held))
+
+    def test_project_events(self):
+        apply_event({"topic": "entity.folder.changed", "project": "alpha", "summary": {}}, self.index)
+        self.assertIn(("project", "alpha"), self.index._due())
+        apply_event({"topic": "entity.project.deleted", "project": "alpha", "summary": {}}, self.index)
+        self.assertEqual(names(self.index.search("sh0100")), [])
+        self.assertEqual([r["project"] for r in self.index.search("comp")], ["beta"])
+
+    def test_task_events(self):
+        self.index.replace(("project", "alpha"), [], [])
+        self.index._loaded[("project", "alpha")] = 0
+        task = {"id": "t5", "name": "fx", "active": True, "folder": {"path": "/sq010/sh0100"}}
+        with mock.patch("projects.search.get_task", return_value=task), mock.patch("projects.search.dd_io"):
+            apply_event({"topic": "entity.task.created", "project": "alpha", "summary": {"entityId": "t5"}}, self.index)
+        self.assertEqual([r["path"] for r in self.index.search("fx")], ["sq010/sh0100/fx"])
+        apply_event({"topic": "entity.task.deleted", "project": "alpha", "summary": {"entityId": "t5"}}, self.index)
+        self.assertEqual(self.index.search("fx"), [])
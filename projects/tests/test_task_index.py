@@ -0,0 +1,79 @@
+from datetime import datetime
+from unittest import mock
+from projects import ddio, task_index
+from projects.cache import hierarchy_cache
+from projects.ddio import dd_io
+from projects.task_index import forget_task, index_project, lookup_project, record_task
+from projects.tests.mongo import MongoTestCase
+
+
+class TaskIndexTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(task_index, "_indexes_ensured", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record_lookup_and_forget(self):
+        self.assertIsNone(lookup_project("t1"))
+        record_task("t1", "ABC")
+        self.assertEqual(lookup_project("t1"), "ABC")
+        # Moved to another project
+        record_task("t1", "XYZ")
+        self.assertEqual(lookup_project("t1"), "XYZ")
+        forget_task("t1")
+        self.assertIsNone(lookup_project("t1"))
+        forget_task("t1")
+
+    def test_index_project_replaces_only_that_projects_ids(self):
+        # Indexed by an earlier run, Mongo dates only keep milliseconds
+        task_index.task_index_collection.insert_many([
+            {"_id": "gone", "project": "ABC", "indexed_at": datetime(2024, 5, 1)},
+            {"_id": "other", "project": "XYZ", "indexed_at": datetime(2024, 5, 1)},
+        ])
+        tasks = [{"id": f"t{n}"} for n in range(5)]
+        with mock.patch.object(task_index, "iter_project_tasks", return_value=iter(tasks)) as iter_tasks:
+            self.assertEqual(index_project(mock.Mock(), "ABC", batch_size=2), 5)
+        self.assertEqual(iter_tasks.call_args.kwargs, {"fields": {"id"}, "active": None})
+        self.assertEqual(lookup_project("t4"), "ABC")
+        self.assertIsNone(lookup_project("gone"))
+        self.assertEqual(lookup_project("other"), "XYZ")
+
+
+class IndexedTaskLookupTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        hierarchy_cache.clear()
+        self.addCleanup(hierarchy_cache.clear)
+        self.tasks = {("XYZ", "t1"): {"id": "t1", "name": "comp"}}
+        self.get_task = mock.Mock(side_effect=lambda con, project, task_id, fields: self.tasks.get((project, task_id)))
+        for target, name, value in ((ddio, "get_task", self.get_task),
+                                    (dd_io, "io_get_projects", lambda val: ["ABC", "XYZ"]),
+                                    (ddio, "REPLICA_READS", False)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def projects_asked(self):
+        return sorted(call.args[1] for call in self.get_task.call_args_list)
+
+    def test_miss_scans_the_projects_and_records_the_hit(self):
+        self.assertEqual(dd_io().io_get_task("t1"), [{"id": "t1", "name": "comp"}])
+        self.assertEqual(self.projects_asked(), ["ABC", "XYZ"])
+        self.assertEqual(lookup_project("t1"), "XYZ")
+
+    def test_hit_asks_only_the_indexed_project(self):
+        record_task("t1", "XYZ")
+        self.assertEqual(dd_io().io_get_task("t1"), [{"id": "t1", "name": "comp"}])
+        self.assertEqual(self.projects_asked(), ["XYZ"])
+
+    def test_stale_entry_is_forgotten(self):
+        record_task("t1", "ABC")
+        self.assertEqual(dd_io().io_get_task("t1"), [])
+        self.assertEqual(self.projects_asked(), ["ABC"])
+        self.assertIsNone(lookup_project("t1"))
+
+    def test_unknown_task_is_not_recorded(self):
+        self.assertEqual(dd_io().io_get_task("t9"), [])
+        self.assertEqual(self.projects_asked(), ["ABC", "XYZ"])
+        self.assertIsNone(lookup_project("t9"))
@@ -0,0 +1,156 @@
+import io
+from datetime import datetime
+from unittest import mock
+from django.core.management import call_command
+from projects.timecard import (
+    SCHEMA_VERSION, InvalidCursor, build_query, iter_export_entries, keyset_page, normalize_entry,
+    normalized_fields,
+)
+from projects.tests.mongo import MongoTestCase
+
+
+class BuildQueryTests(MongoTestCase):
+    def logins(self, **params):
+        return sorted(entry["login"] for entry in self.time_data.find(build_query(params)))
+
+    def test_text_filters_are_case_insensitive_prefixes(self):
+        self.time_data.insert_many([
+            {"login": "jdoe", "project": ["ABC"]},
+            {"login": "JDoe2", "project": ["XYZ"]},
+            {"login": "ajdoe", "project": ["Abc1"]},
+        ])
+        self.assertEqual(self.logins(login="jdoe"), ["JDoe2", "jdoe"])
+        self.assertEqual(self.logins(login="JDOE"), ["JDoe2", "jdoe"])
+        self.assertEqual(self.logins(project="abc"), ["ajdoe", "jdoe"])
+        # Prefixes only, the form says "starts with"
+        self.assertEqual(self.logins(login="doe"), [])
+        self.assertEqual(self.logins(login="j.doe"), [])
+        for value in build_query({"login": "jdoe", "project": "abc"}).values():
+            self.assertTrue(value["$regex"].pattern.startswith("^"))
+
+    def test_date_matches_legacy_strings_and_datetimes(self):
+        self.time_data.insert_many([
+            {"login": "a", "date": "2024-05-02"},
+            {"login": "b", "date": "2024:05:02"},
+            {"login": "c", "date": datetime(2024, 5, 2)},
+            {"login": "d", "date": datetime(2024, 5, 3)},
+        ])
+        self.assertEqual(self.logins(date="2024-05-02"), ["a", "b", "c"])
+        self.assertEqual(self.logins(date_from="2024-05-03"), ["d"])
+
+
+class KeysetPageTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        # Three entries per day so pages split inside a run of equal dates
+        self.time_data.insert_many([
+            {"login": f"u{day}{n}", "date": datetime(2024, 5, day)}
+            for day in range(1, 5) for n in range(3)
+        ])
+
+    def walk(self, order_by=None, per_page=5):
+        pages = []
+        token = None
+        while True:
+            page = keyset_page({}, order_by, after=token, per_page=per_page, collection=self.time_data)
+            pages.append([row["login"] for row in page])
+            if not page.has_next:
+                return pages
+            token = page.next_token
+
+    def test_forward_walk_sees_every_entry_once_in_order(self):
+        pages = self.walk()
+        logins = [login for page in pages for login in page]
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(len(set(logins)), 12)
+        days = [int(login[1]) for login in logins]
+        self.assertEqual(days, sorted(days, reverse=True))
+        self.assertEqual(len({login for page in self.walk("date") for login in page}), 12)
+
+    def test_previous_token_returns_the_same_page(self):
+        first = keyset_page({}, after=None, per_page=5, collection=self.time_data)
+        second = keyset_page({}, after=first.next_token, per_page=5, collection=self.time_data)
+        self.assertFalse(first.has_previous)
+        back = keyset_page({}, before=second.prev_token, per_page=5, collection=self.time_data)
+        self.assertEqual([r["login"] for r in back], [r["login"] for r in first])
+        self.assertTrue(back.has_next)
+        self.assertFalse(back.has_previous)
+
+    def test_tokens_are_tied_to_their_ordering(self):
+        page = keyset_page({}, "date", per_page=5, collection=self.time_data)
+        with self.assertRaises(InvalidCursor):
+            keyset_page({}, "-date", after=page.next_token, collection=self.time_data)
+        with self.assertRaises(InvalidCursor):
+            keyset_page({}, after="not-a-token", collection=self.time_data)
+
+    def test_legacy_string_and_missing_dates_are_reached(self):
+        self.time_data.insert_many([
+            {"login": "s1", "date": "2024:05:02"},
+            {"login": "s2", "date": "yesterday"},
+            {"login": "s3", "date": "2024:05:02"},
+            {"login": "n1"},
+            {"login": "n2", "date": None},
+        ])
+        for order_by in (None, "date"):
+            for per_page in (2, 5):
+                pages = self.walk(order_by, per_page)
+                logins = [login for page in pages for login in page]
+                self.assertEqual(len(logins), 17)
+                self.assertEqual(len(set(logins)), 17)
+        # Newest first: dates, then the legacy strings, then no date
+        logins = [login for page in self.walk(per_page=5) for login in page]
+        self.assertEqual([login[0] for login in logins], ["u"] * 12 + ["s"] * 3 + ["n"] * 2)
+
+        # And back again from the last page
+        token = keyset_page({}, after=None, per_page=5, collection=self.time_data).next_token
+        for _ in range(2):
+            token = keyset_page({}, after=token, per_page=5, collection=self.time_data).next_token
+        last = keyset_page({}, after=token, per_page=5, collection=self.time_data)
+        back = keyset_page({}, before=last.prev_token, per_page=5, collection=self.time_data)
+        self.assertEqual([r["login"] for r in back], logins[10:15])
+
+    def test_filtered_total_is_capped(self):
+        with mock.patch("projects.timecard.ESTIMATE_CAP", 4):
+            page = keyset_page({"login": {"$regex": "^u"}}, per_page=5, collection=self.time_data)
+        self.assertEqual((page.total, page.total_is_estimate), (4, True))
+        page = keyset_page({"login": {"$regex": "^u"}}, per_page=5, exact_total=True, collection=self.time_data)
+        self.assertEqual((page.total, page.total_is_estimate), (12, False))
+
+
+class NormalizationTests(MongoTestCase):
+    def test_legacy_entry_is_normalized(self):
+        fields = normalized_fields({"date": "2024:05:02", "work_time": "1:30", "task": {"task": "ID: abc, comp"}})
+        self.assertEqual(fields, {
+            "date": datetime(2024, 5, 2), "task_id": "abc", "work_seconds": 5400, "schema_version": SCHEMA_VERSION})
+
+    def test_unparseable_date_is_left_alone(self):
+        entry = normalize_entry({"date": "02/05/2024", "work_time": "0:10:00"})
+        self.assertEqual(entry["date"], "02/05/2024")
+        self.assertEqual(entry["work_seconds"], 600)
+        self.assertNotIn("schema_version", entry)
+
+    def test_backfill_reports_and_skips_bad_dates(self):
+        self.time_data.insert_many([
+            {"login": "a", "date": "2024-05-02", "work_time": "1:00"},
+            {"login": "b", "date": "yesterday", "work_time": "1:00"},
+            {"login": "c", "date": datetime(2024, 5, 3), "schema_version": SCHEMA_VERSION},
+        ])
+        out, err = io.StringIO(), io.StringIO()
+        call_command("backfill_time_data", batch_size=1, stdout=out, stderr=err)
+        self.assertEqual(self.time_data.find_one({"login": "a"})["date"], datetime(2024, 5, 2))
+        bad = self.time_data.find_one({"login": "b"})
+        self.assertEqual(bad["date"], "yesterday")
+        self.assertNotIn("schema_version", bad)
+        self.assertIn("1 entries have a date that could not be parsed", err.getvalue())
+        self.assertIn("'yesterday'", err.getvalue())
+        self.assertIn("Backfilled 1 entries", out.getvalue())
+
+
+class ExportTests(MongoTestCase):
+    def test_export_streams_sorted_rows_with_disk_use(self):
+        self.time_data.insert_many([{"login": login, "date": "2024-05-02", "work_time": "1:00"} for login in "cab"])
+        with mock.patch.object(type(self.time_data), "find", wraps=self.time_data.find) as find:
+            rows = list(iter_export_entries({"sort": "login"}, batch_size=2, collection=self.time_data))
+        self.assertTrue(find.call_args.kwargs["allow_disk_use"])
+        self.assertEqual([row["login"] for row in rows], ["a", "b", "c"])
+        self.assertEqual(rows[0]["work_seconds"], 3600)
@@ -0,0 +1,37 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from projects.tree import tree_level
+
+
+class FakeIO():
+    shots = {("p", "sq010", "sh010"): [{"id": "t1", "name": "comp", "taskType": "Compositing", "status": "WIP"}]}
+
+    def __init__(self, *path):
+        self.path = path
+
+    def io_get_tasks_page(self, after=None, limit=None, fields=None, fallback=True):
+        tasks = self.shots.get(self.path)
+        if tasks is None and fallback:
+            raise AssertionError("paged every task of the project")
+        return tasks, None
+
+    def io_get_projects(self):
+        return ["b", "a", "c"]
+
+
+@mock.patch("projects.tree.dd_io", FakeIO)
+class TreeLevelTests(SimpleTestCase):
+    def test_tasks_of_a_resolved_shot(self):
+        data = tree_level(["p", "sq010", "sh010"])
+        self.assertEqual([node["id"] for node in data["nodes"]], ["t1"])
+        self.assertEqual(data["next"], None)
+
+    def test_unknown_shot_does_not_fall_back_to_the_project(self):
+        self.assertIsNone(tree_level(["p", "sq010", "nope"]))
+        response = self.client.get("/api/tree/p/sq010/nope/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_name_levels_page_by_name(self):
+        data = tree_level([], limit=2)
+        self.assertEqual([node["name"] for node in data["nodes"]], ["a", "b"])
+        self.assertEqual(tree_level([], limit=2, after=data["next"])["nodes"][0]["name"], "c")
@@ -0,0 +1,490 @@
+import re
+import csv
+import json
+import zlib
+import base64
+import logging
+from datetime import datetime
+from bson import json_util
+from django.core.paginator import Paginator
+from pymongo import ASCENDING, DESCENDING
+from asgiref.sync import sync_to_async
+from projects.iotc import time_data_collection, get_async_db
+
+logger = logging.getLogger(__name__)
+
+# GET parameters matched as case-insensitive prefixes, see prefix_filter
+TEXT_FILTERS = ("login", "project", "system_id", "department")
+SORTABLE_FIELDS = ("login", "date", "day", "start_time", "stop_time", "work_time", "system_id", "department")
+DEFAULT_SORT = "-date"
+# v2 entries store date as a BSON datetime plus task_id and work_seconds
+SCHEMA_VERSION = 2
+# Above this many matches the cursor mode shows "N+" instead of an exact count
+ESTIMATE_CAP = 10000
+
+INDEXES = [
+    [("date", DESCENDING), ("_id", DESCENDING)],
+    [("login", ASCENDING), ("date", DESCENDING)],
+    [("project", ASCENDING), ("date", DESCENDING)],
+    [("system_id", ASCENDING), ("date", DESCENDING)],
+    [("department", ASCENDING), ("date", DESCENDING)],
+]
+
+_indexes_ensured = False
+
+
+def ensure_indexes(collection=time_data_collection):
+    global _indexes_ensured
+    if _indexes_ensured:
+        return
+    for keys in INDEXES:
+        collection.create_index(keys)
+    _indexes_ensured = True
+
+
+async def aensure_indexes():
+    # create_index is a blocking round trip, keep it off the event loop
+    if not _indexes_ensured:
+        await sync_to_async(ensure_indexes, thread_sensitive=False)()
+
+
+def prefix_filter(value):
+    """Entries whose field starts with ``value``, in any case.
+
+    Anchored, so Mongo tests the keys of the (field, date) index and only
+    fetches the entries that match. Substrings ("ohn" for "john") are not
+    matched, the form says so. The summary filters the rollup the same way.
+    """
+    return {"$regex": re.compile("^" + re.escape(value), re.IGNORECASE)}
+
+
+def build_query(params):
+    """Translate the time-data GET filters into a Mongo query."""
+    query = {}
+    for field in TEXT_FILTERS:
+        value = params.get(field)
+        if value:
+            query[field] = prefix_filter(value)
+    date = params.get("date")
+    if date:
+        # Legacy entries store YYYY-MM-DD or YYYY:MM:DD strings, v2 a datetime
+        values = [date, date.replace("-", ":")]
+        try:
+            values.append(parse_date(date))
+        except ValueError:
+            pass
+        query["date"] = {"$in": values}
+    date_range = {}
+    for param, op in (("date_from", "$gte"), ("date_to", "$lte")):
+        value = params.get(param)
+        if value:
+            try:
+                date_range[op] = parse_date(value)
+            except ValueError:
+                pass
+    if date_range:
+        query.setdefault("$and", []).append({"date": date_range})
+    return query
+
+
+def build_sort(order_by):
+    order_by = order_by or DEFAULT_SORT
+    field = order_by.lstrip("-")
+    if field not in SORTABLE_FIELDS:
+        field, order_by = "date", DEFAULT_SORT
+    direction = DESCENDING if order_by.startswith("-") else ASCENDING
+    # _id keeps the order stable across pages when the sort key has ties
+    return [(field, direction), ("_id", direction)]
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    # Normalize date format: Replace colons with hyphens
+    return datetime.strptime(value.replace(":", "-"), '%Y-%m-%d')
+
+
+def parse_task_id(task):
+    if not isinstance(task, dict) or not task:
+        return None
+    task_info = str(list(task.values())[0])
+    return task_info.split('ID: ')[1].split(',')[0].strip() if 'ID: ' in task_info else None
+
+
+def parse_duration(value):
+    """Seconds in an ``H:MM[:SS]`` duration, or None."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        parts = [int(p) for p in str(value).split(":")]
+    except ValueError:
+        return None
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        return None
+    hours, minutes, seconds = parts
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def normalized_fields(entry):
+    """Fields of the v2 time_data schema derived from a raw entry.
+
+    An entry whose date does not parse keeps its raw date and gets no
+    schema_version, so it is still pending for the backfill to report.
+    """
+    fields = {
+        "task_id": parse_task_id(entry.get("task")),
+        "work_seconds": parse_duration(entry.get("work_time")),
+    }
+    try:
+        fields["date"] = parse_date(entry['date'])
+    except (KeyError, AttributeError, ValueError) as e:
+        logger.error(f"Error parsing date for entry {entry.get('_id')}: {e}")
+        return fields
+    fields["schema_version"] = SCHEMA_VERSION
+    return fields
+
+
+def normalize_entry(entry):
+    # Backfilled entries already store these, only legacy rows pay for parsing
+    if entry.get("schema_version") != SCHEMA_VERSION:
+        entry.update(normalized_fields(entry))
+    return entry
+
+
+class TimeDataQuery():
+    """Lazy, sliceable view of a time_data query for Django's Paginator.
+
+    Only the requested slice is fetched (skip/limit) and the total comes
+    from an indexed count, so a page costs the same as the rows it shows.
+    """
+
+    def __init__(self, query=None, sort=None, collection=time_data_collection):
+        self.collection = collection
+        self.query = query or {}
+        self.sort = sort or build_sort(None)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if self.query:
+                self._count = self.collection.count_documents(self.query)
+            else:
+                self._count = self.collection.estimated_document_count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            rows = self[index:index + 1]
+            if not rows:
+                raise IndexError(index)
+            return rows[0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        cursor = (
+            self.collection.find(self.query, {'_id': 0})
+            .sort(self.sort)
+            .skip(start)
+            .limit(stop - start)
+        )
+        return [normalize_entry(entry) for entry in cursor]
+
+
+def time_data_query(params):
+    ensure_indexes()
+    return TimeDataQuery(build_query(params), build_sort(params.get("sort")))
+
+
+EXPORT_FIELDS = (
+    "login", "date", "day", "task_id", "task", "start_time", "stop_time",
+    "work_time", "work_seconds", "system_id", "department", "project",
+)
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_export_entries(params, batch_size=1000, collection=time_data_collection):
+    """Stream matching entries straight off a Mongo cursor, one batch in memory at a time."""
+    ensure_indexes()
+    # Only date has an index to sort on, other orders are a blocking sort of
+    # the whole result that may spill past the 100MB in-memory limit
+    cursor = (
+        collection.find(build_query(params), {'_id': 0}, allow_disk_use=True)
+        .sort(build_sort(params.get("sort")))
+        .batch_size(batch_size)
+    )
+    for entry in cursor:
+        yield normalize_entry(entry)
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, dict):
+        return "; ".join(str(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(v) for v in value)
+    return "" if value is None else value
+
+
+class _Echo():
+    def write(self, value):
+        return value
+
+
+def iter_csv(entries):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for entry in entries:
+        yield writer.writerow([_export_value(entry.get(field)) for field in EXPORT_FIELDS])
+
+
+def iter_ndjson(entries):
+    for entry in entries:
+        row = {field: entry.get(field) for field in EXPORT_FIELDS}
+        if isinstance(row["date"], datetime):
+            row["date"] = row["date"].strftime('%Y-%m-%d')
+        yield json.dumps(row, default=str) + "\n"
+
+
+def iter_chunks(lines, size=EXPORT_CHUNK_SIZE):
+    """Batch small text lines into ~size byte chunks for the response."""
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order_by, entry):
+    raw = json_util.dumps([order_by, entry.get("date"), entry["_id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(order_by, token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_order, date, _id = json_util.loads(raw)
+    except Exception:
+        raise InvalidCursor(token)
+    # Tokens are only valid for the ordering they were issued for
+    if token_order != order_by:
+        raise InvalidCursor(token)
+    return date, _id
+
+
+class KeysetPage():
+    """One page of a (date, _id) keyset scan with opaque next/prev tokens.
+
+    Each page is a single indexed range scan, so deep pages cost the same
+    as the first one.
+    """
+
+    def __init__(self, rows, next_token, prev_token, total, total_is_estimate):
+        self.object_list = rows
+        self.next_token = next_token
+        self.prev_token = prev_token
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_token is not None
+
+
+# Types a stored date can have, in Mongo's sort order: missing or null,
+# legacy strings the backfill could not parse, then real dates
+DATE_SEGMENTS = ({"date": None}, {"date": {"$type": "string"}}, {"date": {"$type": "date"}})
+
+
+def _date_segment(date):
+    if date is None:
+        return 0
+    return 1 if isinstance(date, str) else 2
+
+
+def _keyset_filter(query, date, _id, op):
+    # $lt / $gt only match values of the cursor's own type, the segments
+    # sorting past it are added whole
+    segment = _date_segment(date)
+    if date is None:
+        clauses = [{"date": None, "_id": {op: _id}}]
+    else:
+        clauses = [{"date": {op: date}}, {"date": date, "_id": {op: _id}}]
+    later = DATE_SEGMENTS[segment + 1:] if op == "$gt" else DATE_SEGMENTS[:segment]
+    key = {"$or": clauses + list(later)}
+    return {"$and": [query, key]} if query else key
+
+
+def _keyset_plan(query, order_by, after, before):
+    # (order_by, backwards, token, find query, sort) for one keyset page
+    order_by = "date" if order_by == "date" else DEFAULT_SORT
+    descending = order_by.startswith("-")
+    backwards = before is not None and after is None
+    token = before if backwards else after
+
+    find_query = query
+    if token:
+        date, _id = decode_cursor(order_by, token)
+        # Walking backwards flips both the comparison and the sort
+        op = "$lt" if descending != backwards else "$gt"
+        find_query = _keyset_filter(query, date, _id, op)
+    direction = DESCENDING if descending != backwards else ASCENDING
+    return order_by, backwards, token, find_query, [("date", direction), ("_id", direction)]
+
+
+def keyset_page(query, order_by=None, after=None, before=None, per_page=10,
+                exact_total=False, collection=time_data_collection):
+    order_by, backwards, token, find_query, sort = _keyset_plan(query, order_by, after, before)
+    entries = list(collection.find(find_query).sort(sort).limit(per_page + 1))
+
+    if exact_total:
+        total, is_estimate = collection.count_documents(query), False
+    elif query:
+        total = collection.count_documents(query, limit=ESTIMATE_CAP)
+        is_estimate = total >= ESTIMATE_CAP
+    else:
+        # Collection metadata count, no scan needed
+        total, is_estimate = collection.estimated_document_count(), False
+    return _keyset_result(entries, order_by, backwards, token, per_page, total, is_estimate)
+
+
+def _keyset_result(entries, order_by, backwards, token, per_page, total, is_estimate):
+    has_more = len(entries) > per_page
+    entries = entries[:per_page]
+    if backwards:
+        entries.reverse()
+
+    next_token = prev_token = None
+    if entries:
+        if has_more or backwards:
+            next_token = encode_cursor(order_by, entries[-1])
+        if (has_more and backwards) or (token and not backwards):
+            prev_token = encode_cursor(order_by, entries[0])
+
+    rows = []
+    for entry in entries:
+        entry.pop("_id")
+        rows.append(normalize_entry(entry))
+    return KeysetPage(rows, next_token, prev_token, total, is_estimate)
+
+
+def time_data_keyset_page(params, per_page=10):
+    ensure_indexes()
+    return keyset_page(
+        build_query(params),
+        params.get("sort"),
+        after=params.get("after") or None,
+        before=params.get("before") or None,
+        per_page=per_page,
+        exact_total=params.get("total") == "exact",
+    )
+
+
+# Async variants for the ASGI views, same queries on the AsyncMongoClient
+
+
+class _FetchedPage():
+    """Sequence of known length holding only the rows of one page, for Paginator."""
+
+    def __init__(self, total, start, rows):
+        self.total = total
+        self.start = start
+        self.rows = rows
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        start = index.start - self.start
+        return self.rows[start:start + index.stop - index.start]
+
+
+def _async_collection():
+    return get_async_db()[time_data_collection.name]
+
+
+async def atime_data_page(params, per_page=10):
+    """Django Page for the offset time-data view, fetched without blocking."""
+    await aensure_indexes()
+    collection = _async_collection()
+    query = build_query(params)
+    if query:
+        total = await collection.count_documents(query)
+    else:
+        total = await collection.estimated_document_count()
+    number = _page_number(params.get("page"), total, per_page)
+    start = (number - 1) * per_page
+    cursor = (
+        collection.find(query, {'_id': 0})
+        .sort(build_sort(params.get("sort")))
+        .skip(start)
+        .limit(per_page)
+    )
+    rows = [normalize_entry(entry) async for entry in cursor]
+    return Paginator(_FetchedPage(total, start, rows), per_page).page(number)
+
+
+def _page_number(value, total, per_page):
+    # Same fallbacks as Paginator.get_page: not a number -> 1, too far -> last
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return 1
+    last = max(1, -(-total // per_page))
+    return min(max(number, 1), last)
+
+
+async def atime_data_keyset_page(params, per_page=10):
+    await aensure_indexes()
+    collection = _async_collection()
+    query = build_query(params)
+    order_by, backwards, token, find_query, sort = _keyset_plan(
+        query, params.get("sort"), params.get("after") or None, params.get("before") or None)
+    entries = await collection.find(find_query).sort(sort).limit(per_page + 1).to_list()
+
+    if params.get("total") == "exact":
+        total, is_estimate = await collection.count_documents(query), False
+    elif query:
+        total = await collection.count_documents(query, limit=ESTIMATE_CAP)
+        is_estimate = total >= ESTIMATE_CAP
+    else:
+        total, is_estimate = await collection.estimated_document_count(), False
+    return _keyset_result(entries, order_by, backwards, token, per_page, total, is_estimate)
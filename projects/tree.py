@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+import json
+import logging
+from django.urls import reverse
+from .ddio import dd_io
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+# Hierarchy level below each level, tasks are leaves
+LEVELS = ("projects", "sequences", "shots", "tasks")
+
+
+def dumps(data):
+    """Compact JSON bytes, orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def parse_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _name_page(names, limit, after):
+    # Keyset on the name, stable while entries are added or removed
+    names = sorted(names)
+    if after:
+        names = [name for name in names if name > after]
+    page = names[:limit]
+    next_cursor = page[-1] if len(names) > limit else None
+    return page, next_cursor
+
+
+def _children_url(*path):
+    return reverse("tree", args=path) if path else reverse("tree")
+
+
+def tree_level(path, limit=DEFAULT_LIMIT, after=None):
+    """One level of the hierarchy below ``path`` (project, sequence, shot).
+
+    Returns ``{"level", "path", "nodes", "next"}``, or None when the shot
+    of a tasks level does not resolve. Branch nodes carry the url of their
+    children, pass ``next`` back as ``after`` for the next page.
+    """
+    path = list(path)
+    level = LEVELS[len(path)]
+    if level == "tasks":
+        # No project-wide fallback, a typo in the shot must not page every task
+        tasks, next_cursor = dd_io(*path).io_get_tasks_page(after=after, limit=limit, fields="tasks", fallback=False)
+        if tasks is None:
+            return None
+        nodes = [
+            {
+                "id": task["id"],
+                "name": task["name"],
+                "type": task.get("taskType"),
+                "status": task.get("status"),
+                "url": reverse("task_detail", args=[task["id"]]),
+            }
+            for task in tasks
+        ]
+        return {"level": level, "path": path, "nodes": nodes, "next": next_cursor}
+
+    val = dd_io(*path)
+    if level == "projects":
+        names = val.io_get_projects()
+    elif level == "sequences":
+        names = val.io_get_sequences()
+    else:
+        names = val.io_get_shots()
+    page, next_cursor = _name_page(names, limit, after)
+    nodes = [{"name": name, "children": _children_url(*path, name)} for name in page]
+    return {"level": level, "path": path, "nodes": nodes, "next": next_cursor}
@@ -1,10 +1,18 @@
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
 from django.urls import path
-from projects.views import home, about, show_projects, show_sequences, show_shots, show_tasks, show_users, get_time_data, show_my_tasks, task_detail
+import os
+from projects import views
+from projects.views import home, about, show_projects, show_sequences, show_shots, show_tasks, show_users, get_time_data, show_my_tasks, task_detail, cache_stats, metrics, tree, browse, search, time_data_summary, time_data_summary_json, export_time_data, ingest_time_data, job_list, job_detail
 from django.conf import settings
 from django.conf.urls.static import static
 
+# Serve the hierarchy and time-data pages from the async views (ASGI deployments)
+if os.environ.get("IOSPACE_ASYNC_VIEWS", "0") == "1":
+    show_projects, show_sequences, show_shots = views.ashow_projects, views.ashow_sequences, views.ashow_shots
+    show_tasks, show_users, show_my_tasks = views.ashow_tasks, views.ashow_users, views.ashow_my_tasks
+    task_detail, get_time_data = views.atask_detail, views.aget_time_data
+
 urlpatterns = [
  path('admin/', admin.site.urls),
  path('login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
@@ -13,12 +21,26 @@ urlpatterns = [
  path('projects/', show_projects, name = "proj"),
  path('users/', show_users, name = "user"),
  path('time-data/', get_time_data, name='time_data'),
+ path('time-data/export/', export_time_data, name='time_data_export'),
+ path('time-data/summary/', time_data_summary, name='time_data_summary'),
+ path('api/time-data/summary/', time_data_summary_json, name='time_data_summary_json'),
+ path('api/time-data/ingest/', ingest_time_data, name='time_data_ingest'),
+ path('api/jobs/', job_list, name='jobs'),
+ path('api/jobs/<int:job_id>/', job_detail, name='job_detail'),
  path('my_tasks/', show_my_tasks, name='my_tasks'),
  path('sequences/<str:project_name>/', show_sequences, name = "seq"),
  path('shots/<str:project_name>/<str:sequence_name>/', show_shots, name = "shot"),
  path('tasks/<str:project_name>/<str:sequence_name>/<str:shot_name>/', show_tasks, name = "task"),
+ path('browse/', browse, name='browse'),
+ path('api/search/', search, name='search'),
+ path('api/tree/', tree, name='tree'),
+ path('api/tree/<str:project_name>/', tree, name='tree'),
+ path('api/tree/<str:project_name>/<str:sequence_name>/', tree, name='tree'),
+ path('api/tree/<str:project_name>/<str:sequence_name>/<str:shot_name>/', tree, name='tree'),
  path('', home),
  path('about/', about),
+ path('cache/stats/', cache_stats, name='cache_stats'),
+ path('metrics/', metrics, name='metrics'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 
@@ -1,56 +1,145 @@
 from django.shortcuts import render
+from asgiref.sync import sync_to_async
 from .ddio import dd_io
-from django.http import HttpResponse
+from .cache import hierarchy_cache, page_cache, PAGE_TTL
+from .events import hierarchy_version
+from . import metrics as app_metrics
+from django.http import HttpResponse, StreamingHttpResponse
 from projects.iotc import time_data_collection
-import django_filters
+from .timecard import time_data_query, time_data_keyset_page, InvalidCursor
+from .timecard import atime_data_page, atime_data_keyset_page
+from .timecard import iter_export_entries, iter_csv, iter_ndjson, iter_chunks, iter_gzip
+from .tree import tree_level, dumps as tree_dumps, parse_limit
+from .search import search_index, KINDS as SEARCH_KINDS
+from .rollups import summary as rollup_summary, GROUP_FIELDS, PERIODS
+from . import jobs
+from .models import Job
+from .ingest import validate as validate_entries, write_entries, MAX_REQUEST_ENTRIES
 import django_tables2 as tables
 from django.core.paginator import Paginator
 from django_tables2 import RequestConfig
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from pymongo import MongoClient
+from django.middleware.csrf import CsrfViewMiddleware
 import os
-from pprint import pprint
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from datetime import datetime
+import hashlib
+import gzip
+import hmac
+import json
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Seconds browsers may reuse a tree level before revalidating it
+TREE_MAX_AGE = int(os.environ.get("IOSPACE_TREE_MAX_AGE", 30))
+
 def home(request):
-    val = dd_io()
-    events = val.io_get_events()
+    # Events are consumed by the background follower, not per page load
     context = {"events": []}
     return render(request, 'home.html', context)
 
 def about(request):
     return render(request, 'about.html')
 
+def cache_stats(request):
+    return JsonResponse(hierarchy_cache.stats())
+
+def metrics(request):
+    # Prometheus text exposition format, counters of this worker process only
+    return HttpResponse(app_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _page_validators(request, version, context=None):
+    # Event-driven version when a follower runs here, else a digest of the (cached) data
+    source = (request.path, version) if version is not None else (request.path, context)
+    etag = quote_etag(hashlib.sha1(repr(source).encode()).hexdigest())
+    last_modified = None
+    if version:
+        try:
+            last_modified = int(datetime.fromisoformat(version).timestamp())
+        except ValueError:
+            pass
+    return etag, last_modified
+
+def _page_response(request, etag, last_modified, render_page):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(page_cache.get_or_load((request.path, etag), render_page, PAGE_TTL))
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Always revalidate, an unchanged page costs a 304
+    patch_cache_control(response, no_cache=True)
+    return response
+
+def _hierarchy_page(request, template, scope, load_context):
+    """Conditional GET plus render cache for pages that only change with the hierarchy."""
+    version = hierarchy_version(*scope)
+    context = load_context() if version is None else None
+    etag, last_modified = _page_validators(request, version, context)
+
+    def render_page():
+        return render_to_string(template, context if context is not None else load_context(), request)
+    return _page_response(request, etag, last_modified, render_page)
 
 def show_projects(request):
-    val = dd_io()
-    projects = val.io_get_projects()
-    context = {"projects": projects}
-    print(context)
-    return render(request, 'projects.html', context)
+    def load_context():
+        return {"projects": dd_io().io_get_projects()}
+    return _hierarchy_page(request, 'projects.html', ("projects",), load_context)
 
 def show_sequences(request, project_name):
-    val = dd_io(project_name)
-    sequences = val.io_get_sequences()
-    context = {"project_name": project_name, "sequences": sequences}
-    return render(request, 'sequences.html', context)
+    def load_context():
+        return {"project_name": project_name, "sequences": dd_io(project_name).io_get_sequences()}
+    return _hierarchy_page(request, 'sequences.html', ("folders", project_name), load_context)
 def show_shots(request, project_name, sequence_name):
-    val = dd_io(project_name, sequence_name)
-    shots = val.io_get_shots()
-    context = {"project_name": project_name, "sequence_name": sequence_name, "shots": shots}
-    return render(request, 'shots.html', context)
+    def load_context():
+        shots = dd_io(project_name, sequence_name).io_get_shots()
+        return {"project_name": project_name, "sequence_name": sequence_name, "shots": shots}
+    return _hierarchy_page(request, 'shots.html', ("folders", project_name), load_context)
+def tree(request, project_name=None, sequence_name=None, shot_name=None):
+    # One hierarchy level as compact JSON, the browse page expands nodes in place
+    path = [name for name in (project_name, sequence_name, shot_name) if name is not None]
+    data = tree_level(path, parse_limit(request.GET.get("limit")), request.GET.get("after") or None)
+    if data is None:
+        return JsonResponse({"error": f"shot {'/'.join(path)} not found"}, status=404)
+    body = tree_dumps(data)
+    etag = quote_etag(hashlib.sha1(body).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=TREE_MAX_AGE)
+    return response
+
+def search(request):
+    # Search-as-you-type over every project, answered from the in-memory index
+    kinds = [kind for kind in request.GET.get("kind", "").split(",") if kind in SEARCH_KINDS]
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 100))
+    except ValueError:
+        limit = 20
+    indexing = search_index.ensure_fresh()
+    results = search_index.search(request.GET.get("q", ""), limit, kinds, request.GET.get("project") or None)
+    return JsonResponse({"results": results, "indexing": indexing})
+
+def browse(request):
+    return render(request, 'browse.html')
+
 def show_tasks(request, project_name, sequence_name, shot_name):
     val = dd_io(project_name, sequence_name, shot_name)
-    tasks = val.io_get_tasks()
-    context = {"shot_name": shot_name ,"project_name": project_name, "sequence_name": sequence_name, "tasks": tasks}
+    # Only one page is held in memory when this falls back to the whole project
+    tasks, next_cursor = val.io_get_tasks_page(after=request.GET.get("after") or None, fields="tasks")
+    context = {"shot_name": shot_name ,"project_name": project_name, "sequence_name": sequence_name, "tasks": tasks,
+               "next_cursor": next_cursor, "paged": bool(request.GET.get("after"))}
     return render(request, 'tasks.html', context)
 def show_users(request):
     val = dd_io()
@@ -59,11 +148,12 @@ def show_users(request):
     return render(request, 'users.html', context)
 def show_my_tasks(request):
     val = dd_io(user="balajid")
-    projects = val.io_get_projects()
-    tasks = {}
-    for i in projects:
-        k = val.io_get_user_tasks(i)
-        tasks[i] = k
+    # Projects are queried concurrently, slow ones are reported as unavailable
+    tasks, unavailable = val.io_get_user_tasks_by_project(fields="my_tasks")
+    return render(request, 'my_tasks.html', {'tasks_by_show': _flatten_user_tasks(tasks), 'unavailable_shows': unavailable,
+                                             'username': request.user.username})
+
+def _flatten_user_tasks(tasks):
     # Flatten the tasks dictionary
     user_tasks = {}
     for project, tasks_list in tasks.items():
@@ -80,14 +170,13 @@ def show_my_tasks(request):
             }
             for task in tasks_list
         ]
-    print("user_tasks",user_tasks)
-    return render(request, 'my_tasks.html', {'tasks_by_show': user_tasks})
+    return user_tasks
     
     
 def task_detail(request, task_id):
     val = dd_io()  
 
-    task = val.io_get_task(task_id=task_id)
+    task = val.io_get_task(task_id=task_id, fields="task_detail")
     if not task:
         return render(request, 'task_detail.html', {'error': 'Task not found'})
     context = {"task": task[0]}  
@@ -116,44 +205,11 @@ class MyTable(tables.Table):
 
 # View function
 def get_time_data(request):
-    # Fetch and sort data by date (descending)
-    time_data = list(time_data_collection.find({}, {'_id': 0}).sort("date", -1))
-
-    # Normalize date field to datetime objects for accurate sorting
+    if request.GET.get("paging") == "cursor":
+        return get_time_data_cursor(request)
 
-    for entry in time_data:
-        try:
-            # Normalize date format: Replace colons with hyphens
-            normalized_date = entry['date'].replace(":", "-")
-            entry['date'] = datetime.strptime(normalized_date, '%Y-%m-%d')
-        except ValueError as e:
-            logger.error(f"Error parsing date for entry {entry}: {e}")
-            # Handle entries with invalid dates (e.g., skip or assign a default value)
-            entry['date'] = None
-
-        if 'task' in entry:
-            task_info = list(entry['task'].values())[0]
-            entry['task_id'] = task_info.split('ID: ')[1].split(',')[0] if 'ID: ' in task_info else None
-
-    # Manual filtering from GET parameters
-    login = request.GET.get("login")
-    date = request.GET.get("date")
-    project = request.GET.get("project")
-    system_id = request.GET.get("system_id")
-    department = request.GET.get("department")
-
-    if login:
-        time_data = [entry for entry in time_data if login.lower() in entry.get("login", "").lower()]
-    if date:
-        time_data = [entry for entry in time_data if entry.get("date").strftime('%Y-%m-%d') == date]
-    if project:
-        time_data = [
-            entry for entry in time_data if any(project.lower() in p.lower() for p in entry.get("project", []))
-        ]
-    if system_id:
-        time_data = [entry for entry in time_data if system_id.lower() in entry.get("system_id", "").lower()]
-    if department:
-        time_data = [entry for entry in time_data if department.lower() in entry.get("department", "").lower()]
+    # Filtering, sorting and skip/limit all run in Mongo, only the shown page is loaded
+    time_data = time_data_query(request.GET)
 
     # Paginate the data
     paginator = Paginator(time_data, 10)  # Show 10 records per page
@@ -164,10 +220,267 @@ def get_time_data(request):
     table = MyTable(page_obj)
     RequestConfig(request).configure(table)
 
+    # Keep the filters on the pagination links
+    params = request.GET.copy()
+    params.pop("page", None)
+
     context = {
         "table": table,
         "page_obj": page_obj,
+        "querystring": params.urlencode(),
+    }
+
+    logger.debug("Rendered time data page %s of %s", page_obj.number, paginator.num_pages)
+    return render(request, 'timecard.html', context)
+
+def get_time_data_cursor(request):
+    # Keyset paging on (date, _id): every page is one indexed range scan
+    try:
+        page = time_data_keyset_page(request.GET)
+    except InvalidCursor:
+        params = request.GET.copy()
+        params.pop("after", None)
+        params.pop("before", None)
+        return redirect(f"{request.path}?{params.urlencode()}")
+
+    table = MyTable(page.object_list)
+    RequestConfig(request, paginate=False).configure(table)
+
+    params = request.GET.copy()
+    params.pop("after", None)
+    params.pop("before", None)
+    context = {
+        "table": table,
+        "cursor_mode": True,
+        "cursor_page": page,
+        "querystring": params.urlencode(),
     }
+    return render(request, 'timecard.html', context)
+
+def export_time_data(request):
+    # Rows go from the Mongo cursor to the socket, memory stays flat for any size
+    fmt = "ndjson" if request.GET.get("format") == "ndjson" else "csv"
+    entries = iter_export_entries(request.GET)
+    lines = iter_ndjson(entries) if fmt == "ndjson" else iter_csv(entries)
+    chunks = iter_chunks(lines)
+    filename = f"time_data.{fmt}"
+    content_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    if request.GET.get("gzip"):
+        chunks = iter_gzip(chunks)
+        filename += ".gz"
+        content_type = "application/gzip"
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def time_data_summary(request):
+    # Answered from the pre-aggregated daily rollup, not the raw entries. Web
+    # processes refresh it in the background (rollups.RollupRefresher).
+    context = rollup_summary(request.GET)
+    context.update({"group_fields": GROUP_FIELDS, "periods": PERIODS})
+    return render(request, 'timecard_summary.html', context)
+
+def time_data_summary_json(request):
+    return JsonResponse(rollup_summary(request.GET))
+
+
+INGEST_CONTENT_TYPES = ("application/json", "application/x-ndjson")
+
+
+def _ingest_client(request):
+    """Who is posting: "token" (a workstation with the shared bearer token), "session" or None."""
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = os.environ.get("IOSPACE_INGEST_TOKEN")
+        sent = authorization.removeprefix("Bearer ").strip()
+        if token and hmac.compare_digest(sent.encode(), token.encode()):
+            return "token"
+        return None
+    if request.user.is_authenticated:
+        return "session"
+    return None
 
-    logger.debug(f"Rendered context: {context}")
-    return render(request, 'timecard.html', context)
\ No newline at end of file
+
+def _csrf_failure(request):
+    # The view is csrf_exempt for token clients, browser sessions still get the check
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def _ingest_payload(request):
+    body = request.body
+    if request.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    if request.content_type == "application/x-ndjson":
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    data = json.loads(body)
+    return data.get("entries") if isinstance(data, dict) else data
+
+
+@csrf_exempt
+def ingest_time_data(request):
+    """Store a batch of time sessions posted by workstations.
+
+    Entries are upserted on their natural key before the response, which
+    lists the per-entry errors of the ``rejected`` (invalid) and ``failed``
+    (not written, safe to resend) ones. Workstations authenticate with the
+    IOSPACE_INGEST_TOKEN bearer token and may post for any login; a
+    browser session needs a CSRF token and can only post its own time.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST a list of entries"}, status=405, headers={"Allow": "POST"})
+    client = _ingest_client(request)
+    if client is None:
+        return JsonResponse({"error": "not authorized"}, status=401)
+    if client == "session":
+        failure = _csrf_failure(request)
+        if failure is not None:
+            return JsonResponse({"error": "CSRF check failed"}, status=403)
+    if request.content_type not in INGEST_CONTENT_TYPES:
+        return JsonResponse({"error": f"content type must be one of {', '.join(INGEST_CONTENT_TYPES)}"}, status=415)
+    try:
+        raw_entries = _ingest_payload(request)
+    except (ValueError, OSError, EOFError) as e:
+        return JsonResponse({"error": f"invalid body: {e}"}, status=400)
+    if not isinstance(raw_entries, list):
+        return JsonResponse({"error": "expected a list of entries"}, status=400)
+    if len(raw_entries) > MAX_REQUEST_ENTRIES:
+        return JsonResponse({"error": f"at most {MAX_REQUEST_ENTRIES} entries per request"}, status=413)
+
+    entries, rejected = validate_entries(raw_entries, login=request.user.username if client == "session" else None)
+    result = write_entries(entries)
+    result["rejected"] = rejected
+    if entries and len(result["failed"]) == len(entries):
+        # Nothing was stored, most likely Mongo is down
+        return JsonResponse(result, status=503, headers={"Retry-After": "5"})
+    return JsonResponse(result)
+
+
+def job_list(request):
+    """POST queues an AYON write job and answers 202 at once, GET lists recent jobs."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "not authorized"}, status=401)
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body or b"{}")
+            if not isinstance(data, dict):
+                raise ValueError("expected an object")
+            job = jobs.submit(data.pop("kind", None), data, created_by=request.user.get_username())
+        except ValueError as e:
+            return JsonResponse({"error": str(e), "kinds": jobs.kinds()}, status=400)
+        response = JsonResponse(jobs.job_dict(job), status=202)
+        response["Location"] = reverse("job_detail", args=[job.pk])
+        return response
+
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 50)), 500))
+    except ValueError:
+        limit = 50
+    queryset = Job.objects.order_by("-id")
+    if request.GET.get("status"):
+        queryset = queryset.filter(status=request.GET["status"])
+    if request.GET.get("mine"):
+        queryset = queryset.filter(created_by=request.user.get_username())
+    response = JsonResponse({"jobs": [jobs.job_dict(job) for job in queryset[:limit]]})
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def job_detail(request, job_id):
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "not authorized"}, status=401)
+    try:
+        job = Job.objects.get(pk=job_id)
+    except Job.DoesNotExist:
+        return JsonResponse({"error": "no such job"}, status=404)
+    response = JsonResponse(jobs.job_dict(job))
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+# Async counterparts, routed instead of the views above when IOSPACE_ASYNC_VIEWS=1.
+# Upstream calls are awaited, so one ASGI worker keeps many slow requests in flight.
+
+async def _ahierarchy_page(request, template, scope, load_context):
+    version = await sync_to_async(hierarchy_version)(*scope)
+    context = await load_context() if version is None else None
+    etag, last_modified = _page_validators(request, version, context)
+    # Keep the page fetched here, it can be evicted before _page_response looks again
+    page = page_cache.get((request.path, etag))
+    if context is None and page is None and \
+            get_conditional_response(request, etag=etag, last_modified=last_modified) is None:
+        context = await load_context()
+
+    def render_page():
+        return page if page is not None else render_to_string(template, context, request)
+    return _page_response(request, etag, last_modified, render_page)
+
+async def ashow_projects(request):
+    async def load_context():
+        val = await sync_to_async(dd_io)()
+        return {"projects": await val.aio_get_projects()}
+    return await _ahierarchy_page(request, 'projects.html', ("projects",), load_context)
+
+async def ashow_sequences(request, project_name):
+    async def load_context():
+        val = await sync_to_async(dd_io)(project_name)
+        return {"project_name": project_name, "sequences": await val.aio_get_sequences()}
+    return await _ahierarchy_page(request, 'sequences.html', ("folders", project_name), load_context)
+
+async def ashow_shots(request, project_name, sequence_name):
+    async def load_context():
+        val = await sync_to_async(dd_io)(project_name, sequence_name)
+        shots = await val.aio_get_shots()
+        return {"project_name": project_name, "sequence_name": sequence_name, "shots": shots}
+    return await _ahierarchy_page(request, 'shots.html', ("folders", project_name), load_context)
+
+async def ashow_tasks(request, project_name, sequence_name, shot_name):
+    val = await sync_to_async(dd_io)(project_name, sequence_name, shot_name)
+    tasks, next_cursor = await val.aio_get_tasks_page(after=request.GET.get("after") or None, fields="tasks")
+    context = {"shot_name": shot_name ,"project_name": project_name, "sequence_name": sequence_name, "tasks": tasks,
+               "next_cursor": next_cursor, "paged": bool(request.GET.get("after"))}
+    return render(request, 'tasks.html', context)
+
+async def ashow_users(request):
+    val = await sync_to_async(dd_io)()
+    return render(request, 'users.html', {"users": await val.aio_get_users()})
+
+async def ashow_my_tasks(request):
+    # request.user loads the session and user from the database on first access
+    username = await sync_to_async(lambda: request.user.username)()
+    val = await sync_to_async(dd_io)(user="balajid")
+    tasks, unavailable = await val.aio_get_user_tasks_by_project(fields="my_tasks")
+    return render(request, 'my_tasks.html', {'tasks_by_show': _flatten_user_tasks(tasks), 'unavailable_shows': unavailable,
+                                             'username': username})
+
+async def atask_detail(request, task_id):
+    val = await sync_to_async(dd_io)()
+    task = await val.aio_get_task(task_id=task_id, fields="task_detail")
+    if not task:
+        return render(request, 'task_detail.html', {'error': 'Task not found'})
+    return render(request, 'task_detail.html', {"task": task[0]})
+
+async def aget_time_data(request):
+    params = request.GET.copy()
+    if request.GET.get("paging") == "cursor":
+        try:
+            page = await atime_data_keyset_page(request.GET)
+        except InvalidCursor:
+            params.pop("after", None)
+            params.pop("before", None)
+            return redirect(f"{request.path}?{params.urlencode()}")
+        table = MyTable(page.object_list)
+        RequestConfig(request, paginate=False).configure(table)
+        params.pop("after", None)
+        params.pop("before", None)
+        context = {"table": table, "cursor_mode": True, "cursor_page": page, "querystring": params.urlencode()}
+        return render(request, 'timecard.html', context)
+
+    page_obj = await atime_data_page(request.GET)
+    table = MyTable(page_obj)
+    RequestConfig(request).configure(table)
+    params.pop("page", None)
+    context = {"table": table, "page_obj": page_obj, "querystring": params.urlencode()}
+    return render(request, 'timecard.html', context)